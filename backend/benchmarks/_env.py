@@ -0,0 +1,25 @@
+"""
+Offline setup shared by the benchmarks and the tests: puts backend/ on
+sys.path and gives the required settings placeholder values, so modules that
+load config import without a Supabase project or OpenAI key and nothing is
+contacted. Import it before anything that imports config.
+"""
+
+from pathlib import Path
+import os
+import sys
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+PLACEHOLDER_ENV = {
+    "SUPABASE_URL": "http://localhost:54321",
+    "SUPABASE_ANON_KEY": "offline",
+    "SUPABASE_SERVICE_KEY": "offline",
+    "OPENAI_API_KEY": "offline",
+}
+
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+for name, value in PLACEHOLDER_ENV.items():
+    os.environ.setdefault(name, value)
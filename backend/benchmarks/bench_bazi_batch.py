@@ -0,0 +1,82 @@
+"""
+Benchmark: calculate_bazi_profile in a loop vs calculate_bazi_batch.
+
+Checks that the batch output matches the scalar path exactly, then reports
+throughput at each size.
+
+Usage (from backend/):
+    python benchmarks/bench_bazi_batch.py [--sizes 10000 1000000] [--scalar-limit 100000]
+"""
+
+from pathlib import Path
+import argparse
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.bazi_calculator import (  # noqa: E402
+    calculate_bazi_batch, calculate_bazi_profile, iter_bazi_profiles
+)
+
+
+def random_births(n: int, seed: int = 42):
+    rng = np.random.default_rng(seed)
+    return (
+        rng.integers(1900, 2101, n),
+        rng.integers(1, 13, n),
+        rng.integers(1, 32, n),
+        rng.integers(0, 24, n),
+        rng.integers(0, 60, n),
+    )
+
+
+def run_scalar(years, months, days, hours, minutes):
+    return [
+        calculate_bazi_profile(y, m, d, h, mi, "male")
+        for y, m, d, h, mi in zip(years, months, days, hours, minutes)
+    ]
+
+
+def check_parity(n: int) -> None:
+    births = random_births(n, seed=7)
+    expected = run_scalar(*(column.tolist() for column in births))
+    actual = list(iter_bazi_profiles(calculate_bazi_batch(*births)))
+    mismatches = sum(1 for a, b in zip(expected, actual) if a != b)
+    print(f"parity: {n} rows, {mismatches} mismatches")
+    if mismatches:
+        sys.exit(1)
+
+
+def timed(fn, *args) -> float:
+    started = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batch BaZi calculation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 1000000])
+    parser.add_argument("--scalar-limit", type=int, default=100000,
+                        help="largest size to also time the scalar loop on")
+    parser.add_argument("--parity-rows", type=int, default=20000)
+    args = parser.parse_args()
+
+    check_parity(args.parity_rows)
+
+    print(f"{'rows':>9}  {'scalar rows/s':>14}  {'batch rows/s':>14}  {'speedup':>8}")
+    for n in args.sizes:
+        births = random_births(n)
+        batch = timed(calculate_bazi_batch, *births)
+
+        if n <= args.scalar_limit:
+            scalar = timed(run_scalar, *(column.tolist() for column in births))
+            print(f"{n:>9}  {n / scalar:>14,.0f}  {n / batch:>14,.0f}  {scalar / batch:>7.1f}x")
+        else:
+            print(f"{n:>9}  {'-':>14}  {n / batch:>14,.0f}  {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: full vs summary view of a character list page.
+
+For each view, measures the bytes PostgREST would send for a page (the
+selected columns) and the bytes of the API response, and the time to decode
+the rows, build the response models and serialize them.
+
+Usage (from backend/):
+    python benchmarks/bench_character_list_view.py [--page-size 20 100] [--repeat 200]
+"""
+
+import argparse
+import json
+import time
+
+# backend/ on sys.path and placeholder settings; nothing is contacted
+import _env  # noqa: F401
+
+from models.schemas import CharacterCreate, ListView
+from routers.character import (
+    SUMMARY_COLUMNS, _build_character_record, _build_list_response
+)
+from utils.bazi_calculator import calculate_bazi_profile
+
+
+def make_rows(n: int):
+    rows = []
+    for i in range(n):
+        data = CharacterCreate(
+            character_name=f"角色{i}",
+            creation_mode="original",
+            description="一位温柔而坚定的旅人，喜欢在雨夜里讲故事。" * 8,
+            birth_year=1970 + i % 50,
+            birth_month=1 + i % 12,
+            birth_day=1 + i % 28,
+            birth_hour=i % 24,
+            greeting_message="你好，很高兴认识你！今天想聊些什么呢？",
+            personality_traits=["温柔", "坚定", "好奇"],
+            tags=["治愈", "旅行", "故事"],
+            visibility_status="public"
+        )
+        bazi = calculate_bazi_profile(data.birth_year, data.birth_month, data.birth_day, data.birth_hour, 0, "other")
+        rows.append(_build_character_record(
+            f"00000000-0000-4000-8000-{i:012d}", "11111111-1111-4111-8111-111111111111",
+            data, bazi, data.greeting_message, data.birth_hour, 0
+        ))
+    return rows
+
+
+def project(rows, columns: str):
+    if columns == "*":
+        return rows
+    keys = columns.split(",")
+    return [{key: row.get(key) for key in keys} for row in rows]
+
+
+def measure(rows, view: ListView, repeat: int):
+    columns = SUMMARY_COLUMNS if view == ListView.SUMMARY else "*"
+    db_body = json.dumps(project(rows, columns), ensure_ascii=False).encode()
+
+    started = time.perf_counter()
+    for _ in range(repeat):
+        page = json.loads(db_body)
+        response = _build_list_response(page, view, 1000, 1, len(page), None, public=True)
+        api_body = response.model_dump_json().encode()
+    elapsed = (time.perf_counter() - started) / repeat
+    return len(db_body), len(api_body), elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark character list views")
+    parser.add_argument("--page-size", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'page':>5}  {'view':<8}  {'db bytes':>9}  {'api bytes':>9}  {'ms/page':>8}")
+    for size in args.page_size:
+        rows = make_rows(size)
+        results = {view: measure(rows, view, args.repeat) for view in (ListView.FULL, ListView.SUMMARY)}
+        for view, (db_bytes, api_bytes, elapsed) in results.items():
+            print(f"{size:>5}  {view.value:<8}  {db_bytes:>9,}  {api_bytes:>9,}  {elapsed * 1000:>8.3f}")
+        full, summary = results[ListView.FULL], results[ListView.SUMMARY]
+        print(f"{'':>5}  {'ratio':<8}  {full[0] / summary[0]:>8.1f}x  {full[1] / summary[1]:>8.1f}x  {full[2] / summary[2]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Microbenchmarks for the pure-Python hot spots: BaZi computation and the
+response models every character and profile endpoint builds.
+
+Each case times one batch at a realistic size. A run calibrates the number of
+loops so a sample takes at least `--min-time`, with GC off as in timeit, and
+takes `--repeat` samples after a warmup. It reports the median and
+interquartile range per batch and per item. A separate untimed run under
+tracemalloc records the peak traced memory and the net bytes still held
+afterwards.
+
+Baselines are plain JSON: `--save FILE` writes this run, and `--compare FILE`
+prints the change in median per case. A change inside the combined IQR of
+the two runs is reported as noise.
+
+Usage (from backend/):
+    python benchmarks/bench_micro.py [--filter response] [--repeat 15] [--min-time 0.2]
+        [--save before.json] [--compare before.json]
+"""
+
+from typing import Callable, Dict, List, Tuple
+import argparse
+import gc
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+
+# backend/ on sys.path and placeholder settings; nothing is contacted
+import _env  # noqa: F401
+
+from models.schemas import BaZiProfileResponse, CharacterCreate
+from routers.character import _build_character_record, _build_character_response
+from utils.bazi_calculator import BaZiCalculator, calculate_bazi_profile
+
+TIMESTAMP = "2024-05-01T12:00:00+00:00"
+
+
+def birth_times(n: int, years: Tuple[int, int], seed: int = 42) -> List[Tuple]:
+    rng = random.Random(seed)
+    return [
+        (rng.randint(*years), rng.randint(1, 12), rng.randint(1, 28), rng.randint(0, 23),
+         rng.randint(0, 59), rng.choice(("male", "female")))
+        for _ in range(n)
+    ]
+
+
+def character_rows(n: int) -> List[Dict]:
+    rows = []
+    for i, (year, month, day, hour, minute, gender) in enumerate(birth_times(n, (1950, 2010))):
+        data = CharacterCreate(
+            character_name=f"角色{i}",
+            creation_mode="original",
+            description="一位温柔而坚定的旅人，喜欢在雨夜里讲故事。" * 4,
+            birth_year=year, birth_month=month, birth_day=day, birth_hour=hour, birth_minute=minute,
+            gender=gender,
+            greeting_message="你好，很高兴认识你！今天想聊些什么呢？",
+            personality_traits=["温柔", "坚定", "好奇"],
+            tags=["治愈", "旅行", "故事"],
+            visibility_status="public"
+        )
+        bazi = calculate_bazi_profile(year, month, day, hour, minute, gender)
+        row = _build_character_record(
+            f"00000000-0000-4000-8000-{i:012d}", "11111111-1111-4111-8111-111111111111",
+            data, bazi, data.greeting_message, hour, minute
+        )
+        # As PostgREST returns it: JSON round trip plus server-set columns
+        rows.append({**json.loads(json.dumps(row, ensure_ascii=False)), "created_at": TIMESTAMP, "updated_at": TIMESTAMP})
+    return rows
+
+
+def profile_rows(n: int) -> List[Dict]:
+    rows = []
+    for i, (year, month, day, hour, minute, gender) in enumerate(birth_times(n, (1950, 2010), seed=7)):
+        bazi = calculate_bazi_profile(year, month, day, hour, minute, gender)
+        rows.append({
+            "id": f"00000000-0000-4000-9000-{i:012d}", "user_id": f"00000000-0000-4000-a000-{i:012d}",
+            "birth_year": year, "birth_month": month, "birth_day": day,
+            "birth_hour": hour, "birth_minute": minute, "gender": gender,
+            "day_master": bazi["day_master"], "bazi_string": bazi["bazi_string"],
+            "primary_element": bazi["primary_element"], "personality_summary": bazi["personality_summary"],
+            "bazi_data": json.loads(json.dumps(bazi, ensure_ascii=False)),
+            "created_at": TIMESTAMP, "updated_at": TIMESTAMP,
+        })
+    return rows
+
+
+def build_profile_response(data: Dict) -> BaZiProfileResponse:
+    """Same construction as GET /api/profile/bazi/me"""
+    bazi_data = data.get("bazi_data", {})
+    return BaZiProfileResponse(
+        id=data["id"],
+        user_id=data["user_id"],
+        birth_year=data["birth_year"],
+        birth_month=data["birth_month"],
+        birth_day=data["birth_day"],
+        birth_hour=data["birth_hour"],
+        birth_minute=data["birth_minute"],
+        gender=data["gender"],
+        year_pillar=bazi_data.get("year_pillar", {}),
+        month_pillar=bazi_data.get("month_pillar", {}),
+        day_pillar=bazi_data.get("day_pillar", {}),
+        hour_pillar=bazi_data.get("hour_pillar", {}),
+        day_master=data["day_master"],
+        bazi_string=data["bazi_string"],
+        primary_element=data.get("primary_element"),
+        personality_summary=data.get("personality_summary"),
+        created_at=data["created_at"],
+        updated_at=data["updated_at"]
+    )
+
+
+def cases() -> Dict[str, Tuple[Callable[[], object], int]]:
+    """name -> (function running one batch, items per batch)"""
+    births = birth_times(10000, (1950, 2010))
+    profiles = [(calculate_bazi_profile(*args), args[-1]) for args in births]
+    stems = [p["day_master"] for p, _ in profiles]
+    page_20 = character_rows(20)
+    page_100 = character_rows(100)
+    profile_page = profile_rows(100)
+
+    calculate = calculate_bazi_profile
+    summarize = BaZiCalculator.generate_personality_summary
+    element_of = BaZiCalculator.get_element_from_stem
+
+    return {
+        "bazi.calculate_profile x10k": (lambda: [calculate(*args) for args in births], 10000),
+        "bazi.personality_summary x10k": (lambda: [summarize(p, gender) for p, gender in profiles], 10000),
+        "bazi.element_from_stem x10k": (lambda: [element_of(s) for s in stems], 10000),
+        "response.bazi_profile x100": (lambda: [build_profile_response(r) for r in profile_page], 100),
+        "response.character x20": (lambda: [_build_character_response(r) for r in page_20], 20),
+        "response.character x100": (lambda: [_build_character_response(r) for r in page_100], 100),
+        "response.character+json x20": (
+            lambda: [_build_character_response(r).model_dump_json() for r in page_20], 20
+        ),
+    }
+
+
+def time_case(func: Callable, min_time: float, repeat: int) -> List[float]:
+    """Seconds per batch for each of `repeat` samples"""
+    func()  # Warmup
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        if time.perf_counter() - started >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2
+
+    samples = []
+    gc_was_enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(loops):
+                func()
+            samples.append((time.perf_counter() - started) / loops)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return samples
+
+
+def memory_case(func: Callable) -> Tuple[int, int]:
+    """(peak traced bytes during one batch, bytes still held after it)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+        del result
+        gc.collect()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - before, retained - before
+
+
+def quartiles(samples: List[float]) -> Tuple[float, float, float]:
+    q1, median, q3 = statistics.quantiles(samples, n=4, method="inclusive")
+    return q1, median, q3
+
+
+def compare(results: Dict, baseline: Dict) -> None:
+    print(f"\nvs {baseline['meta'].get('label') or 'baseline'} ({baseline['meta']['timestamp']})")
+    print(f"  {'case':<42}  {'before':>10}  {'after':>10}  {'change':>8}")
+    for name, r in results.items():
+        old = baseline["cases"].get(name)
+        if old is None:
+            continue
+        change = (r["median_s"] - old["median_s"]) / old["median_s"] * 100
+        noise = (r["iqr_s"] + old["iqr_s"]) / old["median_s"] * 100
+        verdict = "" if abs(change) > noise else "  (noise)"
+        print(f"  {name:<42}  {old['median_s'] * 1e3:>8.3f}ms  {r['median_s'] * 1e3:>8.3f}ms  "
+              f"{change:>+7.1f}%{verdict}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for BaZi and response models")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=15, help="timed samples per case")
+    parser.add_argument("--min-time", type=float, default=0.2, help="minimum seconds per sample")
+    parser.add_argument("--label", help="name stored with --save, e.g. a commit")
+    parser.add_argument("--save", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    results = {}
+    print(f"  {'case':<42}  {'median':>10}  {'iqr':>7}  {'per item':>10}  {'peak mem':>9}  {'retained':>9}")
+    for name, (func, items) in cases().items():
+        if args.filter not in name:
+            continue
+        samples = time_case(func, args.min_time, args.repeat)
+        q1, median, q3 = quartiles(samples)
+        peak, retained = memory_case(func)
+        results[name] = {
+            "items": items,
+            "median_s": median,
+            "iqr_s": q3 - q1,
+            "min_s": min(samples),
+            "per_item_ns": median / items * 1e9,
+            "peak_bytes": peak,
+            "retained_bytes": retained,
+            "samples_s": samples,
+        }
+        print(f"  {name:<42}  {median * 1e3:>8.3f}ms  {(q3 - q1) / median * 100:>6.1f}%  "
+              f"{median / items * 1e9:>8.0f}ns  {peak / 1024:>7.0f}KB  {retained / 1024:>7.0f}KB")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+    if args.save:
+        meta = {
+            "label": args.label,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+            "min_time": args.min_time,
+        }
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "cases": results}, f, indent=2)
+        print(f"\nResults written to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
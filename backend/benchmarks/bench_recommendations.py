@@ -0,0 +1,94 @@
+"""
+Benchmark: top-k compatibility recommendations over the in-memory index.
+
+Fills a RecommendationIndex with random charts, checks that its vectorized
+scores equal score_compatibility for a sample of rows, then times top-k
+queries against the index and against scoring every character one by one.
+
+Usage (from backend/):
+    python benchmarks/bench_recommendations.py [--sizes 100000 1000000] [--k 10] [--queries 20]
+"""
+
+import argparse
+import random
+import time
+
+# backend/ on sys.path and placeholder settings; nothing is contacted
+import _env  # noqa: F401
+
+from utils.bazi_calculator import HEAVENLY_STEMS, EARTHLY_BRANCHES
+from utils.compatibility import PILLARS, score_compatibility
+from utils.recommendations import RecommendationIndex, SUB_SCORES
+
+
+def random_chart(rng: random.Random):
+    return tuple([rng.randrange(10) for _ in range(4)] + [rng.randrange(12) for _ in range(4)])
+
+
+def chart_row(chart):
+    row = {f"{pillar}_stem": HEAVENLY_STEMS[chart[i]] for i, pillar in enumerate(PILLARS)}
+    row.update({f"{pillar}_branch": EARTHLY_BRANCHES[chart[4 + i]] for i, pillar in enumerate(PILLARS)})
+    return row
+
+
+def build_index(size: int, rng: random.Random):
+    index = RecommendationIndex(refresh_interval=0)
+    charts = []
+    started = time.perf_counter()
+    for i in range(size):
+        chart = random_chart(rng)
+        charts.append(chart)
+        index.add(f"c{i}", chart_row(chart))
+    return index, charts, time.perf_counter() - started
+
+
+def check_parity(index: RecommendationIndex, charts, rng: random.Random, queries: int, sample: int):
+    count = len(index)
+    for _ in range(queries):
+        user = random_chart(rng)
+        scores = index._state.score(user)
+        for row in rng.sample(range(count), min(sample, count)):
+            expected = score_compatibility(user, charts[row])
+            assert scores["compatibility_score"][row] == expected["compatibility_score"], (user, charts[row])
+            for name in SUB_SCORES:
+                assert scores[name][row] == expected["sub_scores"][name], (name, user, charts[row])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark top-k recommendations")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--scalar-limit", type=int, default=100000,
+                        help="Skip the one-by-one baseline above this size")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'size':>9}  {'build s':>8}  {'top-k ms':>9}  {'scalar ms':>10}  {'speedup':>8}")
+    for size in args.sizes:
+        index, charts, build_time = build_index(size, rng)
+        check_parity(index, charts, rng, queries=5, sample=2000)
+
+        users = [random_chart(rng) for _ in range(args.queries)]
+        started = time.perf_counter()
+        for user in users:
+            top = index.top_k(user, args.k)
+        vector_ms = (time.perf_counter() - started) / len(users) * 1000
+
+        if size <= args.scalar_limit:
+            # One by one, as the per-character endpoint would score them
+            user = users[-1]
+            started = time.perf_counter()
+            scalar = sorted(
+                (score_compatibility(user, chart)["compatibility_score"] for chart in charts),
+                reverse=True
+            )[:args.k]
+            scalar_ms = (time.perf_counter() - started) * 1000
+            assert [item["compatibility_score"] for item in top] == scalar
+            print(f"{size:>9,}  {build_time:>8.2f}  {vector_ms:>9.2f}  {scalar_ms:>10.1f}  {scalar_ms / vector_ms:>7.0f}x")
+        else:
+            print(f"{size:>9,}  {build_time:>8.2f}  {vector_ms:>9.2f}  {'-':>10}  {'-':>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Benchmark: gallery search over the in-memory inverted index.
+
+Builds a SearchIndex over synthetic Chinese characters (names, tags, traits
+and descriptions drawn from a fixed vocabulary), then reports query latency
+percentiles per query shape next to a linear substring scan, the in-process
+equivalent of an `ilike` query over the same rows.
+
+Usage (from backend/):
+    python benchmarks/bench_search.py [--sizes 10000 100000] [--queries 200]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+# backend/ on sys.path and placeholder settings; nothing is contacted
+import _env  # noqa: F401
+
+from utils.search_index import SearchIndex
+
+WORDS = (
+    "温柔 坚定 好奇 冷静 热情 孤独 勇敢 善良 神秘 聪明 倔强 乐观 安静 骄傲 浪漫 "
+    "旅人 剑客 学者 画家 诗人 医生 歌手 侦探 厨师 船长 魔法师 猎人 商人 书生 将军 "
+    "雨夜 星空 山林 海边 古城 长安 江湖 校园 未来 宫廷 沙漠 雪原 咖啡馆 图书馆 "
+    "喜欢 讲故事 守护 寻找 等待 记得 相信 梦想 秘密 约定 回忆 远方 朋友 家人 音乐"
+).split()
+TAGS = "治愈 旅行 武侠 校园 科幻 古风 悬疑 恋爱 奇幻 搞笑 历史 职场".split()
+ELEMENTS = "木火土金水"
+MODES = ("real_person", "original", "concept", "virtual_ip")
+GENDERS = ("male", "female", "other")
+
+
+def make_row(rng: random.Random, i: int):
+    return {
+        "character_name": "".join(rng.sample(WORDS, 2)) + str(i),
+        "tags": rng.sample(TAGS, 3),
+        "personality_traits": rng.sample(WORDS[:15], 3),
+        "description": "，".join("".join(rng.sample(WORDS, 4)) for _ in range(rng.randint(3, 12))) + "。",
+        "primary_element": rng.choice(ELEMENTS),
+        "creation_mode": rng.choice(MODES),
+        "gender": rng.choice(GENDERS),
+    }
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return (
+        statistics.median(samples) * 1000,
+        samples[int(len(samples) * 0.95) - 1] * 1000,
+    )
+
+
+def linear_scan(rows, needle: str, limit: int = 20):
+    """Substring match on every row, like `ilike '%needle%'` over each column"""
+    matches = []
+    for character_id, row in rows:
+        if (needle in row["character_name"] or needle in row["description"]
+                or any(needle in tag for tag in row["tags"])
+                or any(needle in trait for trait in row["personality_traits"])):
+            matches.append(character_id)
+    return matches[:limit], len(matches)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark gallery search")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    shapes = {
+        "one word": lambda: {"query": rng.choice(WORDS)},
+        "two words": lambda: {"query": " ".join(rng.sample(WORDS, 2))},
+        "phrase": lambda: {"query": "".join(rng.sample(WORDS, 3))},
+        "one char": lambda: {"query": rng.choice(rng.choice(WORDS))},
+        "word + filters": lambda: {"query": rng.choice(WORDS), "filters": {
+            "primary_element": rng.choice(ELEMENTS), "gender": rng.choice(GENDERS)}},
+        "tag only": lambda: {"query": "", "tag": rng.choice(TAGS)},
+    }
+
+    for size in args.sizes:
+        rows = [(f"c{i}", make_row(rng, i)) for i in range(size)]
+        index = SearchIndex(refresh_interval=0)
+        started = time.perf_counter()
+        for character_id, row in rows:
+            index.add(character_id, row)
+        build = time.perf_counter() - started
+
+        state = index._state
+        postings = sum(len(p.docs) for p in state.terms.values())
+        print(f"\n{size:,} characters: built in {build:.2f}s, {len(state.terms):,} terms, "
+              f"{postings:,} postings ({postings * 6 / 2**20:.1f} MiB of posting arrays)")
+        print(f"  {'query':<16}  {'p50 ms':>7}  {'p95 ms':>7}  {'avg hits':>9}")
+
+        for shape, make in shapes.items():
+            timings, hits = [], []
+            for _ in range(args.queries):
+                query = make()
+                started = time.perf_counter()
+                _, total = index.search(**query)
+                timings.append(time.perf_counter() - started)
+                hits.append(total)
+            p50, p95 = percentiles(timings)
+            print(f"  {shape:<16}  {p50:>7.3f}  {p95:>7.3f}  {statistics.mean(hits):>9.0f}")
+
+        timings = []
+        for _ in range(max(5, args.queries // 20)):
+            needle = rng.choice(WORDS)
+            started = time.perf_counter()
+            linear_scan(rows, needle)
+            timings.append(time.perf_counter() - started)
+        p50, p95 = percentiles(timings)
+        print(f"  {'linear scan':<16}  {p50:>7.3f}  {p95:>7.3f}")
+
+        # Churn: edits tombstone and re-append; the refresh task compacts them off the request path
+        started = time.perf_counter()
+        for character_id, row in rng.sample(rows, size // 2):
+            index.add(character_id, row)
+        print(f"  re-indexed {size // 2:,} edits in {time.perf_counter() - started:.2f}s, "
+              f"{index._state.dead:,} tombstones")
+        started = time.perf_counter()
+        asyncio.run(index.compact())
+        print(f"  compacted in a thread in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,14 +15,114 @@ class Settings(BaseSettings):
     SUPABASE_URL: str
     SUPABASE_ANON_KEY: str
     SUPABASE_SERVICE_KEY: str
+    SUPABASE_JWT_SECRET: Optional[str] = None  # Unset: every token is checked with Supabase Auth
+
+    # Database connection pool (PostgREST over HTTP)
+    DB_POOL_MAX_CONNECTIONS: int = 100
+    DB_POOL_MAX_KEEPALIVE: int = 20
+    DB_POOL_KEEPALIVE_EXPIRY: float = 30.0
+    DB_CONNECT_TIMEOUT: float = 5.0
+    DB_READ_TIMEOUT: float = 15.0
+    DB_POOL_TIMEOUT: float = 5.0  # Max wait for a free connection
+    DB_HTTP2: bool = False
     
     # OpenAI
     OPENAI_API_KEY: str
+    OPENAI_TIMEOUT_SECONDS: float = 60.0
+    OPENAI_MAX_CONCURRENCY: int = 16  # Concurrent upstream calls per worker
+    OPENAI_MAX_QUEUE: int = 64  # Callers allowed to wait for a slot
+    OPENAI_QUEUE_TIMEOUT_SECONDS: float = 10.0
+    OPENAI_RETRY_AFTER_SECONDS: int = 5
+    
+    # LLM provider: "openai", "cassette" (record/replay) or "stub" (local, deterministic)
+    LLM_PROVIDER: str = "openai"
+    LLM_MODEL: str = "gpt-3.5-turbo"
+    LLM_CASSETTE_PATH: str = "utils/data/llm_cassette.jsonl"
+    LLM_CASSETTE_MODE: str = "replay"  # "record" sends misses to OpenAI and appends them
+    LLM_STUB_LATENCY_DISTRIBUTION: str = "lognormal"  # constant, uniform, exponential or lognormal
+    LLM_STUB_LATENCY_MS: float = 800.0  # Time to first token (median for lognormal, mean otherwise)
+    LLM_STUB_LATENCY_SPREAD: float = 0.5  # uniform: +/- fraction of the latency; lognormal: sigma
+    LLM_STUB_TOKEN_DELAY_MS: float = 20.0
+    LLM_STUB_SEED: int = 0
+    COMPATIBILITY_ADVICE_CACHE_SIZE: int = 10000  # AI-phrased advice kept per chart pair
+    COMPATIBILITY_ADVICE_CACHE_TTL_SECONDS: float = 86400.0
+    
+    # LLM completion cache (content-keyed; see utils/completion_cache.py)
+    COMPLETION_CACHE_ENABLED: bool = True
+    COMPLETION_CACHE_MAX_SIZE: int = 10000  # Memory tier entries per worker
+    COMPLETION_CACHE_TTL_SECONDS: float = 604800.0  # 7 days
+    COMPLETION_CACHE_PATH: str = ""  # Disk tier SQLite file, e.g. /var/cache/app/completions.sqlite3; empty for memory only
+    COMPLETION_CACHE_DISK_MAX_ROWS: int = 200000
+    COMPLETION_CACHE_MAX_TEMPERATURE: float = 1.0  # Calls sampled hotter than this always hit the API
+    
+    # Chat context
+    CHAT_CONTEXT_TOKEN_BUDGET: int = 2000  # Summary + recent turns + new message
+    CHAT_HISTORY_MAX_TURNS: int = 20  # Recent turns kept verbatim at most
+    CHAT_SUMMARY_FOLD_TURNS: int = 6  # Fold older turns into the summary in batches of this size
+    CHAT_SUMMARY_MAX_TOKENS: int = 300
+    CHAT_CACHE_MAX_CONVERSATIONS: int = 10000  # Conversation tails kept in memory
+    CHAT_CACHE_IDLE_SECONDS: float = 1800.0
+    
+    # Prometheus metrics on /metrics (see utils/metrics.py)
+    METRICS_ENABLED: bool = True
+    
+    # Character cache
+    CHARACTER_CACHE_MAX_SIZE: int = 5000
+    CHARACTER_CACHE_TTL_SECONDS: float = 60.0
+    CHARACTER_CACHE_NEGATIVE_TTL_SECONDS: float = 10.0
+    PERSONA_CACHE_MAX_SIZE: int = 5000  # Compiled chat personas kept in memory
+    
+    # List pagination
+    LIST_TOTAL_CACHE_MAX_SIZE: int = 10000
+    LIST_TOTAL_CACHE_TTL_SECONDS: float = 30.0  # How stale a list total may be
+    
+    # Public gallery response cache
+    PUBLIC_LIST_CACHE_MAX_SIZE: int = 1000  # Cached pages
+    PUBLIC_LIST_CACHE_TTL_SECONDS: float = 15.0
+    PUBLIC_LIST_MAX_AGE_SECONDS: int = 5  # Cache-Control max-age for clients
+    
+    # Compatibility recommendations
+    RECOMMENDATION_REFRESH_SECONDS: float = 300.0  # Full reload, picks up other workers' writes
+    RECOMMENDATION_MAX_K: int = 50
+    
+    # Gallery search
+    SEARCH_INDEX_REFRESH_SECONDS: float = 300.0  # Full reload, picks up other workers' writes
+    
+    # Write-behind counters
+    COUNTER_FLUSH_INTERVAL_SECONDS: float = 5.0
+    
+    # Write-behind chat persistence
+    CHAT_WRITE_BEHIND: bool = False
+    CHAT_WRITE_QUEUE_SHARDS: int = 4
+    CHAT_WRITE_QUEUE_MAX: int = 1000
+    CHAT_WRITE_BATCH_SIZE: int = 50
+    CHAT_WRITE_MAX_RETRIES: int = 5
+    CHAT_WRITE_RETRY_BACKOFF_SECONDS: float = 0.5
+    CHAT_WRITE_DRAIN_TIMEOUT_SECONDS: float = 30.0
+    
+    # Bulk character import
+    CHARACTER_IMPORT_CHUNK_SIZE: int = 500  # Rows per batch insert
+    CHARACTER_IMPORT_MAX_ROWS: int = 100000
+    CHARACTER_IMPORT_MAX_LINE_BYTES: int = 65536  # Also caps a CSV record whose quoted cells span lines
+    
+    # Background greeting generation
+    GREETING_WORKER_CONCURRENCY: int = 4  # Greeting generations in flight
+    GREETING_QUEUE_MAX_SIZE: int = 1000  # Beyond this, new rows wait for the recovery sweep
+    GREETING_MAX_RETRIES: int = 3
+    GREETING_RETRY_BACKOFF_SECONDS: float = 1.0
+    GREETING_RECOVERY_AGE_SECONDS: float = 300.0  # Pending this long -> re-queued by the sweep
+    GREETING_RECOVERY_INTERVAL_SECONDS: float = 60.0
+    GREETING_DRAIN_TIMEOUT_SECONDS: float = 10.0
+    GREETING_POLL_MAX_WAIT_SECONDS: int = 30
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440  # 24 hours
+    JWT_AUDIENCE: str = "authenticated"
+    AUTH_CACHE_MAX_SIZE: int = 10000
+    AUTH_CACHE_TTL_SECONDS: float = 300.0
+    AUTH_REJECT_CACHE_TTL_SECONDS: float = 30.0
     
     # CORS
     CORS_ORIGINS: list = [
@@ -1,13 +1,305 @@
+"""
+Database access.
+
+Table queries go through `AsyncDatabase`, a small async PostgREST client built
+on a pooled keep-alive `httpx.AsyncClient`, so handlers never block the event
+loop on a query. The query builder mirrors the supabase-py API, with an
+awaitable `execute()`:
+
+    db = get_supabase()
+    result = await db.table("characters").select("*").eq("id", character_id).execute()
+
+The synchronous supabase client is only kept for Supabase Auth calls.
+"""
+
 from supabase import create_client, Client
 from config import settings
+from typing import Any, Dict, List, Optional
+from utils.metrics import supabase_query_errors, supabase_query_seconds
+import httpx
+import json
+import time
+
+
+class DatabaseError(Exception):
+    """Error returned by PostgREST"""
+
+    def __init__(self, message: str, code: Optional[str] = None, details: Any = None, status_code: int = 500):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.details = details
+        self.status_code = status_code
+
+
+class QueryResponse:
+    """Result of an executed query"""
+
+    def __init__(self, data: List[Dict], count: Optional[int] = None):
+        self.data = data
+        self.count = count
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if value is None:
+        return "null"
+    return str(value)
+
+
+def _quote(value: Any) -> str:
+    value = _format_value(value)
+    if any(c in value for c in ',()"\\ '):
+        value = value.replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{value}"'
+    return value
+
+
+class AsyncQueryBuilder:
+    """Chainable PostgREST request for one table"""
+
+    def __init__(self, db: "AsyncDatabase", path: str):
+        self._db = db
+        self._path = path
+        self._method = "GET"
+        self._operation = "select"  # Metrics label
+        self._params: List[tuple] = []
+        self._prefer: List[str] = []
+        self._order: List[str] = []
+        self._body: Any = None
+
+    # Operations
+
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "AsyncQueryBuilder":
+        self._method = "GET"
+        self._params.append(("select", columns.replace(" ", "")))
+        if count:
+            self._prefer.append(f"count={count}")
+        return self
+
+    def insert(self, data: Any, returning: str = "representation") -> "AsyncQueryBuilder":
+        self._method = "POST"
+        self._operation = "insert"
+        self._body = data
+        self._prefer.append(f"return={returning}")
+        return self
+
+    def upsert(self, data: Any, on_conflict: Optional[str] = None, returning: str = "representation") -> "AsyncQueryBuilder":
+        self.insert(data, returning=returning)
+        self._operation = "upsert"
+        self._prefer.append("resolution=merge-duplicates")
+        if on_conflict:
+            self._params.append(("on_conflict", on_conflict))
+        return self
+
+    def update(self, data: Dict, returning: str = "representation") -> "AsyncQueryBuilder":
+        self._method = "PATCH"
+        self._operation = "update"
+        self._body = data
+        self._prefer.append(f"return={returning}")
+        return self
+
+    def delete(self, returning: str = "representation") -> "AsyncQueryBuilder":
+        self._method = "DELETE"
+        self._operation = "delete"
+        self._prefer.append(f"return={returning}")
+        return self
+
+    # Filters
+
+    def _filter(self, column: str, operator: str, value: Any) -> "AsyncQueryBuilder":
+        self._params.append((column, f"{operator}.{value}"))
+        return self
+
+    def eq(self, column: str, value: Any) -> "AsyncQueryBuilder":
+        return self._filter(column, "eq", _format_value(value))
+
+    def neq(self, column: str, value: Any) -> "AsyncQueryBuilder":
+        return self._filter(column, "neq", _format_value(value))
+
+    def gt(self, column: str, value: Any) -> "AsyncQueryBuilder":
+        return self._filter(column, "gt", _format_value(value))
+
+    def gte(self, column: str, value: Any) -> "AsyncQueryBuilder":
+        return self._filter(column, "gte", _format_value(value))
+
+    def lt(self, column: str, value: Any) -> "AsyncQueryBuilder":
+        return self._filter(column, "lt", _format_value(value))
 
-# Initialize Supabase client
+    def lte(self, column: str, value: Any) -> "AsyncQueryBuilder":
+        return self._filter(column, "lte", _format_value(value))
+
+    def is_(self, column: str, value: Any) -> "AsyncQueryBuilder":
+        return self._filter(column, "is", _format_value(value))
+
+    def in_(self, column: str, values: List[Any]) -> "AsyncQueryBuilder":
+        return self._filter(column, "in", "(" + ",".join(_quote(v) for v in values) + ")")
+
+    def or_(self, filters: str) -> "AsyncQueryBuilder":
+        """Raw PostgREST `or` filter, e.g. "a.eq.1,b.gt.2" """
+        self._params.append(("or", f"({filters})"))
+        return self
+
+    # Modifiers
+
+    def order(self, column: str, desc: bool = False) -> "AsyncQueryBuilder":
+        self._order.append(f"{column}.{'desc' if desc else 'asc'}")
+        return self
+
+    def limit(self, count: int) -> "AsyncQueryBuilder":
+        self._params.append(("limit", str(count)))
+        return self
+
+    def range(self, start: int, end: int) -> "AsyncQueryBuilder":
+        self._params.append(("offset", str(start)))
+        self._params.append(("limit", str(end - start + 1)))
+        return self
+
+    async def execute(self) -> QueryResponse:
+        params = list(self._params)
+        if self._order:
+            params.append(("order", ",".join(self._order)))
+
+        headers = {}
+        if self._prefer:
+            headers["Prefer"] = ",".join(self._prefer)
+
+        table = self._path.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        try:
+            response = await self._db.request(
+                self._method,
+                self._path,
+                params=params,
+                headers=headers,
+                json_body=self._body
+            )
+        except Exception:
+            supabase_query_errors.inc(table, self._operation)
+            raise
+        finally:
+            supabase_query_seconds.observe(time.perf_counter() - started, table, self._operation)
+        return QueryResponse(
+            data=_decode_body(response),
+            count=_parse_count(response.headers.get("content-range"))
+        )
+
+
+def _decode_body(response: httpx.Response) -> List[Dict]:
+    if not response.content:
+        return []
+    data = response.json()
+    if isinstance(data, list):
+        return data
+    return [data] if data is not None else []
+
+
+def _parse_count(content_range: Optional[str]) -> Optional[int]:
+    """Parse the total out of a Content-Range header like "0-19/123" """
+    if not content_range or "/" not in content_range:
+        return None
+    total = content_range.rsplit("/", 1)[1]
+    return int(total) if total.isdigit() else None
+
+
+class AsyncDatabase:
+    """Async PostgREST client sharing one pooled HTTP connection pool"""
+
+    def __init__(self, url: str, key: str):
+        self.rest_url = f"{url.rstrip('/')}/rest/v1"
+        self.key = key
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.rest_url,
+                headers={
+                    "apikey": self.key,
+                    "Authorization": f"Bearer {self.key}",
+                    "Accept": "application/json",
+                },
+                limits=httpx.Limits(
+                    max_connections=settings.DB_POOL_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.DB_POOL_MAX_KEEPALIVE,
+                    keepalive_expiry=settings.DB_POOL_KEEPALIVE_EXPIRY
+                ),
+                timeout=httpx.Timeout(
+                    settings.DB_READ_TIMEOUT,
+                    connect=settings.DB_CONNECT_TIMEOUT,
+                    pool=settings.DB_POOL_TIMEOUT
+                ),
+                http2=settings.DB_HTTP2
+            )
+        return self._client
+
+    def table(self, name: str) -> AsyncQueryBuilder:
+        return AsyncQueryBuilder(self, f"/{name}")
+
+    def rpc(self, function: str, params: Optional[Dict] = None) -> AsyncQueryBuilder:
+        """Call a Postgres function exposed by PostgREST"""
+        query = AsyncQueryBuilder(self, f"/rpc/{function}")
+        query._method = "POST"
+        query._operation = "rpc"
+        query._body = params or {}
+        return query
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[List[tuple]] = None,
+        headers: Optional[Dict] = None,
+        json_body: Any = None
+    ) -> httpx.Response:
+        client = self._get_client()
+        headers = dict(headers or {})
+        if json_body is not None:
+            headers["Content-Type"] = "application/json"
+
+        response = await client.request(
+            method,
+            path,
+            params=params,
+            headers=headers,
+            content=json.dumps(json_body, default=str) if json_body is not None else None
+        )
+        if response.status_code >= 400:
+            try:
+                error = response.json()
+            except ValueError:
+                error = {"message": response.text}
+            raise DatabaseError(
+                error.get("message", "Database request failed"),
+                code=error.get("code"),
+                details=error.get("details"),
+                status_code=response.status_code
+            )
+        return response
+
+    async def aclose(self):
+        """Close the connection pool"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Async data-access layer used by the routers
+db = AsyncDatabase(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+
+# Supabase client, used for Supabase Auth only
 supabase: Client = create_client(
     settings.SUPABASE_URL,
     settings.SUPABASE_SERVICE_KEY
 )
 
-def get_supabase() -> Client:
-    """Get Supabase client instance"""
-    return supabase
 
+def get_supabase() -> AsyncDatabase:
+    """Get the async database client"""
+    return db
+
+
+def get_auth_client() -> Client:
+    """Get Supabase client instance (for Supabase Auth calls)"""
+    return supabase
@@ -0,0 +1,309 @@
+"""
+In-memory stand-in for the parts of Supabase the backend uses.
+
+Serves the GoTrue endpoints behind register/login (`/auth/v1/...`) and a
+PostgREST subset (`/rest/v1/<table>` and `/rest/v1/rpc/<fn>`): the filters
+the query builder in database.py emits (eq, neq, gt, gte, lt, lte, is, in,
+or/and groups), `select` with one level of embedding, `order`, `limit`,
+`offset`, `Prefer: count=...`, `return=...` and upserts. Access tokens are
+HS256 JWTs signed with `secret`, so the app verifies them locally exactly as
+it does against real Supabase.
+
+Not a database: there are no constraints, types or row-level security, and
+filters scan the table. `latency_ms` delays every response to stand in for
+the network round trip.
+"""
+
+from datetime import datetime, timezone
+from jose import jwt
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+from typing import Dict, List, Optional
+import asyncio
+import json
+import time
+import uuid
+
+# Embedded resource name -> foreign key column on the parent row
+_EMBED_KEYS = {"characters": "character_id", "users": "user_id"}
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _split_top(text: str) -> List[str]:
+    """Split on commas outside parentheses and double quotes"""
+    parts, depth, current, quoted = [], 0, "", False
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        if char == "," and depth == 0 and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _unquote(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1].replace('\\"', '"').replace("\\\\", "\\")
+    return value
+
+
+def _as_text(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _ordered(a, b):
+    """Compare numerically when both sides are numbers"""
+    try:
+        return float(a), float(b)
+    except (TypeError, ValueError):
+        return str(a), str(b)
+
+
+def _match(row: Dict, column: str, op: str, value: str) -> bool:
+    actual = row.get(column)
+    if op == "eq":
+        return _as_text(actual) == value
+    if op == "neq":
+        return actual is not None and _as_text(actual) != value
+    if op == "is":
+        return _as_text(actual) == (None if value == "null" else value)
+    if op == "in":
+        return _as_text(actual) in {_unquote(v) for v in _split_top(value[1:-1])}
+    if actual is None:
+        return False
+    a, b = _ordered(actual, value)
+    return {"gt": a > b, "gte": a >= b, "lt": a < b, "lte": a <= b}[op]
+
+
+def _match_expr(row: Dict, expr: str) -> bool:
+    """`col.op.value`, or a nested `and(...)` / `or(...)` group"""
+    if expr.startswith(("and(", "or(")):
+        kind, inner = expr.split("(", 1)
+        results = (_match_expr(row, part) for part in _split_top(inner[:-1]))
+        return all(results) if kind == "and" else any(results)
+    column, op, value = expr.split(".", 2)
+    return _match(row, column, op, _unquote(value))
+
+
+class FakeSupabase:
+    """Tables, users and RPC functions behind a Starlette app"""
+
+    def __init__(self, secret: str, latency_ms: float = 0.0):
+        self.secret = secret
+        self.latency = latency_ms / 1000
+        self.tables: Dict[str, List[Dict]] = {}
+        self.users: Dict[str, Dict] = {}
+        self.requests = 0
+        self.rpc = {
+            "increment_interaction_counts": self._increment_interaction_counts,
+            "claim_pending_greetings": self._claim_pending_greetings,
+            "touch_pending_greetings": self._touch_pending_greetings,
+        }
+        self.app = Starlette(routes=[
+            Route("/auth/v1/signup", self._signup, methods=["POST"]),
+            Route("/auth/v1/token", self._token, methods=["POST"]),
+            Route("/auth/v1/user", self._user, methods=["GET"]),
+            Route("/auth/v1/logout", self._logout, methods=["POST"]),
+            Route("/rest/v1/rpc/{function}", self._call_rpc, methods=["POST"]),
+            Route("/rest/v1/{table}", self._rest, methods=["GET", "POST", "PATCH", "DELETE"]),
+        ])
+
+    async def _delay(self) -> None:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    # Auth
+
+    def _session(self, user: Dict) -> Dict:
+        expires_at = int(time.time()) + 3600
+        token = jwt.encode({
+            "sub": user["id"], "aud": "authenticated", "role": "authenticated",
+            "email": user["email"], "exp": expires_at
+        }, self.secret, algorithm="HS256")
+        return {
+            "access_token": token, "token_type": "bearer", "expires_in": 3600,
+            "expires_at": expires_at, "refresh_token": uuid.uuid4().hex, "user": user
+        }
+
+    async def _signup(self, request: Request) -> Response:
+        await self._delay()
+        body = await request.json()
+        if any(u["email"] == body["email"] for u in self.users.values()):
+            return JSONResponse({"msg": "User already registered", "code": 422}, 422)
+        user = {
+            "id": str(uuid.uuid4()), "aud": "authenticated", "role": "authenticated",
+            "email": body["email"], "app_metadata": {}, "user_metadata": body.get("data", {}),
+            "created_at": _now()
+        }
+        self.users[user["id"]] = {**user, "password": body["password"]}
+        return JSONResponse(self._session(user))
+
+    async def _token(self, request: Request) -> Response:
+        await self._delay()
+        body = await request.json()
+        for stored in self.users.values():
+            if stored["email"] == body.get("email") and stored["password"] == body.get("password"):
+                user = {k: v for k, v in stored.items() if k != "password"}
+                return JSONResponse(self._session(user))
+        return JSONResponse({"error": "invalid_grant", "error_description": "Invalid login credentials"}, 400)
+
+    async def _user(self, request: Request) -> Response:
+        await self._delay()
+        token = request.headers.get("authorization", "").removeprefix("Bearer ")
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=["HS256"], audience="authenticated")
+        except Exception:
+            return JSONResponse({"msg": "Invalid token"}, 401)
+        stored = self.users.get(claims["sub"])
+        if stored is None:
+            return JSONResponse({"msg": "User not found"}, 404)
+        return JSONResponse({k: v for k, v in stored.items() if k != "password"})
+
+    async def _logout(self, request: Request) -> Response:
+        await self._delay()
+        return Response(status_code=204)
+
+    # PostgREST
+
+    def _project(self, row: Dict, select: Optional[str]) -> Dict:
+        if not select or select == "*":
+            return dict(row)
+        projected = {}
+        for part in _split_top(select):
+            if part == "*":
+                projected.update(row)
+            elif "(" in part:
+                name, columns = part.split("(", 1)
+                key = _EMBED_KEYS.get(name, name.rstrip("s") + "_id")
+                target = next((r for r in self.tables.get(name, ()) if r["id"] == row.get(key)), None)
+                projected[name] = self._project(target, columns[:-1]) if target else None
+            else:
+                projected[part] = row.get(part)
+        return projected
+
+    def _filter(self, rows: List[Dict], params: List) -> List[Dict]:
+        for key, value in params:
+            if key in _RESERVED_PARAMS:
+                continue
+            if key in ("or", "and"):
+                rows = [r for r in rows if _match_expr(r, key + value)]
+            else:
+                op, operand = value.split(".", 1)
+                rows = [r for r in rows if _match(r, key, op, operand)]
+        return rows
+
+    async def _rest(self, request: Request) -> Response:
+        await self._delay()
+        rows = self.tables.setdefault(request.path_params["table"], [])
+        params = list(request.query_params.multi_items())
+        options = dict(params)
+        prefer = request.headers.get("prefer", "")
+
+        if request.method == "POST":
+            body = json.loads(await request.body() or b"null")
+            conflict_keys = options.get("on_conflict", "id").split(",")
+            written = []
+            for item in body if isinstance(body, list) else [body]:
+                item = {"id": str(uuid.uuid4()), "created_at": _now(), **item}
+                existing = None
+                if "resolution=merge-duplicates" in prefer:
+                    existing = next(
+                        (r for r in rows if all(r.get(k) == item.get(k) for k in conflict_keys)), None
+                    )
+                if existing is not None:
+                    existing.update(item)
+                    written.append(existing)
+                else:
+                    rows.append(item)
+                    written.append(item)
+            if "return=representation" not in prefer:
+                return Response(status_code=201)
+            return JSONResponse([self._project(r, options.get("select")) for r in written], 201)
+
+        matched = self._filter(rows, params)
+        if request.method == "PATCH":
+            updates = json.loads(await request.body())
+            for row in matched:
+                row.update(updates)
+            return JSONResponse(matched if "return=minimal" not in prefer else None)
+        if request.method == "DELETE":
+            doomed = {id(r) for r in matched}
+            rows[:] = [r for r in rows if id(r) not in doomed]
+            return JSONResponse(matched if "return=minimal" not in prefer else None)
+
+        for spec in reversed(options["order"].split(",") if options.get("order") else []):
+            column, direction = spec.split(".")[:2]
+            matched = sorted(
+                matched, key=lambda r: (r.get(column) is None, _ordered(r.get(column), 0)[0]),
+                reverse=direction == "desc"
+            )
+        total = len(matched)
+        offset = int(options.get("offset", 0))
+        limit = int(options["limit"]) if "limit" in options else None
+        page = matched[offset:offset + limit if limit is not None else None]
+        headers = {}
+        if "count=" in prefer:
+            headers["content-range"] = f"{offset}-{offset + len(page) - 1}/{total}" if page else f"*/{total}"
+        body = [self._project(r, options.get("select")) for r in page]
+        return Response(json.dumps(body), media_type="application/json", headers=headers)
+
+    async def _call_rpc(self, request: Request) -> Response:
+        await self._delay()
+        function = self.rpc.get(request.path_params["function"])
+        if function is None:
+            return JSONResponse({"message": "function not found"}, 404)
+        return JSONResponse(function(json.loads(await request.body() or b"{}")))
+
+    def _increment_interaction_counts(self, params: Dict) -> None:
+        deltas = dict(zip(params["ids"], params["deltas"]))
+        for row in self.tables.get("characters", ()):
+            if row["id"] in deltas:
+                row["interaction_count"] = (row.get("interaction_count") or 0) + deltas[row["id"]]
+        return None
+
+    def _claim_pending_greetings(self, params: Dict) -> List[Dict]:
+        stale = sorted(
+            (r for r in self.tables.get("characters", ())
+             if r.get("greeting_status") == "pending" and (r.get("updated_at") or "") < params["older_than"]),
+            key=lambda r: r.get("updated_at") or ""
+        )[:params["max_rows"]]
+        for row in stale:
+            row["updated_at"] = _now()
+        return [
+            {k: row.get(k) for k in ("id", "character_name", "personality_summary", "bazi_string")}
+            for row in stale
+        ]
+
+    def _touch_pending_greetings(self, params: Dict) -> None:
+        ids = set(params["ids"])
+        for row in self.tables.get("characters", ()):
+            if row["id"] in ids and row.get("greeting_status") == "pending":
+                row["updated_at"] = _now()
+        return None
+
+    def stats(self) -> Dict:
+        return {
+            "requests": self.requests,
+            "users": len(self.users),
+            "rows": {name: len(rows) for name, rows in self.tables.items()},
+        }
@@ -0,0 +1,313 @@
+"""
+Load test: the real `main:app` against local Supabase and LLM stand-ins.
+
+Starts the in-memory Supabase fake (loadtest/fake_supabase.py) and the app
+under uvicorn, each in its own thread, with `LLM_PROVIDER=stub` in place of
+OpenAI. Then it drives virtual users through register -> BaZi profile ->
+create character -> chat turns, `--concurrency` users at a time, and reports
+throughput and p50/p95/p99 latency per route.
+
+Everything runs in one process, so the fakes and the client share the CPU
+with the app. Compare numbers between commits on the same machine, not as
+absolute capacity. Pass `--base-url` to load an already running server
+instead; it must point at the same kind of backends.
+
+Usage (from backend/):
+    python loadtest/run_loadtest.py [--users 200] [--concurrency 50] [--chat-turns 5]
+        [--llm-latency-ms 300] [--llm-token-delay-ms 20] [--db-latency-ms 2] [--output results.json]
+        [--compare baseline.json]
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+JWT_SECRET = "loadtest-secret"
+SLOW_REQUEST_TIMEOUT = 60.0
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_in_thread(app, port: int):
+    """Run an ASGI app under uvicorn in a daemon thread; returns the server"""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError(f"Server on port {port} failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def percentile(sorted_samples: List[float], p: float) -> float:
+    """Nearest-rank percentile"""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(p * len(sorted_samples) / 100))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+class Recorder:
+    """Latency samples and status codes per route"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, route: str, seconds: float, status: str, ok: bool) -> None:
+        self.samples.setdefault(route, []).append(seconds)
+        counts = self.statuses.setdefault(route, {})
+        counts[status] = counts.get(status, 0) + 1
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self, duration: float) -> Dict:
+        routes = {}
+        for route, samples in self.samples.items():
+            ordered = sorted(samples)
+            routes[route] = {
+                "count": len(ordered),
+                "errors": self.errors.get(route, 0),
+                "throughput_rps": round(len(ordered) / duration, 2),
+                "mean_ms": round(statistics.mean(ordered) * 1000, 2),
+                "p50_ms": round(percentile(ordered, 50) * 1000, 2),
+                "p95_ms": round(percentile(ordered, 95) * 1000, 2),
+                "p99_ms": round(percentile(ordered, 99) * 1000, 2),
+                "max_ms": round(ordered[-1] * 1000, 2),
+                "status": self.statuses[route],
+            }
+        return routes
+
+
+class ScenarioFailed(Exception):
+    pass
+
+
+async def call(client, recorder: Recorder, method: str, route: str, path: str, expect=(200, 201), **kwargs):
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, path, **kwargs)
+    except Exception as e:
+        recorder.record(route, time.perf_counter() - started, type(e).__name__, ok=False)
+        raise ScenarioFailed(f"{route}: {type(e).__name__}")
+    ok = response.status_code in expect
+    recorder.record(route, time.perf_counter() - started, str(response.status_code), ok=ok)
+    if not ok:
+        raise ScenarioFailed(f"{route}: {response.status_code} {response.text[:200]}")
+    return response
+
+
+async def user_scenario(client, recorder: Recorder, rng: random.Random, run_id: str, n: int, chat_turns: int) -> None:
+    """register -> profile -> create character -> chat"""
+    response = await call(client, recorder, "POST", "POST /api/auth/register", "/api/auth/register", json={
+        "email": f"load-{run_id}-{n}@example.com",
+        "password": "loadtest-password",
+        "username": f"load{n}",
+    })
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    await call(client, recorder, "POST", "POST /api/profile/bazi", "/api/profile/bazi", headers=headers, json={
+        "birth_year": rng.randint(1960, 2005), "birth_month": rng.randint(1, 12),
+        "birth_day": rng.randint(1, 28), "birth_hour": rng.randint(0, 23),
+        "birth_minute": rng.randint(0, 59), "gender": rng.choice(["male", "female"]),
+    })
+
+    response = await call(client, recorder, "POST", "POST /api/character/create", "/api/character/create", headers=headers, json={
+        "character_name": f"角色{n}", "creation_mode": "original",
+        "birth_year": rng.randint(1900, 2100), "birth_month": rng.randint(1, 12),
+        "birth_day": rng.randint(1, 28), "visibility_status": rng.choice(["public", "private"]),
+        "tags": rng.sample(["温柔", "冒险", "治愈", "古风", "科幻"], 2),
+    })
+    character_id = response.json()["id"]
+
+    for turn in range(chat_turns):
+        await call(client, recorder, "POST", "POST /api/chat/send", "/api/chat/send", headers=headers, json={
+            "character_id": character_id, "message": f"你好，这是第{turn + 1}句话。",
+        })
+
+
+async def drive(base_url: str, users: int, concurrency: int, chat_turns: int, seed: int) -> Dict:
+    import httpx
+
+    recorder = Recorder()
+    run_id = f"{int(time.time())}{random.randrange(1000)}"
+    semaphore = asyncio.Semaphore(concurrency)
+    failures: Dict[str, int] = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=SLOW_REQUEST_TIMEOUT, limits=limits) as client:
+        async def one(n: int) -> None:
+            async with semaphore:
+                try:
+                    await user_scenario(client, recorder, random.Random(seed + n), run_id, n, chat_turns)
+                except ScenarioFailed as e:
+                    reason = str(e).split(":")[0]
+                    failures[reason] = failures.get(reason, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(n) for n in range(users)))
+        duration = time.perf_counter() - started
+
+        try:
+            app_stats = (await client.get("/health/stats")).json()
+        except Exception:
+            app_stats = None
+
+    routes = recorder.summary(duration)
+    total = sum(r["count"] for r in routes.values())
+    return {
+        "duration_s": round(duration, 3),
+        "requests": total,
+        "errors": sum(r["errors"] for r in routes.values()),
+        "throughput_rps": round(total / duration, 2),
+        "scenarios": {"completed": users - sum(failures.values()), "failed": failures},
+        "routes": routes,
+        "app_stats": app_stats,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def print_report(result: Dict) -> None:
+    print(f"\n{result['requests']:,} requests in {result['duration_s']:.1f}s "
+          f"({result['throughput_rps']:.1f} req/s), {result['errors']} errors, "
+          f"{result['scenarios']['completed']} scenarios completed")
+    print(f"  {'route':<28}  {'count':>6}  {'req/s':>7}  {'p50 ms':>8}  {'p95 ms':>8}  {'p99 ms':>8}  {'errors':>6}")
+    for route, r in result["routes"].items():
+        print(f"  {route:<28}  {r['count']:>6}  {r['throughput_rps']:>7.1f}  {r['p50_ms']:>8.1f}  "
+              f"{r['p95_ms']:>8.1f}  {r['p99_ms']:>8.1f}  {r['errors']:>6}")
+    if result["scenarios"]["failed"]:
+        print(f"  failed scenarios by step: {result['scenarios']['failed']}")
+
+
+def print_comparison(result: Dict, baseline: Dict) -> None:
+    """Relative change per route against a previous run"""
+    print(f"\nvs {baseline['meta'].get('git_commit') or 'baseline'} "
+          f"(throughput {baseline['throughput_rps']:.1f} -> {result['throughput_rps']:.1f} req/s)")
+    print(f"  {'route':<28}  {'p50':>8}  {'p95':>8}  {'p99':>8}  {'req/s':>8}")
+    for route, r in result["routes"].items():
+        old = baseline["routes"].get(route)
+        if old is None:
+            continue
+
+        def change(key):
+            return f"{(r[key] - old[key]) / old[key] * 100:+.0f}%" if old[key] else "n/a"
+        print(f"  {route:<28}  {change('p50_ms'):>8}  {change('p95_ms'):>8}  {change('p99_ms'):>8}  "
+              f"{change('throughput_rps'):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API against local fakes")
+    parser.add_argument("--users", type=int, default=200, help="virtual users, each running the scenario once")
+    parser.add_argument("--concurrency", type=int, default=50, help="users running at the same time")
+    parser.add_argument("--chat-turns", type=int, default=5)
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0, help="stub time to first token (median)")
+    parser.add_argument("--llm-token-delay-ms", type=float, default=20.0, help="stub time per generated token")
+    parser.add_argument("--llm-distribution", default="lognormal")
+    parser.add_argument("--db-latency-ms", type=float, default=2.0, help="added to every fake Supabase response")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--base-url", help="load an already running server instead of starting one")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    args = parser.parse_args()
+
+    meta = {
+        "git_commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "chat_turns": args.chat_turns,
+        "llm_latency_ms": args.llm_latency_ms,
+        "llm_token_delay_ms": args.llm_token_delay_ms,
+        "llm_distribution": args.llm_distribution,
+        "db_latency_ms": args.db_latency_ms,
+        "base_url": args.base_url,
+    }
+
+    fake = app_server = None
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        from loadtest.fake_supabase import FakeSupabase
+
+        fake = FakeSupabase(secret=JWT_SECRET, latency_ms=args.db_latency_ms)
+        supabase_port = free_port()
+        serve_in_thread(fake.app, supabase_port)
+
+        # Settings are read when main is imported, so configure it first
+        os.environ.update({
+            "SUPABASE_URL": f"http://127.0.0.1:{supabase_port}",
+            "SUPABASE_ANON_KEY": "loadtest",
+            "SUPABASE_SERVICE_KEY": "loadtest",
+            "SUPABASE_JWT_SECRET": JWT_SECRET,
+            "OPENAI_API_KEY": "loadtest",
+            "LLM_PROVIDER": "stub",
+            "LLM_STUB_LATENCY_MS": str(args.llm_latency_ms),
+            "LLM_STUB_TOKEN_DELAY_MS": str(args.llm_token_delay_ms),
+            "LLM_STUB_LATENCY_DISTRIBUTION": args.llm_distribution,
+            "LLM_STUB_SEED": str(args.seed),
+            "COMPLETION_CACHE_PATH": "",
+            "DEBUG": "false",
+        })
+        os.chdir(BACKEND_DIR)
+        import main as app_main
+
+        app_port = free_port()
+        app_server = serve_in_thread(app_main.app, app_port)
+        base_url = f"http://127.0.0.1:{app_port}"
+
+    result = asyncio.run(drive(base_url, args.users, args.concurrency, args.chat_turns, args.seed))
+    result = {"meta": meta, **result}
+    if app_server is not None:
+        # Let the lifespan shutdown run (flushes, greeting drain) before exiting
+        server, thread = app_server
+        server.should_exit = True
+        thread.join(timeout=30)
+    if fake is not None:
+        result["fake_supabase"] = fake.stats()
+
+    print_report(result)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_comparison(result, json.load(f))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,50 @@
 from fastapi import FastAPI
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from config import settings
+from database import get_supabase
 from routers import auth, profile, character, chat
+from utils.auth import token_verifier
+from utils.ai_service import openai_limiter
+from utils import compatibility
+from utils.completion_cache import completion_cache
+from utils.llm_provider import llm_provider
+from utils import metrics
+from utils.persona import persona_cache
+from utils.conversation_cache import conversation_cache
+from utils.character_cache import character_cache
+from utils.counters import interaction_counter
+from utils.persistence_queue import chat_turn_writer
+from utils.greeting_worker import greeting_worker
+from utils.response_cache import public_list_cache
+from utils.recommendations import recommendation_index
+from utils.search_index import search_index
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start up and shut down shared resources"""
+    interaction_counter.start(get_supabase())
+    recommendation_index.start(get_supabase())
+    search_index.start(get_supabase())
+    greeting_worker.start(get_supabase())
+    if settings.CHAT_WRITE_BEHIND:
+        chat_turn_writer.start(get_supabase())
+    yield
+    await greeting_worker.drain(timeout=settings.GREETING_DRAIN_TIMEOUT_SECONDS)
+    await chat_turn_writer.drain(timeout=settings.CHAT_WRITE_DRAIN_TIMEOUT_SECONDS)
+    await interaction_counter.stop()
+    await recommendation_index.stop()
+    await search_index.stop()
+    await get_supabase().aclose()
+
 
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
-    description="XwanAI - AI Character Creation & Interaction Platform"
+    description="XwanAI - AI Character Creation & Interaction Platform",
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -19,6 +56,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix=f"{settings.API_PREFIX}/auth", tags=["Authentication"])
 app.include_router(profile.router, prefix=f"{settings.API_PREFIX}/profile", tags=["Profile"])
@@ -42,6 +82,34 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/health/stats")
+async def health_stats():
+    """In-process cache and queue statistics"""
+    return {
+        "auth_cache": token_verifier.stats(),
+        "openai_limiter": openai_limiter.stats(),
+        "conversation_cache": conversation_cache.stats(),
+        "character_cache": character_cache.stats(),
+        "persona_cache": persona_cache.stats(),
+        "public_list_cache": public_list_cache.stats(),
+        "compatibility_cache": compatibility.cache_stats(),
+        "completion_cache": completion_cache.stats(),
+        "llm_provider": llm_provider.stats(),
+        "recommendation_index": recommendation_index.stats(),
+        "search_index": search_index.stats(),
+        "interaction_counter": interaction_counter.stats(),
+        "chat_write_queue": chat_turn_writer.stats(),
+        "greeting_worker": greeting_worker.stats()
+    }
+
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        """Prometheus scrape endpoint"""
+        return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=settings.DEBUG)
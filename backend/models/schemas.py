@@ -17,6 +17,17 @@ class VisibilityStatus(str, Enum):
     SYNCED = "synced"
 
 
+class GreetingStatus(str, Enum):
+    PENDING = "pending"  # Placeholder greeting, generation queued
+    READY = "ready"
+    FAILED = "failed"  # Generation gave up; placeholder kept
+
+
+class ListView(str, Enum):
+    FULL = "full"  # CharacterResponse
+    SUMMARY = "summary"  # CharacterSummary
+
+
 class CreationMode(str, Enum):
     REAL_PERSON = "real_person"  # Mode 1
     ORIGINAL = "original"  # Mode 2
@@ -138,6 +149,7 @@ class CharacterResponse(BaseModel):
     
     # Interaction Data
     greeting_message: Optional[str]
+    greeting_status: GreetingStatus = GreetingStatus.READY
     personality_traits: List[str]
     tags: List[str]
     
@@ -159,6 +171,80 @@ class CharacterResponse(BaseModel):
 
 class CharacterListResponse(BaseModel):
     characters: List[CharacterResponse]
+    total: Optional[int] = None  # Cached; None when not requested
+    page: Optional[int] = None  # None in cursor mode
+    page_size: int
+    next_cursor: Optional[str] = None  # Pass as `cursor` for the next page
+
+
+class CharacterSummary(BaseModel):
+    """The fields a gallery card needs"""
+    id: str
+    creator_id: str
+    character_name: str
+    creation_mode: CreationMode
+    tags: List[str] = []
+    day_master: Optional[str] = None
+    bazi_string: Optional[str] = None
+    primary_element: Optional[str] = None
+    interaction_count: int = 0
+    favorite_count: int = 0
+    visibility_status: VisibilityStatus
+    avatar_url: Optional[str] = None
+    created_at: datetime
+
+
+class CharacterSummaryListResponse(BaseModel):
+    characters: List[CharacterSummary]
+    total: Optional[int] = None
+    page: Optional[int] = None
+    page_size: int
+    next_cursor: Optional[str] = None
+
+
+# Compatibility Schemas
+class CompatibilitySubScores(BaseModel):
+    elements: int  # Five-element balance of both charts
+    day_master: int  # Relation between the day masters
+    stems: int  # Heavenly stem combinations / clashes
+    branches: int  # Earthly branch combinations / clashes / harms
+
+
+class CompatibilityResponse(BaseModel):
+    character_id: str
+    compatibility_score: int
+    sub_scores: CompatibilitySubScores
+    elements_analysis: str
+    personality_match: str
+    advice: str
+    advice_source: str  # "template" or "ai"
+    highlights: List[str] = []
+
+
+class GreetingResponse(BaseModel):
+    character_id: str
+    greeting_status: GreetingStatus
+    greeting_message: Optional[str]
+
+
+class RecommendedCharacter(BaseModel):
+    character: CharacterSummary
+    compatibility_score: int
+    sub_scores: CompatibilitySubScores
+
+
+class RecommendationResponse(BaseModel):
+    recommendations: List[RecommendedCharacter]
+    indexed: int  # Public characters ranked
+
+
+class SearchResult(BaseModel):
+    character: CharacterSummary
+    score: float  # BM25 relevance; 0 when browsing by tag / filters only
+
+
+class SearchResponse(BaseModel):
+    results: List[SearchResult]
     total: int
     page: int
     page_size: int
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from models.schemas import UserRegister, UserLogin, Token
-from database import get_supabase
+from database import get_supabase, get_auth_client
 from config import settings
 
 router = APIRouter()
@@ -9,14 +10,15 @@ router = APIRouter()
 @router.post("/register", response_model=Token, status_code=status.HTTP_201_CREATED)
 async def register(user_data: UserRegister):
     """Register a new user"""
-    supabase = get_supabase()
+    supabase = get_auth_client()
+    db = get_supabase()
     
     try:
         print(f"[AUTH] Attempting to register user: {user_data.email}")
         
         # Check if user already exists
         try:
-            existing_check = supabase.auth.sign_in_with_password({
+            existing_check = await run_in_threadpool(supabase.auth.sign_in_with_password, {
                 "email": user_data.email,
                 "password": user_data.password
             })
@@ -29,7 +31,7 @@ async def register(user_data: UserRegister):
             pass  # User doesn't exist, continue with registration
         
         # Register user with Supabase Auth
-        auth_response = supabase.auth.sign_up({
+        auth_response = await run_in_threadpool(supabase.auth.sign_up, {
             "email": user_data.email,
             "password": user_data.password,
             "options": {
@@ -54,7 +56,7 @@ async def register(user_data: UserRegister):
                 "email": user_data.email,
                 "username": user_data.username,
             }
-            supabase.table("users").insert(profile_data).execute()
+            await db.table("users").insert(profile_data).execute()
             print(f"[AUTH] User profile created in database")
         except Exception as db_error:
             print(f"[AUTH] Database error: {str(db_error)}")
@@ -72,7 +74,7 @@ async def register(user_data: UserRegister):
             # Email confirmation required - try to sign in
             print(f"[AUTH] No session returned, attempting sign in")
             try:
-                signin_response = supabase.auth.sign_in_with_password({
+                signin_response = await run_in_threadpool(supabase.auth.sign_in_with_password, {
                     "email": user_data.email,
                     "password": user_data.password
                 })
@@ -105,10 +107,10 @@ async def register(user_data: UserRegister):
 @router.post("/login", response_model=Token)
 async def login(credentials: UserLogin):
     """Login user"""
-    supabase = get_supabase()
+    supabase = get_auth_client()
     
     try:
-        auth_response = supabase.auth.sign_in_with_password({
+        auth_response = await run_in_threadpool(supabase.auth.sign_in_with_password, {
             "email": credentials.email,
             "password": credentials.password
         })
@@ -134,10 +136,10 @@ async def login(credentials: UserLogin):
 @router.post("/logout")
 async def logout():
     """Logout user"""
-    supabase = get_supabase()
+    supabase = get_auth_client()
     
     try:
-        supabase.auth.sign_out()
+        await run_in_threadpool(supabase.auth.sign_out)
         return {"message": "Successfully logged out"}
     except Exception as e:
         raise HTTPException(
@@ -149,10 +151,10 @@ async def logout():
 @router.get("/me")
 async def get_current_user():
     """Get current user info"""
-    supabase = get_supabase()
+    supabase = get_auth_client()
     
     try:
-        user = supabase.auth.get_user()
+        user = await run_in_threadpool(supabase.auth.get_user)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,46 +1,99 @@
-from fastapi import APIRouter, HTTPException, status, Header, Query
-from typing import Optional, List
+from fastapi import APIRouter, HTTPException, status, Depends, Query, Header, Request
+from starlette.requests import ClientDisconnect
+from pydantic import ValidationError
+from typing import Optional, List, Tuple, Union
 from models.schemas import (
     CharacterCreate, CharacterUpdate, CharacterResponse, 
-    CharacterListResponse, VisibilityStatus, BaZiProfileResponse
+    CharacterListResponse, VisibilityStatus, BaZiProfileResponse,
+    CharacterSummary, CharacterSummaryListResponse, ListView, CompatibilityResponse,
+    RecommendationResponse, RecommendedCharacter, SearchResponse, SearchResult,
+    CreationMode, Gender, GreetingStatus, GreetingResponse
 )
+from config import settings
 from database import get_supabase
-from utils.bazi_calculator import calculate_bazi_profile
+from utils.auth import get_current_user_id
+from utils.character_cache import character_cache
+from utils.persona import persona_cache
+from utils.pagination import total_cache, encode_cursor, after_cursor
+from utils.response_cache import public_list_cache
+from utils.bazi_calculator import calculate_bazi_profile, calculate_bazi_batch, iter_bazi_profiles
+from utils.bulk_import import (
+    ImportFormatError, UploadStreamingResponse, iter_lines, iter_jsonl_records, iter_csv_records
+)
 from utils.ai_service import AIService
+from utils.compatibility import CHART_COLUMNS, chart_from_row
+from utils.recommendations import recommendation_index
+from utils.search_index import search_index
+from utils.greeting_worker import greeting_worker
 from datetime import datetime
+import json
 import uuid
 
 router = APIRouter()
 
 
-def get_user_from_token(authorization: str):
-    """Extract user from authorization header"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authorization header"
-        )
-    
-    token = authorization.replace("Bearer ", "")
-    supabase = get_supabase()
+def _build_character_record(
+    character_id: str,
+    user_id: str,
+    character_data: CharacterCreate,
+    bazi_data: dict,
+    greeting: str,
+    hour: int,
+    minute: int,
+    greeting_status: GreetingStatus = GreetingStatus.READY
+) -> dict:
+    """Build a characters row for a new character"""
+    # Determine deep dialogue unlock
+    deep_dialogue = character_data.visibility_status in [
+        VisibilityStatus.PRIVATE,
+        VisibilityStatus.SYNCED
+    ]
+    now = datetime.utcnow().isoformat()
     
-    try:
-        user = supabase.auth.get_user(token)
-        return user.user.id if user else None
-    except:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
+    return {
+        "id": character_id,
+        "creator_id": user_id,
+        "character_name": character_data.character_name,
+        "creation_mode": character_data.creation_mode.value,
+        "description": character_data.description,
+        "greeting_message": greeting,
+        "greeting_status": greeting_status.value,
+        "personality_traits": character_data.personality_traits or [],
+        "tags": character_data.tags or [],
+        "visibility_status": character_data.visibility_status.value,
+        "deep_dialogue_unlocked": deep_dialogue,
+        "bazi_year": character_data.birth_year,
+        "bazi_month": character_data.birth_month,
+        "bazi_day": character_data.birth_day,
+        "bazi_hour": hour,
+        "bazi_minute": minute,
+        "gender": character_data.gender.value,
+        "year_stem": bazi_data["year_pillar"]["stem"],
+        "year_branch": bazi_data["year_pillar"]["branch"],
+        "month_stem": bazi_data["month_pillar"]["stem"],
+        "month_branch": bazi_data["month_pillar"]["branch"],
+        "day_stem": bazi_data["day_pillar"]["stem"],
+        "day_branch": bazi_data["day_pillar"]["branch"],
+        "hour_stem": bazi_data["hour_pillar"]["stem"],
+        "hour_branch": bazi_data["hour_pillar"]["branch"],
+        "day_master": bazi_data["day_master"],
+        "bazi_string": bazi_data["bazi_string"],
+        "primary_element": bazi_data["primary_element"],
+        "personality_summary": bazi_data["personality_summary"],
+        "bazi_data": bazi_data,
+        "interaction_count": 0,
+        "favorite_count": 0,
+        "created_at": now,
+        "updated_at": now
+    }
 
 
 @router.post("/create", response_model=CharacterResponse, status_code=status.HTTP_201_CREATED)
 async def create_character(
     character_data: CharacterCreate,
-    authorization: str = Header(None)
+    user_id: str = Depends(get_current_user_id)
 ):
     """Create a new character"""
-    user_id = get_user_from_token(authorization)
     supabase = get_supabase()
     
     try:
@@ -58,60 +111,24 @@ async def create_character(
             use_true_solar_time=True
         )
         
-        # Generate greeting if not provided
+        # Without a greeting, save a placeholder and generate one in the background
         greeting = character_data.greeting_message
+        greeting_status = GreetingStatus.READY
         if not greeting:
-            greeting = AIService.generate_character_greeting(
-                character_name=character_data.character_name,
-                personality_summary=bazi_data["personality_summary"],
-                bazi_string=bazi_data["bazi_string"]
-            )
+            greeting = AIService.default_greeting(character_data.character_name)
+            greeting_status = GreetingStatus.PENDING
         
-        # Determine deep dialogue unlock
-        deep_dialogue = character_data.visibility_status in [
-            VisibilityStatus.PRIVATE,
-            VisibilityStatus.SYNCED
-        ]
-        
-        # Prepare character record
         character_id = str(uuid.uuid4())
-        db_data = {
-            "id": character_id,
-            "creator_id": user_id,
-            "character_name": character_data.character_name,
-            "creation_mode": character_data.creation_mode.value,
-            "description": character_data.description,
-            "greeting_message": greeting,
-            "personality_traits": character_data.personality_traits or [],
-            "tags": character_data.tags or [],
-            "visibility_status": character_data.visibility_status.value,
-            "deep_dialogue_unlocked": deep_dialogue,
-            "bazi_year": character_data.birth_year,
-            "bazi_month": character_data.birth_month,
-            "bazi_day": character_data.birth_day,
-            "bazi_hour": hour,
-            "bazi_minute": minute,
-            "gender": character_data.gender.value,
-            "year_stem": bazi_data["year_pillar"]["stem"],
-            "year_branch": bazi_data["year_pillar"]["branch"],
-            "month_stem": bazi_data["month_pillar"]["stem"],
-            "month_branch": bazi_data["month_pillar"]["branch"],
-            "day_stem": bazi_data["day_pillar"]["stem"],
-            "day_branch": bazi_data["day_pillar"]["branch"],
-            "hour_stem": bazi_data["hour_pillar"]["stem"],
-            "hour_branch": bazi_data["hour_pillar"]["branch"],
-            "day_master": bazi_data["day_master"],
-            "bazi_string": bazi_data["bazi_string"],
-            "primary_element": bazi_data["primary_element"],
-            "personality_summary": bazi_data["personality_summary"],
-            "bazi_data": bazi_data,
-            "interaction_count": 0,
-            "favorite_count": 0,
-            "created_at": datetime.utcnow().isoformat(),
-            "updated_at": datetime.utcnow().isoformat()
-        }
-        
-        result = supabase.table("characters").insert(db_data).execute()
+        db_data = _build_character_record(
+            character_id, user_id, character_data, bazi_data, greeting, hour, minute, greeting_status
+        )
+        deep_dialogue = db_data["deep_dialogue_unlocked"]
+        
+        result = await supabase.table("characters").insert(db_data).execute()
+        _invalidate_lists(user_id, public=db_data["visibility_status"] in PUBLIC_VISIBILITY)
+        _sync_gallery_indexes(character_id, db_data)
+        if greeting_status == GreetingStatus.PENDING:
+            greeting_worker.submit(db_data)
         
         # Build response
         return CharacterResponse(
@@ -141,6 +158,7 @@ async def create_character(
                 updated_at=datetime.utcnow()
             ),
             greeting_message=greeting,
+            greeting_status=greeting_status,
             personality_traits=character_data.personality_traits or [],
             tags=character_data.tags or [],
             interaction_count=0,
@@ -159,75 +177,254 @@ async def create_character(
         )
 
 
-@router.get("/my-characters", response_model=CharacterListResponse)
+def _ndjson(payload: dict) -> str:
+    return json.dumps(payload, ensure_ascii=False) + "\n"
+
+
+async def _insert_import_chunk(
+    supabase,
+    user_id: str,
+    chunk: List[Tuple[int, CharacterCreate]],
+    generate_greetings: bool
+) -> List[dict]:
+    """Calculate BaZi for a chunk of validated rows and insert them in one request"""
+    hours = [data.birth_hour if data.birth_hour is not None else 12 for _, data in chunk]
+    minutes = [data.birth_minute if data.birth_minute is not None else 0 for _, data in chunk]
+    columns = calculate_bazi_batch(
+        [data.birth_year for _, data in chunk],
+        [data.birth_month for _, data in chunk],
+        [data.birth_day for _, data in chunk],
+        hours,
+        minutes
+    )
+    
+    records = []
+    for (row, data), hour, minute, bazi_data in zip(chunk, hours, minutes, iter_bazi_profiles(columns)):
+        greeting = data.greeting_message or AIService.default_greeting(data.character_name)
+        greeting_status = GreetingStatus.PENDING if generate_greetings and not data.greeting_message else GreetingStatus.READY
+        records.append(_build_character_record(
+            str(uuid.uuid4()), user_id, data, bazi_data, greeting, hour, minute, greeting_status
+        ))
+    
+    try:
+        await supabase.table("characters").insert(records, returning="minimal").execute()
+    except Exception as e:
+        print(f"[IMPORT] Error inserting {len(records)} characters: {str(e)}")
+        return [{"row": row, "status": "failed", "error": str(e)} for row, _ in chunk]
+    _invalidate_lists(user_id, public=any(record["visibility_status"] in PUBLIC_VISIBILITY for record in records))
+    for record in records:
+        _sync_gallery_indexes(record["id"], record)
+    
+    for record in records:
+        if record["greeting_status"] == GreetingStatus.PENDING.value:
+            greeting_worker.submit(record)
+    
+    return [{"row": row, "status": "created", "id": record["id"]} for (row, _), record in zip(chunk, records)]
+
+
+@router.post("/import")
+async def import_characters(
+    request: Request,
+    import_format: Optional[str] = Query(None, alias="format", pattern="^(jsonl|csv)$"),
+    generate_greetings: bool = Query(True),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Bulk-create characters from a JSONL or CSV request body.
+    
+    The body is read and validated incrementally and inserted in chunks of
+    `CHARACTER_IMPORT_CHUNK_SIZE`. The response is a JSON line per input row
+    (`{"row", "status": "created" | "invalid" | "failed", ...}`) followed by
+    a `{"summary": ...}` line. Invalid rows are reported as they're read,
+    created rows once their chunk is inserted. Rows without a greeting get a
+    placeholder; with `generate_greetings` they're saved as pending and the
+    greeting worker replaces it in the background.
+    """
+    supabase = get_supabase()
+    
+    if import_format is None:
+        import_format = "csv" if "csv" in request.headers.get("content-type", "") else "jsonl"
+    async def results():
+        lines = iter_lines(request.stream(), settings.CHARACTER_IMPORT_MAX_LINE_BYTES)
+        records = (
+            iter_csv_records(lines, settings.CHARACTER_IMPORT_MAX_LINE_BYTES) if import_format == "csv"
+            else iter_jsonl_records(lines)
+        )
+        counts = {"rows": 0, "created": 0, "invalid": 0, "failed": 0}
+        chunk: List[Tuple[int, CharacterCreate]] = []
+        
+        async def flush():
+            inserted = await _insert_import_chunk(supabase, user_id, chunk, generate_greetings)
+            chunk.clear()
+            for result in inserted:
+                counts[result["status"]] += 1
+            return "".join(_ndjson(result) for result in inserted)
+        
+        try:
+            async for record, error in records:
+                if counts["rows"] >= settings.CHARACTER_IMPORT_MAX_ROWS:
+                    yield _ndjson({"error": f"Import is limited to {settings.CHARACTER_IMPORT_MAX_ROWS} rows"})
+                    break
+                counts["rows"] += 1
+                row = counts["rows"]
+                
+                if not error:
+                    try:
+                        chunk.append((row, CharacterCreate.model_validate(record)))
+                    except ValidationError as e:
+                        error = "; ".join(
+                            f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+                        )
+                if error:
+                    counts["invalid"] += 1
+                    yield _ndjson({"row": row, "status": "invalid", "error": error})
+                
+                if len(chunk) >= settings.CHARACTER_IMPORT_CHUNK_SIZE:
+                    yield await flush()
+        except ImportFormatError as e:
+            yield _ndjson({"error": str(e)})
+        except ClientDisconnect:
+            print(f"[IMPORT] Client disconnected after {counts['rows']} rows")
+            return
+        
+        if chunk:
+            yield await flush()
+        yield _ndjson({"summary": counts})
+    
+    return UploadStreamingResponse(results(), media_type="application/x-ndjson")
+
+
+async def _list_characters(
+    make_query,
+    total_key: tuple,
+    count_method: str,
+    page: int,
+    page_size: int,
+    cursor: Optional[str],
+    include_total: bool,
+    columns: str = "*"
+):
+    """
+    Fetch one page of characters, ordered newest first.
+    
+    `make_query()` returns a filtered characters query. With `cursor` the page
+    is found by keyset, otherwise by `page`. Returns (rows, total, next_cursor).
+    """
+    total = total_cache.get(total_key) if include_total else None
+    count = count_method if include_total and total is None else None
+    
+    try:
+        # One extra row tells us whether there is a next page
+        query = after_cursor(make_query().select(columns, count=count), cursor)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    if cursor:
+        query = query.limit(page_size + 1)
+    else:
+        offset = (page - 1) * page_size
+        query = query.range(offset, offset + page_size)
+    
+    result = await query.execute()
+    if count and result.count is not None:
+        total = result.count
+        total_cache.set(total_key, total)
+    
+    rows = result.data[:page_size]
+    next_cursor = encode_cursor(rows[-1]) if len(result.data) > page_size else None
+    return rows, total, next_cursor
+
+
+# Columns of a summary card; id and created_at double as the cursor key
+SUMMARY_COLUMNS = ",".join(CharacterSummary.model_fields)
+
+
+def _build_list_response(
+    rows: List[dict],
+    view: ListView,
+    total: Optional[int],
+    page: Optional[int],
+    page_size: int,
+    next_cursor: Optional[str],
+    public: bool = False
+):
+    """Build a list response in the requested view"""
+    if view == ListView.SUMMARY:
+        return CharacterSummaryListResponse(
+            characters=[CharacterSummary.model_validate(data) for data in rows],
+            total=total,
+            page=page,
+            page_size=page_size,
+            next_cursor=next_cursor
+        )
+    
+    characters = []
+    for data in rows:
+        char = _build_character_response(data)
+        if public:
+            char.deep_dialogue_unlocked = False  # Public access doesn't get deep dialogue
+        characters.append(char)
+    
+    return CharacterListResponse(
+        characters=characters,
+        total=total,
+        page=page,
+        page_size=page_size,
+        next_cursor=next_cursor
+    )
+
+
+PUBLIC_VISIBILITY = [VisibilityStatus.PUBLIC.value, VisibilityStatus.SYNCED.value]
+
+
+def _invalidate_lists(creator_id: str, public: bool) -> None:
+    """Drop cached list totals and pages a character change may affect"""
+    total_cache.delete(("creator", creator_id))
+    if public:
+        total_cache.delete(("public",))
+        public_list_cache.clear()
+
+
+def _sync_gallery_indexes(character_id: str, row: Optional[dict]) -> None:
+    """Put a character's current row into the in-memory gallery indexes, or drop it if it isn't public"""
+    if row is not None and row["visibility_status"] in PUBLIC_VISIBILITY:
+        recommendation_index.add(character_id, row)
+        search_index.add(character_id, row)
+    else:
+        recommendation_index.remove(character_id)
+        search_index.remove(character_id)
+
+
+@router.get("/my-characters", response_model=Union[CharacterListResponse, CharacterSummaryListResponse])
 async def get_my_characters(
-    authorization: str = Header(None),
+    user_id: str = Depends(get_current_user_id),
     page: int = Query(1, ge=1),
-    page_size: int = Query(20, ge=1, le=100)
+    page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    include_total: bool = Query(True),
+    view: ListView = Query(ListView.FULL)
 ):
     """Get all characters created by current user"""
-    user_id = get_user_from_token(authorization)
     supabase = get_supabase()
     
     try:
-        # Get total count
-        count_result = supabase.table("characters").select("id", count="exact").eq("creator_id", user_id).execute()
-        total = count_result.count if count_result.count else 0
-        
-        # Get paginated data
-        offset = (page - 1) * page_size
-        result = supabase.table("characters").select("*").eq("creator_id", user_id).range(offset, offset + page_size - 1).execute()
-        
-        characters = []
-        for data in result.data:
-            bazi_data = data.get("bazi_data", {})
-            
-            char = CharacterResponse(
-                id=data["id"],
-                creator_id=data["creator_id"],
-                character_name=data["character_name"],
-                creation_mode=data["creation_mode"],
-                description=data.get("description"),
-                bazi_profile=BaZiProfileResponse(
-                    id=data["id"],
-                    user_id=data["creator_id"],
-                    birth_year=data["bazi_year"],
-                    birth_month=data["bazi_month"],
-                    birth_day=data["bazi_day"],
-                    birth_hour=data["bazi_hour"],
-                    birth_minute=data["bazi_minute"],
-                    gender=data["gender"],
-                    year_pillar=bazi_data.get("year_pillar", {}),
-                    month_pillar=bazi_data.get("month_pillar", {}),
-                    day_pillar=bazi_data.get("day_pillar", {}),
-                    hour_pillar=bazi_data.get("hour_pillar", {}),
-                    day_master=data["day_master"],
-                    bazi_string=data["bazi_string"],
-                    primary_element=data.get("primary_element"),
-                    personality_summary=data.get("personality_summary"),
-                    created_at=data["created_at"],
-                    updated_at=data["updated_at"]
-                ),
-                greeting_message=data.get("greeting_message"),
-                personality_traits=data.get("personality_traits", []),
-                tags=data.get("tags", []),
-                interaction_count=data.get("interaction_count", 0),
-                favorite_count=data.get("favorite_count", 0),
-                visibility_status=data["visibility_status"],
-                deep_dialogue_unlocked=data.get("deep_dialogue_unlocked", False),
-                avatar_url=data.get("avatar_url"),
-                created_at=data["created_at"],
-                updated_at=data["updated_at"]
-            )
-            characters.append(char)
-        
-        return CharacterListResponse(
-            characters=characters,
-            total=total,
+        rows, total, next_cursor = await _list_characters(
+            lambda: supabase.table("characters").eq("creator_id", user_id),
+            total_key=("creator", user_id),
+            count_method="exact",
             page=page,
-            page_size=page_size
+            page_size=page_size,
+            cursor=cursor,
+            include_total=include_total,
+            columns=SUMMARY_COLUMNS if view == ListView.SUMMARY else "*"
         )
         
+        return _build_list_response(rows, view, total, None if cursor else page, page_size, next_cursor)
+        
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -235,156 +432,381 @@ async def get_my_characters(
         )
 
 
-@router.get("/public", response_model=CharacterListResponse)
+@router.get("/public", response_model=Union[CharacterListResponse, CharacterSummaryListResponse])
 async def get_public_characters(
     page: int = Query(1, ge=1),
-    page_size: int = Query(20, ge=1, le=100)
+    page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    include_total: bool = Query(True),
+    view: ListView = Query(ListView.FULL),
+    if_none_match: Optional[str] = Header(None)
 ):
-    """Get all public characters (Character Gallery)"""
+    """
+    Get all public characters (Character Gallery).
+    
+    Pages are the same for every visitor, so they're served from
+    public_list_cache with an ETag; a matching If-None-Match gets a 304.
+    """
+    cache_key = (page, page_size, cursor, include_total, view)
+    cached = public_list_cache.get(cache_key)
+    if cached is not None:
+        return public_list_cache.respond(cached, if_none_match)
+    
     supabase = get_supabase()
     
     try:
-        # Get total count
-        count_result = supabase.table("characters").select("id", count="exact").in_("visibility_status", ["public", "synced"]).execute()
-        total = count_result.count if count_result.count else 0
+        # The gallery can be large, so its total is the planner's estimate
+        rows, total, next_cursor = await _list_characters(
+            lambda: supabase.table("characters").in_("visibility_status", PUBLIC_VISIBILITY),
+            total_key=("public",),
+            count_method="estimated",
+            page=page,
+            page_size=page_size,
+            cursor=cursor,
+            include_total=include_total,
+            columns=SUMMARY_COLUMNS if view == ListView.SUMMARY else "*"
+        )
         
-        # Get paginated data
-        offset = (page - 1) * page_size
-        result = supabase.table("characters").select("*").in_("visibility_status", ["public", "synced"]).range(offset, offset + page_size - 1).execute()
-        
-        characters = []
-        for data in result.data:
-            bazi_data = data.get("bazi_data", {})
-            
-            char = CharacterResponse(
-                id=data["id"],
-                creator_id=data["creator_id"],
-                character_name=data["character_name"],
-                creation_mode=data["creation_mode"],
-                description=data.get("description"),
-                bazi_profile=BaZiProfileResponse(
-                    id=data["id"],
-                    user_id=data["creator_id"],
-                    birth_year=data["bazi_year"],
-                    birth_month=data["bazi_month"],
-                    birth_day=data["bazi_day"],
-                    birth_hour=data["bazi_hour"],
-                    birth_minute=data["bazi_minute"],
-                    gender=data["gender"],
-                    year_pillar=bazi_data.get("year_pillar", {}),
-                    month_pillar=bazi_data.get("month_pillar", {}),
-                    day_pillar=bazi_data.get("day_pillar", {}),
-                    hour_pillar=bazi_data.get("hour_pillar", {}),
-                    day_master=data["day_master"],
-                    bazi_string=data["bazi_string"],
-                    primary_element=data.get("primary_element"),
-                    personality_summary=data.get("personality_summary"),
-                    created_at=data["created_at"],
-                    updated_at=data["updated_at"]
-                ),
-                greeting_message=data.get("greeting_message"),
-                personality_traits=data.get("personality_traits", []),
-                tags=data.get("tags", []),
-                interaction_count=data.get("interaction_count", 0),
-                favorite_count=data.get("favorite_count", 0),
-                visibility_status=data["visibility_status"],
-                deep_dialogue_unlocked=False,  # Public access doesn't get deep dialogue
-                avatar_url=data.get("avatar_url"),
-                created_at=data["created_at"],
-                updated_at=data["updated_at"]
-            )
-            characters.append(char)
+        response = _build_list_response(
+            rows, view, total, None if cursor else page, page_size, next_cursor, public=True
+        )
+        entry = public_list_cache.store(cache_key, response.model_dump_json().encode())
+        return public_list_cache.respond(entry, if_none_match)
         
-        return CharacterListResponse(
-            characters=characters,
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching public characters: {str(e)}"
+        )
+
+
+async def _fetch_summaries(supabase, character_ids: List[str]) -> dict:
+    """Summary rows of public characters by id, dropping stale ids from the gallery indexes"""
+    if not character_ids:
+        return {}
+    result = await supabase.table("characters").select(SUMMARY_COLUMNS).in_(
+        "id", character_ids
+    ).in_("visibility_status", PUBLIC_VISIBILITY).execute()
+    cards = {row["id"]: row for row in result.data}
+    for character_id in character_ids:
+        if character_id not in cards:
+            # Deleted or hidden by another worker since the last reload
+            _sync_gallery_indexes(character_id, None)
+    return cards
+
+
+@router.get("/search", response_model=SearchResponse)
+async def search_characters(
+    q: str = Query("", max_length=100, description="Search text (names, tags, traits, descriptions)"),
+    tag: Optional[str] = Query(None, max_length=50, description="Only characters with this exact tag"),
+    primary_element: Optional[str] = Query(None),
+    creation_mode: Optional[CreationMode] = Query(None),
+    gender: Optional[Gender] = Query(None),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100)
+):
+    """
+    Search the public gallery.
+    
+    Served from the in-memory inverted index (see utils.search_index) and
+    ranked by BM25; only the cards on the requested page are fetched.
+    """
+    if not q.strip() and tag is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide a search query or a tag"
+        )
+    if not search_index.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Search is warming up, try again shortly"
+        )
+    
+    supabase = get_supabase()
+    
+    try:
+        hits, total = search_index.search(
+            q,
+            filters={
+                "primary_element": primary_element,
+                "creation_mode": creation_mode.value if creation_mode else None,
+                "gender": gender.value if gender else None
+            },
+            tag=tag,
+            offset=(page - 1) * page_size,
+            limit=page_size
+        )
+        cards = await _fetch_summaries(supabase, [character_id for character_id, _ in hits])
+        
+        return SearchResponse(
+            results=[
+                SearchResult(character=CharacterSummary.model_validate(cards[character_id]), score=score)
+                for character_id, score in hits
+                if character_id in cards
+            ],
             total=total,
             page=page,
             page_size=page_size
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error fetching public characters: {str(e)}"
+            detail=f"Error searching characters: {str(e)}"
+        )
+
+
+@router.get("/recommendations", response_model=RecommendationResponse)
+async def get_recommendations(
+    k: int = Query(10, ge=1, le=settings.RECOMMENDATION_MAX_K),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Public characters that best match the caller's BaZi chart.
+    
+    Every indexed character is scored in memory (see utils.recommendations);
+    only the top k cards are fetched from the database.
+    """
+    supabase = get_supabase()
+    
+    try:
+        profile = await supabase.table("bazi_profiles").select(CHART_COLUMNS).eq("user_id", user_id).execute()
+        if not profile.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="BaZi profile not found. Create one first."
+            )
+        if not recommendation_index.ready:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Recommendations are warming up, try again shortly"
+            )
+        
+        ranked = recommendation_index.top_k(chart_from_row(profile.data[0]), k)
+        cards = await _fetch_summaries(supabase, [item["character_id"] for item in ranked])
+        recommendations = [
+            RecommendedCharacter(
+                character=CharacterSummary.model_validate(cards[item["character_id"]]),
+                compatibility_score=item["compatibility_score"],
+                sub_scores=item["sub_scores"]
+            )
+            for item in ranked
+            if item["character_id"] in cards
+        ]
+        
+        return RecommendationResponse(recommendations=recommendations, indexed=len(recommendation_index))
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching recommendations: {str(e)}"
         )
 
 
+def _build_character_response(data: dict) -> CharacterResponse:
+    """Build a CharacterResponse from a characters row"""
+    bazi_data = data.get("bazi_data", {})
+    
+    return CharacterResponse(
+        id=data["id"],
+        creator_id=data["creator_id"],
+        character_name=data["character_name"],
+        creation_mode=data["creation_mode"],
+        description=data.get("description"),
+        bazi_profile=BaZiProfileResponse(
+            id=data["id"],
+            user_id=data["creator_id"],
+            birth_year=data["bazi_year"],
+            birth_month=data["bazi_month"],
+            birth_day=data["bazi_day"],
+            birth_hour=data["bazi_hour"],
+            birth_minute=data["bazi_minute"],
+            gender=data["gender"],
+            year_pillar=bazi_data.get("year_pillar", {}),
+            month_pillar=bazi_data.get("month_pillar", {}),
+            day_pillar=bazi_data.get("day_pillar", {}),
+            hour_pillar=bazi_data.get("hour_pillar", {}),
+            day_master=data["day_master"],
+            bazi_string=data["bazi_string"],
+            primary_element=data.get("primary_element"),
+            personality_summary=data.get("personality_summary"),
+            created_at=data["created_at"],
+            updated_at=data["updated_at"]
+        ),
+        greeting_message=data.get("greeting_message"),
+        greeting_status=data.get("greeting_status") or GreetingStatus.READY,
+        personality_traits=data.get("personality_traits", []),
+        tags=data.get("tags", []),
+        interaction_count=data.get("interaction_count", 0),
+        favorite_count=data.get("favorite_count", 0),
+        visibility_status=data["visibility_status"],
+        deep_dialogue_unlocked=data.get("deep_dialogue_unlocked", False),
+        avatar_url=data.get("avatar_url"),
+        created_at=data["created_at"],
+        updated_at=data["updated_at"]
+    )
+
+
+async def _get_owned_character(supabase, character_id: str, user_id: str, action: str) -> dict:
+    """Fetch a character and check the caller created it"""
+    character = await character_cache.get(supabase, character_id)
+    
+    if character is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Character not found"
+        )
+    
+    if character["creator_id"] != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"You don't have permission to {action} this character"
+        )
+    
+    return character
+
+
 @router.get("/{character_id}", response_model=CharacterResponse)
 async def get_character(character_id: str):
     """Get character details by ID"""
     supabase = get_supabase()
     
     try:
-        result = supabase.table("characters").select("*").eq("id", character_id).execute()
+        data = await character_cache.get(supabase, character_id)
+        
+        if data is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Character not found"
+            )
+        
+        return _build_character_response(data)
         
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching character: {str(e)}"
+        )
+
+
+@router.get("/{character_id}/greeting", response_model=GreetingResponse)
+async def get_character_greeting(
+    character_id: str,
+    wait: int = Query(0, ge=0, le=settings.GREETING_POLL_MAX_WAIT_SECONDS, description="Seconds to wait while pending")
+):
+    """
+    Greeting and greeting_status of a character, for polling after create.
+    
+    Reads two columns by primary key. With `wait`, a pending greeting queued
+    in this worker process is awaited (long poll) before answering.
+    """
+    supabase = get_supabase()
+    
+    async def fetch():
+        result = await supabase.table("characters").select(
+            "greeting_message,greeting_status"
+        ).eq("id", character_id).execute()
         if not result.data:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Character not found"
             )
+        return result.data[0]
+    
+    try:
+        row = await fetch()
+        if row["greeting_status"] == GreetingStatus.PENDING.value and wait:
+            if await greeting_worker.wait(character_id, timeout=wait):
+                row = await fetch()
         
-        data = result.data[0]
-        bazi_data = data.get("bazi_data", {})
+        return GreetingResponse(character_id=character_id, **row)
         
-        return CharacterResponse(
-            id=data["id"],
-            creator_id=data["creator_id"],
-            character_name=data["character_name"],
-            creation_mode=data["creation_mode"],
-            description=data.get("description"),
-            bazi_profile=BaZiProfileResponse(
-                id=data["id"],
-                user_id=data["creator_id"],
-                birth_year=data["bazi_year"],
-                birth_month=data["bazi_month"],
-                birth_day=data["bazi_day"],
-                birth_hour=data["bazi_hour"],
-                birth_minute=data["bazi_minute"],
-                gender=data["gender"],
-                year_pillar=bazi_data.get("year_pillar", {}),
-                month_pillar=bazi_data.get("month_pillar", {}),
-                day_pillar=bazi_data.get("day_pillar", {}),
-                hour_pillar=bazi_data.get("hour_pillar", {}),
-                day_master=data["day_master"],
-                bazi_string=data["bazi_string"],
-                primary_element=data.get("primary_element"),
-                personality_summary=data.get("personality_summary"),
-                created_at=data["created_at"],
-                updated_at=data["updated_at"]
-            ),
-            greeting_message=data.get("greeting_message"),
-            personality_traits=data.get("personality_traits", []),
-            tags=data.get("tags", []),
-            interaction_count=data.get("interaction_count", 0),
-            favorite_count=data.get("favorite_count", 0),
-            visibility_status=data["visibility_status"],
-            deep_dialogue_unlocked=data.get("deep_dialogue_unlocked", False),
-            avatar_url=data.get("avatar_url"),
-            created_at=data["created_at"],
-            updated_at=data["updated_at"]
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching greeting: {str(e)}"
         )
+
+
+@router.get("/{character_id}/compatibility", response_model=CompatibilityResponse)
+async def get_character_compatibility(
+    character_id: str,
+    ai_advice: bool = Query(False, description="Have the AI phrase the advice"),
+    user_id: str = Depends(get_current_user_id)
+):
+    """Compatibility between the caller's BaZi profile and a character"""
+    supabase = get_supabase()
+    
+    try:
+        character = await character_cache.get(supabase, character_id)
+        if character is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Character not found"
+            )
+        
+        profile = await supabase.table("bazi_profiles").select(CHART_COLUMNS).eq("user_id", user_id).execute()
+        if not profile.data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="BaZi profile not found. Create one first."
+            )
+        
+        analysis = await AIService.analyze_bazi_compatibility(
+            profile.data[0], character, phrase_advice=ai_advice
+        )
+        return CompatibilityResponse(character_id=character_id, **analysis)
         
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Error fetching character: {str(e)}"
+            detail=f"Error analyzing compatibility: {str(e)}"
         )
 
 
-@router.delete("/{character_id}")
-async def delete_character(
+@router.patch("/{character_id}", response_model=CharacterResponse)
+async def update_character(
     character_id: str,
-    authorization: str = Header(None)
+    character_data: CharacterUpdate,
+    user_id: str = Depends(get_current_user_id)
 ):
-    """Delete a character (only by creator)"""
-    user_id = get_user_from_token(authorization)
+    """Update a character (only by creator)"""
     supabase = get_supabase()
     
     try:
-        # Verify ownership
-        result = supabase.table("characters").select("creator_id").eq("id", character_id).execute()
+        character = await _get_owned_character(supabase, character_id, user_id, "update")
+        
+        updates = character_data.model_dump(exclude_unset=True, mode="json")
+        if "visibility_status" in updates:
+            updates["deep_dialogue_unlocked"] = updates["visibility_status"] in [
+                VisibilityStatus.PRIVATE.value,
+                VisibilityStatus.SYNCED.value
+            ]
+        if "greeting_message" in updates:
+            # The creator's greeting wins over one still being generated
+            updates["greeting_status"] = GreetingStatus.READY.value
+        updates["updated_at"] = datetime.utcnow().isoformat()
+        
+        result = await supabase.table("characters").update(updates).eq("id", character_id).execute()
+        character_cache.invalidate(character_id)
+        persona_cache.invalidate(character_id)
+        _invalidate_lists(
+            user_id,
+            public=character["visibility_status"] in PUBLIC_VISIBILITY
+            or updates.get("visibility_status") in PUBLIC_VISIBILITY
+        )
         
         if not result.data:
             raise HTTPException(
@@ -392,14 +814,37 @@ async def delete_character(
                 detail="Character not found"
             )
         
-        if result.data[0]["creator_id"] != user_id:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You don't have permission to delete this character"
-            )
+        _sync_gallery_indexes(character_id, result.data[0])
+        
+        return _build_character_response(result.data[0])
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error updating character: {str(e)}"
+        )
+
+
+@router.delete("/{character_id}")
+async def delete_character(
+    character_id: str,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Delete a character (only by creator)"""
+    supabase = get_supabase()
+    
+    try:
+        # Verify ownership
+        character = await _get_owned_character(supabase, character_id, user_id, "delete")
         
         # Delete character
-        supabase.table("characters").delete().eq("id", character_id).execute()
+        await supabase.table("characters").delete().eq("id", character_id).execute()
+        character_cache.invalidate(character_id)
+        persona_cache.invalidate(character_id)
+        _invalidate_lists(user_id, public=character["visibility_status"] in PUBLIC_VISIBILITY)
+        _sync_gallery_indexes(character_id, None)
         
         return {"message": "Character deleted successfully"}
         
@@ -410,4 +855,3 @@ async def delete_character(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error deleting character: {str(e)}"
         )
-
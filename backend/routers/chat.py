@@ -1,138 +1,198 @@
-from fastapi import APIRouter, HTTPException, status, Header
+from fastapi import APIRouter, HTTPException, status, Depends, Request, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from typing import List
 from models.schemas import ChatMessageCreate, ChatMessageResponse, ConversationResponse
+from config import settings
 from database import get_supabase
-from utils.ai_service import AIService
+from utils.auth import get_current_user_id
+from utils.character_cache import character_cache
+from utils.ai_service import AIService, StreamInterrupted, openai_limiter
+from utils.concurrency import CapacityExceeded
+from utils.context_builder import build_context, fold_into_summary
+from utils.conversation_cache import conversation_cache
+from utils.counters import interaction_counter
+from utils.persona import persona_cache
+from utils.persistence_queue import chat_turn_writer
 from datetime import datetime
+import json
 import uuid
 
 router = APIRouter()
 
 
-def get_user_from_token(authorization: str):
-    """Extract user from authorization header"""
-    if not authorization or not authorization.startswith("Bearer "):
+async def _prepare_chat(supabase, user_id: str, character_id: str, user_message: str):
+    """Load the character, conversation and budgeted context for a chat turn"""
+    # Get character data
+    character = await character_cache.get(supabase, character_id)
+    
+    if character is None:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authorization header"
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Character not found"
         )
     
-    token = authorization.replace("Bearer ", "")
-    supabase = get_supabase()
+    # Check access permissions
+    is_creator = character["creator_id"] == user_id
+    is_deep_dialogue = character.get("deep_dialogue_unlocked", False)
     
-    try:
-        user = supabase.auth.get_user(token)
-        return user.user.id if user else None
-    except:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
+    if not is_creator and not is_deep_dialogue:
+        # Public character, limited interaction
+        if character["visibility_status"] == "private":
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="This character is private"
+            )
+    
+    # Warm path: conversation and recent turns are cached in-process
+    state = conversation_cache.get(user_id, character_id)
+    if state is None:
+        conversation, conversation_history = await _load_conversation(supabase, user_id, character_id)
+        state = conversation_cache.put(user_id, character_id, conversation, conversation_history)
+    
+    context = build_context(list(state.turns), state.conversation.get("summary"), user_message)
+    return character, state.conversation, context
+
+
+async def _load_conversation(supabase, user_id: str, character_id: str):
+    """Get or create the conversation and load its unsummarized turns"""
+    conv_result = await supabase.table("conversations").select("*").eq("character_id", character_id).eq("user_id", user_id).execute()
+    
+    if conv_result.data:
+        conversation = conv_result.data[0]
+    else:
+        # Create new conversation
+        conversation = {
+            "id": str(uuid.uuid4()),
+            "character_id": character_id,
+            "user_id": user_id,
+            "created_at": datetime.utcnow().isoformat(),
+            "updated_at": datetime.utcnow().isoformat()
+        }
+        await supabase.table("conversations").insert(conversation).execute()
+    
+    # Get the newest turns not yet folded into the summary
+    history_query = supabase.table("chat_messages").select("message, response, created_at").eq("conversation_id", conversation["id"])
+    if conversation.get("summarized_until"):
+        history_query = history_query.gt("created_at", conversation["summarized_until"])
+    history_result = await history_query.order("created_at", desc=True).limit(
+        settings.CHAT_HISTORY_MAX_TURNS + settings.CHAT_SUMMARY_FOLD_TURNS
+    ).execute()
+    
+    conversation_history = []
+    for msg in reversed(history_result.data):
+        conversation_history.append({
+            "user": msg["message"],
+            "assistant": msg["response"],
+            "created_at": msg["created_at"]
+        })
+    
+    return conversation, conversation_history
+
+
+async def _fold_summary(supabase, user_id: str, character_id: str, conversation: dict, context):
+    summary_state = await fold_into_summary(
+        supabase, conversation["id"], context.summary, conversation.get("summarized_until"),
+        until=context.fold[-1]["created_at"]
+    )
+    if summary_state:
+        conversation_cache.apply_summary(user_id, character_id, summary_state)
+
+
+def _schedule_summary_fold(background_tasks: BackgroundTasks, supabase, user_id: str, conversation: dict, context):
+    """Fold turns that fell out of the context budget into the summary, after the response"""
+    if context.needs_fold:
+        background_tasks.add_task(
+            _fold_summary, supabase, user_id, conversation["character_id"], conversation, context
         )
 
 
+async def _save_chat_turn(
+    supabase,
+    user_id: str,
+    character: dict,
+    conversation_id: str,
+    message: str,
+    ai_response: str
+) -> ChatMessageResponse:
+    """Persist a completed turn and count the interaction.
+
+    With CHAT_WRITE_BEHIND on, the writes are queued and this returns
+    without waiting for the database.
+    """
+    # Save message
+    message_id = str(uuid.uuid4())
+    message_record = {
+        "id": message_id,
+        "conversation_id": conversation_id,
+        "character_id": character["id"],
+        "user_id": user_id,
+        "message": message,
+        "response": ai_response,
+        "created_at": datetime.utcnow().isoformat()
+    }
+    
+    if settings.CHAT_WRITE_BEHIND:
+        await chat_turn_writer.submit(message_record)
+    else:
+        await supabase.table("chat_messages").insert(message_record).execute()
+        
+        # Update conversation timestamp
+        await supabase.table("conversations").update({
+            "updated_at": datetime.utcnow().isoformat()
+        }).eq("id", conversation_id).execute()
+    
+    conversation_cache.append_turn(user_id, character["id"], {
+        "user": message,
+        "assistant": ai_response,
+        "created_at": message_record["created_at"]
+    })
+    
+    # Update interaction count (batched, flushed in the background)
+    interaction_counter.increment(character["id"])
+    
+    return ChatMessageResponse(
+        id=message_id,
+        conversation_id=conversation_id,
+        character_id=character["id"],
+        user_id=user_id,
+        message=message,
+        response=ai_response,
+        created_at=datetime.utcnow()
+    )
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @router.post("/send", response_model=ChatMessageResponse)
 async def send_message(
     message_data: ChatMessageCreate,
-    authorization: str = Header(None)
+    background_tasks: BackgroundTasks,
+    user_id: str = Depends(get_current_user_id)
 ):
     """Send a message to a character and get response"""
-    user_id = get_user_from_token(authorization)
     supabase = get_supabase()
     
     try:
-        # Get character data
-        char_result = supabase.table("characters").select("*").eq("id", message_data.character_id).execute()
-        
-        if not char_result.data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Character not found"
-            )
-        
-        character = char_result.data[0]
-        
-        # Check access permissions
-        is_creator = character["creator_id"] == user_id
-        is_deep_dialogue = character.get("deep_dialogue_unlocked", False)
-        
-        if not is_creator and not is_deep_dialogue:
-            # Public character, limited interaction
-            if character["visibility_status"] == "private":
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="This character is private"
-                )
-        
-        # Get or create conversation
-        conv_result = supabase.table("conversations").select("*").eq("character_id", message_data.character_id).eq("user_id", user_id).execute()
-        
-        if conv_result.data:
-            conversation_id = conv_result.data[0]["id"]
-        else:
-            # Create new conversation
-            conversation_id = str(uuid.uuid4())
-            supabase.table("conversations").insert({
-                "id": conversation_id,
-                "character_id": message_data.character_id,
-                "user_id": user_id,
-                "created_at": datetime.utcnow().isoformat(),
-                "updated_at": datetime.utcnow().isoformat()
-            }).execute()
-        
-        # Get conversation history
-        history_result = supabase.table("chat_messages").select("*").eq("conversation_id", conversation_id).order("created_at", desc=False).limit(20).execute()
-        
-        conversation_history = []
-        for msg in history_result.data:
-            conversation_history.append({
-                "user": msg["message"],
-                "assistant": msg["response"]
-            })
+        character, conversation, context = await _prepare_chat(
+            supabase, user_id, message_data.character_id, message_data.message
+        )
         
         # Generate AI response
-        bazi_data = character.get("bazi_data", {})
-        ai_response = AIService.generate_chat_response(
+        ai_response = await AIService.generate_chat_response(
             user_message=message_data.message,
-            character_name=character["character_name"],
-            character_personality=character.get("personality_summary", ""),
-            bazi_data=bazi_data,
-            conversation_history=conversation_history
+            persona=persona_cache.get(character),
+            conversation_history=context.recent,
+            conversation_summary=context.summary
         )
         
-        # Save message
-        message_id = str(uuid.uuid4())
-        message_record = {
-            "id": message_id,
-            "conversation_id": conversation_id,
-            "character_id": message_data.character_id,
-            "user_id": user_id,
-            "message": message_data.message,
-            "response": ai_response,
-            "created_at": datetime.utcnow().isoformat()
-        }
-        
-        supabase.table("chat_messages").insert(message_record).execute()
-        
-        # Update interaction count
-        current_count = character.get("interaction_count", 0)
-        supabase.table("characters").update({
-            "interaction_count": current_count + 1
-        }).eq("id", message_data.character_id).execute()
-        
-        # Update conversation timestamp
-        supabase.table("conversations").update({
-            "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", conversation_id).execute()
-        
-        return ChatMessageResponse(
-            id=message_id,
-            conversation_id=conversation_id,
-            character_id=message_data.character_id,
-            user_id=user_id,
-            message=message_data.message,
-            response=ai_response,
-            created_at=datetime.utcnow()
+        saved = await _save_chat_turn(
+            supabase, user_id, character, conversation["id"], message_data.message, ai_response
         )
+        _schedule_summary_fold(background_tasks, supabase, user_id, conversation, context)
+        return saved
         
     except HTTPException:
         raise
@@ -143,18 +203,89 @@ async def send_message(
         )
 
 
+@router.post("/send/stream")
+async def send_message_stream(
+    message_data: ChatMessageCreate,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Send a message and stream the response as Server-Sent Events.
+
+    Emits `token` events as the model produces text, then one `done` event
+    carrying the saved message. The turn is only persisted once the stream
+    completes; if the client disconnects, generation is cancelled. If the
+    model fails mid-reply, an `error` event is sent and nothing is saved.
+    """
+    supabase = get_supabase()
+    
+    try:
+        # Reject up front while we can still send a 503 status
+        openai_limiter.ensure_capacity()
+        character, conversation, context = await _prepare_chat(
+            supabase, user_id, message_data.character_id, message_data.message
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error sending message: {str(e)}"
+        )
+    
+    async def event_stream():
+        tokens = AIService.stream_chat_response(
+            user_message=message_data.message,
+            persona=persona_cache.get(character),
+            conversation_history=context.recent,
+            conversation_summary=context.summary
+        )
+        chunks = []
+        try:
+            async for token in tokens:
+                if await request.is_disconnected():
+                    print(f"[CHAT] Client disconnected, cancelling generation for {conversation['id']}")
+                    return
+                chunks.append(token)
+                yield _sse_event("token", {"content": token})
+        except CapacityExceeded as e:
+            yield _sse_event("error", {"detail": e.detail, "retry_after": e.headers["Retry-After"]})
+            return
+        except StreamInterrupted as e:
+            print(f"[CHAT] Stream interrupted for {conversation['id']}: {str(e)}")
+            yield _sse_event("error", {"detail": "The response was interrupted, please try again"})
+            return
+        finally:
+            await tokens.aclose()
+        
+        try:
+            saved = await _save_chat_turn(
+                supabase, user_id, character, conversation["id"], message_data.message, "".join(chunks).strip()
+            )
+            yield _sse_event("done", saved.model_dump(mode="json"))
+        except Exception as e:
+            print(f"[CHAT] Error saving streamed message: {str(e)}")
+            yield _sse_event("error", {"detail": "Error saving message"})
+    
+    _schedule_summary_fold(background_tasks, supabase, user_id, conversation, context)
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 @router.get("/conversation/{character_id}", response_model=ConversationResponse)
 async def get_conversation(
     character_id: str,
-    authorization: str = Header(None)
+    user_id: str = Depends(get_current_user_id)
 ):
     """Get conversation history with a character"""
-    user_id = get_user_from_token(authorization)
     supabase = get_supabase()
     
     try:
         # Get conversation
-        conv_result = supabase.table("conversations").select("*").eq("character_id", character_id).eq("user_id", user_id).execute()
+        conv_result = await supabase.table("conversations").select("*").eq("character_id", character_id).eq("user_id", user_id).execute()
         
         if not conv_result.data:
             # Return empty conversation
@@ -170,7 +301,7 @@ async def get_conversation(
         conversation = conv_result.data[0]
         
         # Get messages
-        messages_result = supabase.table("chat_messages").select("*").eq("conversation_id", conversation["id"]).order("created_at", desc=False).execute()
+        messages_result = await supabase.table("chat_messages").select("*").eq("conversation_id", conversation["id"]).order("created_at", desc=False).execute()
         
         messages = [
             ChatMessageResponse(
@@ -204,13 +335,12 @@ async def get_conversation(
 
 
 @router.get("/my-conversations")
-async def get_my_conversations(authorization: str = Header(None)):
+async def get_my_conversations(user_id: str = Depends(get_current_user_id)):
     """Get all conversations for current user"""
-    user_id = get_user_from_token(authorization)
     supabase = get_supabase()
     
     try:
-        result = supabase.table("conversations").select("*, characters(character_name, avatar_url)").eq("user_id", user_id).order("updated_at", desc=True).execute()
+        result = await supabase.table("conversations").select("*, characters(character_name, avatar_url)").eq("user_id", user_id).order("updated_at", desc=True).execute()
         
         return {"conversations": result.data}
         
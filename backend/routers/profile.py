@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException, status, Header
+from fastapi import APIRouter, HTTPException, status, Depends
 from typing import Optional
 from models.schemas import BaZiProfileCreate, BaZiProfileResponse
 from database import get_supabase
+from utils.auth import get_current_user_id
 from utils.bazi_calculator import calculate_bazi_profile
 from datetime import datetime
 import uuid
@@ -9,39 +10,17 @@ import uuid
 router = APIRouter()
 
 
-def get_user_from_token(authorization: str):
-    """Extract user from authorization header"""
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid authorization header"
-        )
-    
-    token = authorization.replace("Bearer ", "")
-    supabase = get_supabase()
-    
-    try:
-        user = supabase.auth.get_user(token)
-        return user.user.id if user else None
-    except:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token"
-        )
-
-
 @router.post("/bazi", response_model=BaZiProfileResponse, status_code=status.HTTP_201_CREATED)
 async def create_bazi_profile(
     profile_data: BaZiProfileCreate,
-    authorization: str = Header(None)
+    user_id: str = Depends(get_current_user_id)
 ):
     """Create user's BaZi profile"""
-    user_id = get_user_from_token(authorization)
     supabase = get_supabase()
     
     try:
         # Check if profile already exists
-        existing = supabase.table("bazi_profiles").select("*").eq("user_id", user_id).execute()
+        existing = await supabase.table("bazi_profiles").select("*").eq("user_id", user_id).execute()
         if existing.data:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -91,7 +70,7 @@ async def create_bazi_profile(
         }
         
         # Insert into database
-        result = supabase.table("bazi_profiles").insert(db_data).execute()
+        result = await supabase.table("bazi_profiles").insert(db_data).execute()
         
         # Format response
         return BaZiProfileResponse(
@@ -125,13 +104,12 @@ async def create_bazi_profile(
 
 
 @router.get("/bazi/me", response_model=BaZiProfileResponse)
-async def get_my_bazi_profile(authorization: str = Header(None)):
+async def get_my_bazi_profile(user_id: str = Depends(get_current_user_id)):
     """Get current user's BaZi profile"""
-    user_id = get_user_from_token(authorization)
     supabase = get_supabase()
     
     try:
-        result = supabase.table("bazi_profiles").select("*").eq("user_id", user_id).execute()
+        result = await supabase.table("bazi_profiles").select("*").eq("user_id", user_id).execute()
         
         if not result.data:
             raise HTTPException(
@@ -173,13 +151,12 @@ async def get_my_bazi_profile(authorization: str = Header(None)):
 
 
 @router.delete("/bazi/me")
-async def delete_my_bazi_profile(authorization: str = Header(None)):
+async def delete_my_bazi_profile(user_id: str = Depends(get_current_user_id)):
     """Delete current user's BaZi profile"""
-    user_id = get_user_from_token(authorization)
     supabase = get_supabase()
     
     try:
-        result = supabase.table("bazi_profiles").delete().eq("user_id", user_id).execute()
+        result = await supabase.table("bazi_profiles").delete().eq("user_id", user_id).execute()
         return {"message": "BaZi profile deleted successfully"}
     except Exception as e:
         raise HTTPException(
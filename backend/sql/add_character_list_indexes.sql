@@ -0,0 +1,8 @@
+-- Keyset pagination of character lists, ordered by (created_at DESC, id DESC)
+
+CREATE INDEX IF NOT EXISTS idx_characters_creator_created
+    ON public.characters(creator_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_characters_gallery_created
+    ON public.characters(created_at DESC, id DESC)
+    WHERE visibility_status IN ('public', 'synced');
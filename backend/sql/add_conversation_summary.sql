@@ -0,0 +1,8 @@
+-- Rolling conversation summaries for the token-budgeted chat context
+
+ALTER TABLE public.conversations ADD COLUMN IF NOT EXISTS summary TEXT;
+ALTER TABLE public.conversations ADD COLUMN IF NOT EXISTS summarized_until TIMESTAMPTZ;
+
+-- Newest-first history lookups per conversation
+CREATE INDEX IF NOT EXISTS idx_chat_messages_conversation_created
+    ON public.chat_messages(conversation_id, created_at DESC);
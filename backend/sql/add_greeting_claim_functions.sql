@@ -0,0 +1,26 @@
+-- Claiming for the greeting recovery sweep, so that with several worker
+-- processes each stale pending greeting is re-queued by only one of them
+
+-- Atomically take up to max_rows greetings pending since before older_than.
+-- Claimed rows get a fresh updated_at, so other sweeps skip them.
+CREATE OR REPLACE FUNCTION public.claim_pending_greetings(older_than TIMESTAMPTZ, max_rows INTEGER)
+RETURNS TABLE (id UUID, character_name TEXT, personality_summary TEXT, bazi_string TEXT) AS $$
+    UPDATE public.characters AS c
+    SET updated_at = NOW()
+    WHERE c.id IN (
+        SELECT p.id FROM public.characters AS p
+        WHERE p.greeting_status = 'pending' AND p.updated_at < older_than
+        ORDER BY p.updated_at
+        LIMIT max_rows
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING c.id, c.character_name, c.personality_summary, c.bazi_string;
+$$ LANGUAGE sql;
+
+-- Keep greetings queued in a live process from looking stale to other sweeps
+CREATE OR REPLACE FUNCTION public.touch_pending_greetings(ids UUID[])
+RETURNS VOID AS $$
+    UPDATE public.characters
+    SET updated_at = NOW()
+    WHERE id = ANY(ids) AND greeting_status = 'pending';
+$$ LANGUAGE sql;
@@ -0,0 +1,11 @@
+-- Greetings generated in the background: characters start with a placeholder
+-- greeting and greeting_status 'pending' until the worker fills it in
+
+ALTER TABLE public.characters
+    ADD COLUMN IF NOT EXISTS greeting_status TEXT NOT NULL DEFAULT 'ready'
+    CHECK (greeting_status IN ('pending', 'ready', 'failed'));
+
+-- Recovery sweep for greetings left pending by a restart
+CREATE INDEX IF NOT EXISTS idx_characters_greeting_pending
+    ON public.characters(updated_at)
+    WHERE greeting_status = 'pending';
@@ -0,0 +1,8 @@
+-- Batched atomic increments for write-behind interaction counters
+CREATE OR REPLACE FUNCTION public.increment_interaction_counts(ids UUID[], deltas INTEGER[])
+RETURNS VOID AS $$
+    UPDATE public.characters AS c
+    SET interaction_count = COALESCE(c.interaction_count, 0) + d.delta
+    FROM unnest(ids, deltas) AS d(id, delta)
+    WHERE c.id = d.id;
+$$ LANGUAGE sql;
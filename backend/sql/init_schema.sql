@@ -63,6 +63,7 @@ CREATE TABLE IF NOT EXISTS public.characters (
     creation_mode TEXT NOT NULL CHECK (creation_mode IN ('real_person', 'original', 'concept', 'virtual_ip')),
     description TEXT,
     greeting_message TEXT,
+    greeting_status TEXT NOT NULL CHECK (greeting_status IN ('pending', 'ready', 'failed')) DEFAULT 'ready',
     
     -- BaZi Information
     bazi_year INTEGER NOT NULL,
@@ -116,6 +117,10 @@ CREATE TABLE IF NOT EXISTS public.conversations (
     character_id UUID REFERENCES public.characters(id) ON DELETE CASCADE,
     user_id UUID REFERENCES public.users(id) ON DELETE CASCADE,
     
+    -- Running summary of turns that no longer fit the chat context budget
+    summary TEXT,
+    summarized_until TIMESTAMPTZ,
+    
     created_at TIMESTAMPTZ DEFAULT NOW(),
     updated_at TIMESTAMPTZ DEFAULT NOW(),
     
@@ -149,10 +154,16 @@ CREATE TABLE IF NOT EXISTS public.favorites (
 -- Indexes for performance
 CREATE INDEX IF NOT EXISTS idx_characters_creator ON public.characters(creator_id);
 CREATE INDEX IF NOT EXISTS idx_characters_visibility ON public.characters(visibility_status);
+CREATE INDEX IF NOT EXISTS idx_characters_creator_created ON public.characters(creator_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_characters_gallery_created ON public.characters(created_at DESC, id DESC)
+    WHERE visibility_status IN ('public', 'synced');
+CREATE INDEX IF NOT EXISTS idx_characters_greeting_pending ON public.characters(updated_at)
+    WHERE greeting_status = 'pending';
 CREATE INDEX IF NOT EXISTS idx_conversations_user ON public.conversations(user_id);
 CREATE INDEX IF NOT EXISTS idx_conversations_character ON public.conversations(character_id);
 CREATE INDEX IF NOT EXISTS idx_chat_messages_conversation ON public.chat_messages(conversation_id);
 CREATE INDEX IF NOT EXISTS idx_chat_messages_created ON public.chat_messages(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_conversation_created ON public.chat_messages(conversation_id, created_at DESC);
 CREATE INDEX IF NOT EXISTS idx_favorites_user ON public.favorites(user_id);
 
 -- Row Level Security (RLS) Policies
@@ -239,6 +250,39 @@ CREATE POLICY "Users can remove favorites"
     ON public.favorites FOR DELETE
     USING (auth.uid() = user_id);
 
+-- Batched atomic increments for write-behind interaction counters
+CREATE OR REPLACE FUNCTION public.increment_interaction_counts(ids UUID[], deltas INTEGER[])
+RETURNS VOID AS $$
+    UPDATE public.characters AS c
+    SET interaction_count = COALESCE(c.interaction_count, 0) + d.delta
+    FROM unnest(ids, deltas) AS d(id, delta)
+    WHERE c.id = d.id;
+$$ LANGUAGE sql;
+
+-- Atomically take up to max_rows greetings pending since before older_than.
+-- Claimed rows get a fresh updated_at, so other sweeps skip them.
+CREATE OR REPLACE FUNCTION public.claim_pending_greetings(older_than TIMESTAMPTZ, max_rows INTEGER)
+RETURNS TABLE (id UUID, character_name TEXT, personality_summary TEXT, bazi_string TEXT) AS $$
+    UPDATE public.characters AS c
+    SET updated_at = NOW()
+    WHERE c.id IN (
+        SELECT p.id FROM public.characters AS p
+        WHERE p.greeting_status = 'pending' AND p.updated_at < older_than
+        ORDER BY p.updated_at
+        LIMIT max_rows
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING c.id, c.character_name, c.personality_summary, c.bazi_string;
+$$ LANGUAGE sql;
+
+-- Keep greetings queued in a live process from looking stale to other sweeps
+CREATE OR REPLACE FUNCTION public.touch_pending_greetings(ids UUID[])
+RETURNS VOID AS $$
+    UPDATE public.characters
+    SET updated_at = NOW()
+    WHERE id = ANY(ids) AND greeting_status = 'pending';
+$$ LANGUAGE sql;
+
 -- Functions for updated_at timestamp
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -0,0 +1,11 @@
+"""
+Shared test setup: tests run from backend/ without a Supabase project or
+OpenAI key, so settings get placeholder values and nothing is contacted.
+"""
+
+from pathlib import Path
+import sys
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks import _env  # noqa: E402,F401
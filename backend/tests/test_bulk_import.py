@@ -0,0 +1,46 @@
+"""Streaming CSV parsing in utils/bulk_import.py"""
+
+from utils.bulk_import import ImportFormatError, iter_csv_records, iter_lines
+import asyncio
+import pytest
+
+
+async def _chunks(data: bytes, size: int = 7):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+def _parse(data: bytes, max_bytes: int = 1024):
+    async def run():
+        lines = iter_lines(_chunks(data), max_bytes)
+        return [item async for item in iter_csv_records(lines, max_bytes)]
+
+    return asyncio.run(run())
+
+
+def test_quoted_cell_may_span_lines():
+    records = _parse('character_name,description\n小明,"第一行\n第二行"\n小红,简介\n'.encode())
+    assert records == [
+        ({"character_name": "小明", "description": "第一行\n第二行"}, ""),
+        ({"character_name": "小红", "description": "简介"}, ""),
+    ]
+
+
+def test_unbalanced_quote_stops_at_record_limit():
+    rows = "".join(f"角色{i},正常的简介\n" for i in range(1000))
+    data = f'character_name,description\n小明,"没有结尾的引号\n{rows}'.encode()
+    seen = []
+
+    async def run():
+        lines = iter_lines(_chunks(data), 1024)
+        async for item in iter_csv_records(lines, 1024):
+            seen.append(item)
+
+    with pytest.raises(ImportFormatError, match="line 2 "):
+        asyncio.run(run())
+    assert seen == []
+
+
+def test_unterminated_quote_at_end_is_reported():
+    records = _parse('character_name,description\n小明,"没有结尾\n'.encode())
+    assert records == [({}, "Unterminated quoted field")]
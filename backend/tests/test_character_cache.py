@@ -0,0 +1,114 @@
+"""Single-flight behaviour of utils/character_cache.py"""
+
+from utils.character_cache import CharacterCache
+import asyncio
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, db, character_id=None):
+        self.db = db
+        self.character_id = character_id
+
+    def select(self, columns):
+        return self
+
+    def eq(self, column, value):
+        return _Query(self.db, value)
+
+    async def execute(self):
+        self.db.queries += 1
+        await self.db.gate.wait()
+        if self.db.error:
+            raise self.db.error
+        row = self.db.rows.get(self.character_id)
+        return _Result([row] if row else [])
+
+
+class FakeSupabase:
+    """Just enough of the query builder; queries block until `gate` is set"""
+
+    def __init__(self, rows, error=None):
+        self.rows = rows
+        self.error = error
+        self.queries = 0
+        self.gate = asyncio.Event()
+
+    def table(self, name):
+        return _Query(self)
+
+
+def _cache():
+    return CharacterCache(max_size=10, ttl=60, negative_ttl=5)
+
+
+def test_concurrent_misses_share_one_query():
+    async def run():
+        db = FakeSupabase({"c1": {"id": "c1"}})
+        cache = _cache()
+        tasks = [asyncio.create_task(cache.get(db, "c1")) for _ in range(5)]
+        await asyncio.sleep(0)
+        db.gate.set()
+        rows = await asyncio.gather(*tasks)
+        assert rows == [{"id": "c1"}] * 5
+        assert db.queries == 1
+
+    asyncio.run(run())
+
+
+def test_follower_survives_cancelled_leader():
+    async def run():
+        db = FakeSupabase({"c1": {"id": "c1"}})
+        cache = _cache()
+        leader = asyncio.create_task(cache.get(db, "c1"))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.get(db, "c1"))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        db.gate.set()
+
+        assert await asyncio.wait_for(follower, timeout=1) == {"id": "c1"}
+        assert leader.cancelled()
+        assert not cache._pending
+
+    asyncio.run(run())
+
+
+def test_cancelled_follower_does_not_cancel_leader():
+    async def run():
+        db = FakeSupabase({"c1": {"id": "c1"}})
+        cache = _cache()
+        leader = asyncio.create_task(cache.get(db, "c1"))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(cache.get(db, "c1"))
+        await asyncio.sleep(0)
+
+        follower.cancel()
+        await asyncio.sleep(0)
+        db.gate.set()
+
+        assert await asyncio.wait_for(leader, timeout=1) == {"id": "c1"}
+        assert follower.cancelled()
+
+    asyncio.run(run())
+
+
+def test_leader_error_reaches_followers():
+    async def run():
+        db = FakeSupabase({}, error=RuntimeError("database down"))
+        cache = _cache()
+        tasks = [asyncio.create_task(cache.get(db, "c1")) for _ in range(3)]
+        await asyncio.sleep(0)
+        db.gate.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert db.queries == 1
+        assert not cache._pending
+
+    asyncio.run(run())
@@ -0,0 +1,26 @@
+"""utils/compatibility.py: symmetric scores, texts in caller order"""
+
+from utils.bazi_calculator import HEAVENLY_STEMS
+from utils.compatibility import DAY, score_compatibility
+import random
+
+
+def _chart(rng):
+    return tuple(rng.randrange(10) for _ in range(4)) + tuple(rng.randrange(12) for _ in range(4))
+
+
+def test_scores_are_symmetric_and_texts_follow_caller_order():
+    rng = random.Random(3)
+    for _ in range(200):
+        user, character = _chart(rng), _chart(rng)
+        if user[DAY] == character[DAY]:
+            continue
+        forward = score_compatibility(user, character)
+        backward = score_compatibility(character, user)
+        assert forward["compatibility_score"] == backward["compatibility_score"]
+        assert forward["sub_scores"] == backward["sub_scores"]
+
+        match = forward["personality_match"]
+        assert match.index(HEAVENLY_STEMS[user[DAY]]) < match.index(HEAVENLY_STEMS[character[DAY]])
+        match = backward["personality_match"]
+        assert match.index(HEAVENLY_STEMS[character[DAY]]) < match.index(HEAVENLY_STEMS[user[DAY]])
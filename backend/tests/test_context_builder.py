@@ -0,0 +1,45 @@
+"""utils/context_builder.py: every turn is in the prompt or the summary"""
+
+from utils.context_builder import build_context
+import random
+
+
+def _run_conversation(seed, turns, budget, max_turns, fold_turns):
+    rng = random.Random(seed)
+    history, summarized = [], set()
+    for i in range(turns):
+        context = build_context(history, "summary" if summarized else None, "hello", budget, max_turns, fold_turns)
+        assert context.tokens <= budget
+        if context.needs_fold:
+            summarized.update(turn["created_at"] for turn in context.fold)
+
+        # A turn that no longer fits is due for folding in the same request
+        in_prompt = {turn["created_at"] for turn in context.recent}
+        for turn in history:
+            assert turn["created_at"] in in_prompt or turn["created_at"] in summarized
+        history = history[len(context.fold):]
+        history.append({
+            "created_at": f"{i:06d}",
+            "user": "word " * rng.randrange(1, 20),
+            "assistant": "word " * rng.randrange(1, 60)
+        })
+
+
+def test_no_turn_lost_when_max_turns_binds():
+    _run_conversation(seed=1, turns=300, budget=100_000, max_turns=6, fold_turns=4)
+
+
+def test_no_turn_lost_when_budget_binds():
+    _run_conversation(seed=2, turns=300, budget=400, max_turns=50, fold_turns=4)
+
+
+def test_overflow_is_folded_in_batches():
+    history = [{"created_at": f"{i:06d}", "user": "hi", "assistant": "hello"} for i in range(8)]
+    context = build_context(history, None, "hello", budget=100_000, max_turns=6, fold_turns=4)
+    assert len(context.overflow) == 2
+    assert not context.needs_fold
+    assert context.recent == history
+
+    history.extend({"created_at": f"{i:06d}", "user": "hi", "assistant": "hello"} for i in range(8, 10))
+    context = build_context(history, None, "hello", budget=100_000, max_turns=6, fold_turns=4)
+    assert context.fold == history[:4]
@@ -0,0 +1,52 @@
+"""utils/greeting_worker.py: bounded queue, chunked recovery RPCs"""
+
+from utils import greeting_worker as greeting_module
+from utils.greeting_worker import GreetingWorker
+import asyncio
+
+
+class _RPC:
+    def __init__(self, calls, name, params):
+        self.calls = calls
+        self.name = name
+        self.params = params
+
+    async def execute(self):
+        self.calls.append((self.name, self.params))
+        return type("Result", (), {"data": []})()
+
+
+class _Supabase:
+    def __init__(self):
+        self.calls = []
+
+    def rpc(self, name, params):
+        return _RPC(self.calls, name, params)
+
+
+def _item(i):
+    return {"id": f"c{i}", "character_name": "n", "personality_summary": "p", "bazi_string": "b"}
+
+
+def test_full_queue_defers_to_sweep_and_touches_in_chunks(monkeypatch):
+    monkeypatch.setattr(greeting_module, "RECOVERY_BATCH_SIZE", 3)
+
+    async def run():
+        worker = GreetingWorker(concurrency=0, max_queue_size=7, max_retries=0, retry_backoff=0, recovery_age=0, recovery_interval=3600)
+        supabase = _Supabase()
+        worker.start(supabase)
+        for i in range(10):
+            worker.submit(_item(i))
+        assert worker.stats()["queue_depth"] == 7
+        assert worker.stats()["deferred"] == 3
+
+        await asyncio.sleep(0)
+        touched = [params["ids"] for name, params in supabase.calls if name == "touch_pending_greetings"]
+        assert [len(ids) for ids in touched] == [3, 3, 1]
+        assert sorted(sum(touched, [])) == sorted(f"c{i}" for i in range(7))
+        # Queue is full: nothing claimed until there's room
+        assert not any(name == "claim_pending_greetings" for name, _ in supabase.calls)
+
+        await worker.drain(timeout=0)
+
+    asyncio.run(run())
@@ -0,0 +1,193 @@
+"""
+utils/search_index.py against a brute-force scorer that rescans every live
+row, through add / edit / remove cycles and compactions.
+"""
+
+from datetime import datetime, timedelta
+from utils import search_index as search_module
+from utils.search_index import B, FIELD_WEIGHTS, K1, SearchIndex, normalize, tokenize
+import asyncio
+import math
+import random
+import threading
+
+WORDS = "温柔 坚定 好奇 冷静 热情 孤独 勇敢 旅人 剑客 学者 雨夜 星空 江湖 校园 守护 约定 music night".split()
+TAGS = "治愈 旅行 武侠 校园 科幻 古风".split()
+GENDERS = ("male", "female")
+EPOCH = datetime(2024, 1, 1)
+
+
+def make_row(rng: random.Random, serial: int):
+    return {
+        "character_name": "".join(rng.sample(WORDS, 2)),
+        "tags": rng.sample(TAGS, 2),
+        "personality_traits": rng.sample(WORDS, 2),
+        "description": " ".join(rng.sample(WORDS, rng.randint(2, 8))),
+        "primary_element": rng.choice("木火土金水"),
+        "creation_mode": "original",
+        "gender": rng.choice(GENDERS),
+        "created_at": (EPOCH + timedelta(minutes=serial)).isoformat(),
+    }
+
+
+def brute_force(rows, query, filters, tag):
+    """{character_id: score} over the live rows, BM25 computed from scratch"""
+    counts = {}
+    for character_id, row in rows.items():
+        terms = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            value = row.get(field) or []
+            for text in [value] if isinstance(value, str) else value:
+                for token in tokenize(text, unigrams=field != "description"):
+                    terms[token] = terms.get(token, 0) + weight
+        counts[character_id] = terms
+
+    live = len(rows)
+    average = sum(sum(t.values()) for t in counts.values()) / live
+    candidates = [
+        character_id for character_id, row in rows.items()
+        if all(row.get(name) == value for name, value in filters.items())
+        and (tag is None or normalize(tag) in {normalize(t) for t in row["tags"]})
+    ]
+    scores = {character_id: 0.0 for character_id in candidates}
+    for term in dict.fromkeys(tokenize(query)):
+        df = sum(1 for terms in counts.values() if term in terms)
+        if not df:
+            continue
+        idf = math.log(1 + (live - df + 0.5) / (df + 0.5))
+        for character_id in candidates:
+            freq = counts[character_id].get(term)
+            if freq:
+                length = sum(counts[character_id].values())
+                norm = K1 * (1 - B + B * length / average)
+                scores[character_id] += idf * freq * (K1 + 1) / (freq + norm)
+    return {character_id: score for character_id, score in scores.items() if score > 0}
+
+
+def _queries(rng):
+    for _ in range(25):
+        yield " ".join(rng.sample(WORDS, rng.randint(1, 2))), {}, None
+    yield rng.choice(WORDS), {"gender": "female"}, None
+    yield rng.choice(WORDS), {}, rng.choice(TAGS)
+
+
+def _check_scores(index, rows, rng):
+    for query, filters, tag in _queries(rng):
+        hits, total = index.search(query, filters=filters, tag=tag, limit=len(rows))
+        expected = brute_force(rows, query, filters, tag)
+        assert total == len(expected)
+        assert {character_id for character_id, _ in hits} == set(expected)
+        for character_id, score in hits:
+            assert math.isclose(score, expected[character_id], abs_tol=1e-3)
+        scores = [score for _, score in hits]
+        assert scores == sorted(scores, reverse=True)
+
+
+def _check_browse(index, rows):
+    for tag in TAGS:
+        expected = sorted(
+            (character_id for character_id, row in rows.items() if tag in row["tags"]),
+            key=lambda character_id: rows[character_id]["created_at"], reverse=True
+        )
+        hits, total = index.search("", tag=tag, limit=len(rows))
+        assert total == len(expected)
+        assert [character_id for character_id, _ in hits] == expected
+        page, _ = index.search("", tag=tag, offset=3, limit=5)
+        assert [character_id for character_id, _ in page] == expected[3:8]
+
+
+def test_matches_brute_force_through_edits_and_compaction(monkeypatch):
+    monkeypatch.setattr(search_module, "_COMPACT_MIN_DEAD", 20)
+    rng = random.Random(7)
+    index = SearchIndex(refresh_interval=0)
+    rows = {}
+    serial = 0
+    due = 0
+
+    for cycle in range(6):
+        for _ in range(60):
+            serial += 1
+            character_id = f"c{serial}"
+            rows[character_id] = make_row(rng, serial)
+            index.add(character_id, rows[character_id])
+
+        for character_id in rng.sample(sorted(rows), 25):
+            if rng.random() < 0.5:
+                del rows[character_id]
+                index.remove(character_id)
+            else:
+                # Edit: re-indexed at the end, but keeps its created_at
+                rows[character_id] = {**make_row(rng, 0), "created_at": rows[character_id]["created_at"]}
+                index.add(character_id, rows[character_id])
+        # Writes never compact on the request path; they only flag it as due
+        if index._needs_compaction(index._state):
+            due += 1
+
+        # Match sets and browse order hold with tombstones present
+        for query, filters, tag in _queries(rng):
+            _, total = index.search(query, filters=filters, tag=tag)
+            assert total == len(brute_force(rows, query, filters, tag))
+        _check_browse(index, rows)
+
+        # Scores are exact once tombstones are gone (they still count towards df)
+        asyncio.run(index.compact())
+        assert index._state.dead == 0
+        assert len(index) == len(rows)
+        _check_scores(index, rows, rng)
+        _check_browse(index, rows)
+
+    assert due > 0
+
+
+def test_writes_during_compaction_are_replayed():
+    rng = random.Random(5)
+    rows = {f"c{i}": make_row(rng, i) for i in range(300)}
+    index = SearchIndex(refresh_interval=0)
+    for character_id, row in rows.items():
+        index.add(character_id, row)
+    for character_id in list(rows)[:100]:
+        del rows[character_id]
+        index.remove(character_id)
+
+    gate = threading.Event()
+    compacted = index._compacted
+
+    def blocked(state):
+        gate.wait()
+        return compacted(state)
+
+    index._compacted = blocked
+
+    async def run():
+        task = asyncio.create_task(index.compact())
+        await asyncio.sleep(0.01)
+        # The state being compacted is left alone; these land after the swap
+        before = index._state
+        dead = before.dead
+        for serial in range(300, 320):
+            rows[f"c{serial}"] = make_row(rng, serial)
+            index.add(f"c{serial}", rows[f"c{serial}"])
+        for character_id in list(rows)[:10]:
+            del rows[character_id]
+            index.remove(character_id)
+        assert index._state is before and before.dead == dead
+        gate.set()
+        await task
+
+    asyncio.run(run())
+    assert index._state.dead == 10
+    assert len(index) == len(rows)
+    for query, filters, tag in _queries(rng):
+        _, total = index.search(query, filters=filters, tag=tag)
+        assert total == len(brute_force(rows, query, filters, tag))
+    _check_browse(index, rows)
+
+
+def test_reload_order_does_not_change_browse_order():
+    rng = random.Random(11)
+    rows = {f"c{i}": make_row(rng, i) for i in range(200)}
+    index = SearchIndex(refresh_interval=0)
+    # A reload indexes in id order, not creation order
+    for character_id in sorted(rows, key=lambda character_id: rng.random()):
+        index.add(character_id, rows[character_id])
+    _check_browse(index, rows)
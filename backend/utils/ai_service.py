@@ -1,25 +1,117 @@
 """
-AI Service for character interactions using OpenAI
+AI Service for character interactions
+
+All calls go through the configured LLM provider (utils.llm_provider) and
+share one concurrency limiter, so a burst of chat turns queues (boundedly)
+instead of stalling the server.
 """
 
-from openai import OpenAI
 from config import settings
-from typing import Dict, List, Optional
-import json
+from typing import AsyncIterator, Dict, List, Optional
+from utils.compatibility import chart_of, score_compatibility
+from utils.completion_cache import completion_cache, completion_key
+from utils.concurrency import ConcurrencyLimiter, CapacityExceeded
+from utils.llm_provider import llm_provider
+from utils.metrics import llm_request_errors, llm_request_seconds, llm_tokens
+from utils.persona import PersonaPack
+from utils.ttl_cache import TTLCache
+import time
+
+openai_limiter = ConcurrencyLimiter(
+    name="AI service",
+    max_concurrency=settings.OPENAI_MAX_CONCURRENCY,
+    max_queue=settings.OPENAI_MAX_QUEUE,
+    queue_timeout=settings.OPENAI_QUEUE_TIMEOUT_SECONDS,
+    retry_after=settings.OPENAI_RETRY_AFTER_SECONDS
+)
+
+compatibility_advice_cache = TTLCache(
+    max_size=settings.COMPATIBILITY_ADVICE_CACHE_SIZE,
+    ttl=settings.COMPATIBILITY_ADVICE_CACHE_TTL_SECONDS
+)
+
+CHAT_FALLBACK_RESPONSE = "抱歉，我现在有些困惑，能再说一遍吗？"
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+
+class StreamInterrupted(Exception):
+    """The upstream stream failed after part of the response was sent"""
+
+
+def _record_tokens(
+    purpose: str,
+    messages: List[Dict],
+    text: str,
+    prompt_tokens: Optional[int] = None,
+    completion_tokens: Optional[int] = None
+) -> None:
+    """Count token usage, estimating whatever the provider didn't report"""
+    # Imported here: context_builder imports this module
+    from utils.context_builder import MESSAGE_OVERHEAD_TOKENS, count_tokens
+    
+    if prompt_tokens is None:
+        prompt_tokens = sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+    if completion_tokens is None:
+        completion_tokens = count_tokens(text)
+    llm_tokens.inc(llm_provider.name, purpose, "prompt", amount=prompt_tokens)
+    llm_tokens.inc(llm_provider.name, purpose, "completion", amount=completion_tokens)
 
 
 class AIService:
     """AI Service for generating character responses"""
     
     @staticmethod
-    def generate_character_greeting(
+    async def _complete(
+        messages: List[Dict],
+        max_tokens: int,
+        temperature: float,
+        purpose: str,
+        cache: bool = True
+    ) -> str:
+        """One chat completion through the limiter.
+
+        Identical requests are served from completion_cache; pass
+        `cache=False` for calls whose output should differ every time.
+        `purpose` labels the call in the LLM metrics.
+        """
+        model = settings.LLM_MODEL
+        
+        async def create() -> str:
+            async with openai_limiter.slot():
+                started = time.perf_counter()
+                try:
+                    completion = await llm_provider.complete(model, messages, max_tokens, temperature)
+                except Exception:
+                    llm_request_errors.inc(llm_provider.name, purpose)
+                    raise
+                finally:
+                    llm_request_seconds.observe(time.perf_counter() - started, llm_provider.name, purpose)
+            _record_tokens(purpose, messages, completion.text, completion.prompt_tokens, completion.completion_tokens)
+            return completion.text
+        
+        if not cache or not completion_cache.cacheable(temperature):
+            completion_cache.bypass()
+            return await create()
+        
+        key = completion_key(model, messages, {"max_tokens": max_tokens, "temperature": temperature})
+        return await completion_cache.get_or_create(key, create)
+    
+    @staticmethod
+    def default_greeting(character_name: str) -> str:
+        """Greeting used when none is given and none could be generated"""
+        return f"你好，我是{character_name}，很高兴认识你！"
+    
+    @staticmethod
+    async def generate_character_greeting(
         character_name: str,
         personality_summary: str,
-        bazi_string: str
+        bazi_string: str,
+        fallback: bool = True
     ) -> str:
-        """Generate a greeting message for a character"""
+        """Generate a greeting message for a character.
+
+        Falls back to a default greeting when the AI service is busy or
+        fails; with `fallback=False` the error is raised so the caller can retry.
+        """
         
         prompt = f"""You are {character_name}, a character with the following traits:
 Personality: {personality_summary}
@@ -29,112 +121,199 @@ Generate a warm, character-appropriate greeting message (in Chinese, max 100 cha
 Do not include any explanation, just the greeting itself."""
 
         try:
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            # Cached: characters with the same inputs share a greeting
+            return await AIService._complete(
                 messages=[
                     {"role": "system", "content": "You are a helpful character creator assistant."},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=150,
-                temperature=0.8
+                temperature=0.8,
+                purpose="greeting"
             )
-            return response.choices[0].message.content.strip()
         except Exception as e:
-            return f"你好，我是{character_name}，很高兴认识你！"
+            if not fallback:
+                raise
+            return AIService.default_greeting(character_name)
     
     @staticmethod
-    def generate_chat_response(
+    def build_chat_messages(
         user_message: str,
-        character_name: str,
-        character_personality: str,
-        bazi_data: Dict,
-        conversation_history: List[Dict] = None
-    ) -> str:
-        """Generate AI response based on character's personality and BaZi"""
+        persona: PersonaPack,
+        conversation_history: List[Dict] = None,
+        conversation_summary: Optional[str] = None
+    ) -> List[Dict]:
+        """Build the chat completion messages for a character turn.
+
+        The compiled persona always comes first and unchanged, so the prompt
+        prefix is stable across turns. `conversation_history` should already
+        be trimmed to the context budget (see utils.context_builder); older
+        turns are represented by `conversation_summary`.
+        """
         
-        if conversation_history is None:
-            conversation_history = []
+        messages = [persona.message]
         
-        system_prompt = f"""你是{character_name}。你的性格特征：{character_personality}
-
-你的命理特征：
-- 八字：{bazi_data.get('bazi_string', '')}
-- 日主：{bazi_data.get('day_master', '')}
-- 主要元素：{bazi_data.get('primary_element', '')}
-
-请以这个角色的身份回复用户。保持性格一致，回复自然流畅（中文），不要过于生硬或说教。"""
-
-        messages = [
-            {"role": "system", "content": system_prompt}
-        ]
+        if conversation_summary:
+            messages.append({"role": "system", "content": f"此前对话摘要：{conversation_summary}"})
         
         # Add conversation history
-        for msg in conversation_history[-10:]:  # Last 10 messages
+        for msg in conversation_history or ():
             messages.append({"role": "user", "content": msg.get("user", "")})
             messages.append({"role": "assistant", "content": msg.get("assistant", "")})
         
         # Add current message
         messages.append({"role": "user", "content": user_message})
+        return messages
+    
+    @staticmethod
+    async def generate_chat_response(
+        user_message: str,
+        persona: PersonaPack,
+        conversation_history: List[Dict] = None,
+        conversation_summary: Optional[str] = None
+    ) -> str:
+        """Generate AI response based on character's personality and BaZi"""
+        
+        messages = AIService.build_chat_messages(
+            user_message, persona, conversation_history, conversation_summary
+        )
         
         try:
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                max_tokens=500,
-                temperature=0.9
-            )
-            return response.choices[0].message.content.strip()
+            return await AIService._complete(messages, max_tokens=500, temperature=0.9, purpose="chat", cache=False)
+        except CapacityExceeded:
+            raise
         except Exception as e:
             print(f"AI Service Error: {str(e)}")
-            return "抱歉，我现在有些困惑，能再说一遍吗？"
+            return CHAT_FALLBACK_RESPONSE
     
     @staticmethod
-    def analyze_bazi_compatibility(
-        user_bazi: Dict,
-        character_bazi: Dict
-    ) -> Dict:
-        """Analyze compatibility between user and character (Synastry)"""
-        
-        prompt = f"""作为命理分析专家，分析以下两个八字的相性：
+    async def stream_chat_response(
+        user_message: str,
+        persona: PersonaPack,
+        conversation_history: List[Dict] = None,
+        conversation_summary: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream the AI response token by token.
 
-用户八字：{user_bazi.get('bazi_string', '')}
-角色八字：{character_bazi.get('bazi_string', '')}
+        Closing the generator early (e.g. the client went away) closes the
+        upstream stream, so generation stops there too. The limiter slot is
+        held for the whole stream. If the stream fails before any text, the
+        fallback response is streamed instead; after some text, it raises
+        StreamInterrupted so the partial reply isn't taken as complete.
+        """
+        
+        messages = AIService.build_chat_messages(
+            user_message, persona, conversation_history, conversation_summary
+        )
+        
+        stream = llm_provider.stream(settings.LLM_MODEL, messages, max_tokens=500, temperature=0.9)
+        chunks = []
+        started = None
+        try:
+            async with openai_limiter.slot():
+                started = time.perf_counter()
+                async for token in stream:
+                    chunks.append(token)
+                    yield token
+        except CapacityExceeded:
+            raise
+        except Exception as e:
+            print(f"AI Service Error: {str(e)}")
+            llm_request_errors.inc(llm_provider.name, "chat")
+            if chunks:
+                raise StreamInterrupted(str(e)) from e
+            yield CHAT_FALLBACK_RESPONSE
+        finally:
+            await stream.aclose()
+            if started is not None:
+                llm_request_seconds.observe(time.perf_counter() - started, llm_provider.name, "chat")
+                _record_tokens("chat", messages, "".join(chunks))
+    
+    @staticmethod
+    async def summarize_conversation(
+        previous_summary: Optional[str],
+        turns: List[Dict]
+    ) -> Optional[str]:
+        """Fold older turns into a running conversation summary"""
+        
+        transcript = "\n".join(
+            f"用户：{turn.get('user', '')}\n角色：{turn.get('assistant', '')}"
+            for turn in turns
+        )
+        prompt = f"""以下是一段角色扮演对话的已有摘要和后续对话记录。
+请将它们合并为一份新的简洁摘要（中文，不超过200字），保留重要事实、用户偏好和情感走向。只输出摘要本身。
 
-请从以下维度简要分析（每项2-3句话）：
-1. 五行相生相克
-2. 性格契合度
-3. 互动建议
+已有摘要：{previous_summary or "无"}
 
-以JSON格式返回，包含 compatibility_score (0-100), elements_analysis, personality_match, advice 字段。"""
+对话记录：
+{transcript}"""
 
         try:
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            # Transcripts never repeat, so caching would only take up space
+            return await AIService._complete(
                 messages=[
-                    {"role": "system", "content": "You are a professional BaZi analyst."},
+                    {"role": "system", "content": "You summarize conversations accurately and concisely."},
                     {"role": "user", "content": prompt}
                 ],
-                max_tokens=800,
-                temperature=0.7
+                max_tokens=settings.CHAT_SUMMARY_MAX_TOKENS,
+                temperature=0.3,
+                purpose="summary",
+                cache=False
             )
-            
-            content = response.choices[0].message.content.strip()
-            # Try to parse JSON, fallback to structured response
-            try:
-                return json.loads(content)
-            except:
-                return {
-                    "compatibility_score": 75,
-                    "elements_analysis": content,
-                    "personality_match": "中等契合",
-                    "advice": "保持真诚沟通"
-                }
         except Exception as e:
             print(f"AI Service Error: {str(e)}")
-            return {
-                "compatibility_score": 70,
-                "elements_analysis": "分析暂时不可用",
-                "personality_match": "待分析",
-                "advice": "多多交流以增进了解"
-            }
+            return None
+    
+    @staticmethod
+    async def analyze_bazi_compatibility(
+        user_bazi: Dict,
+        character_bazi: Dict,
+        phrase_advice: bool = False
+    ) -> Dict:
+        """Analyze compatibility between user and character (Synastry).
 
+        Scores come from the local engine (utils.compatibility). With
+        `phrase_advice`, the AI rewrites the advice from those results; it is
+        cached per chart pair and falls back to the template advice on error.
+        """
+        user_chart = chart_of(user_bazi)
+        character_chart = chart_of(character_bazi)
+        result = score_compatibility(user_chart, character_chart)
+        analysis = {**result, "sub_scores": dict(result["sub_scores"]), "advice_source": "template"}
+        
+        if not phrase_advice:
+            return analysis
+        
+        # Ordered: the advice is written from the user's side
+        pair = (user_chart, character_chart)
+        advice = compatibility_advice_cache.get(pair)
+        if advice is None:
+            prompt = f"""作为命理分析专家，根据以下合盘结果，用2-3句话给出温和具体的互动建议：
+
+用户八字：{user_bazi.get('bazi_string', '')}
+角色八字：{character_bazi.get('bazi_string', '')}
+综合相性：{result['compatibility_score']}分
+五行：{result['elements_analysis']}
+日主：{result['personality_match']}
+关键关系：{'、'.join(result['highlights']) or '无明显合冲'}
+
+只返回建议本身。"""
+            
+            try:
+                advice = await AIService._complete(
+                    messages=[
+                        {"role": "system", "content": "You are a professional BaZi analyst."},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=200,
+                    temperature=0.7,
+                    purpose="compatibility"
+                )
+                compatibility_advice_cache.set(pair, advice)
+            except Exception as e:
+                print(f"AI Service Error: {str(e)}")
+                return analysis
+        
+        analysis["advice"] = advice
+        analysis["advice_source"] = "ai"
+        return analysis
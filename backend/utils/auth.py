@@ -0,0 +1,165 @@
+"""
+Shared authentication dependency.
+
+Supabase access tokens are JWTs, so they are verified locally against the
+project JWT secret. Verified tokens are cached until they expire, and the
+remote Supabase Auth lookup is only used when a token cannot be verified
+locally (it uses another algorithm, or `SUPABASE_JWT_SECRET` is not set).
+Rejected tokens are cached briefly so that repeated bad tokens don't each
+cost a Supabase Auth round trip.
+"""
+
+from fastapi import Header, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from jose import jwt, JWTError, ExpiredSignatureError
+from typing import Dict, Optional
+from config import settings
+from database import get_auth_client
+from utils.ttl_cache import TTLCache
+import hashlib
+import time
+
+
+class TokenVerifier:
+    """Verifies bearer tokens and caches token -> user_id"""
+
+    def __init__(self, secret: Optional[str], algorithm: str, audience: str, cache_size: int, cache_ttl: float,
+                 reject_ttl: float):
+        self.secret = secret
+        self.algorithm = algorithm
+        self.audience = audience
+        self.cache = TTLCache(max_size=cache_size, ttl=cache_ttl)
+        self.rejections = TTLCache(max_size=cache_size, ttl=reject_ttl)
+        self.local_verified = 0
+        self.remote_fallbacks = 0
+        self.remote_errors = 0
+        self.rejected = 0
+
+    async def verify(self, token: str) -> str:
+        """Return the user id for a token, or raise 401 (503 if Supabase Auth can't be reached)"""
+        cache_key = hashlib.sha256(token.encode()).digest()
+        user_id = self.cache.get(cache_key)
+        if user_id is not None:
+            return user_id
+        detail = self.rejections.get(cache_key)
+        if detail is not None:
+            self._reject(detail)
+
+        try:
+            user_id, expires_at = self._verify_locally(token)
+            if user_id is None:
+                user_id = await self._verify_remotely(token)
+                expires_at = self._unverified_expiry(token)
+        except HTTPException as e:
+            # Only a verdict on the token is cached, never an outage
+            if e.status_code == status.HTTP_401_UNAUTHORIZED:
+                self.rejections.set(cache_key, e.detail)
+            raise
+
+        ttl = self.cache.ttl
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+        self.cache.set(cache_key, user_id, ttl=ttl)
+        return user_id
+
+    def _verify_locally(self, token: str):
+        """Check signature and expiry; returns (None, None) if we can't decide locally"""
+        try:
+            header = jwt.get_unverified_header(token)
+        except JWTError:
+            self._reject()
+
+        if not self.secret or header.get("alg") != self.algorithm:
+            return None, None
+
+        try:
+            claims = jwt.decode(
+                token,
+                self.secret,
+                algorithms=[self.algorithm],
+                audience=self.audience
+            )
+        except ExpiredSignatureError:
+            self._reject("Token expired")
+        except JWTError:
+            # Supabase signs these with the project secret, so a bad signature
+            # or unexpected claims can't be valid there either
+            self._reject()
+
+        user_id = claims.get("sub")
+        if not user_id:
+            self._reject()
+
+        self.local_verified += 1
+        return user_id, claims.get("exp")
+
+    async def _verify_remotely(self, token: str) -> str:
+        """Ask Supabase Auth about the token"""
+        self.remote_fallbacks += 1
+        supabase = get_auth_client()
+
+        try:
+            user = await run_in_threadpool(supabase.auth.get_user, token)
+        except Exception as e:
+            # Auth API errors carry the HTTP status; 4xx means the token was
+            # refused. Anything else (timeouts, connection errors, 5xx) says
+            # nothing about the token.
+            code = getattr(e, "status", None)
+            if isinstance(code, int) and 400 <= code < 500:
+                self._reject()
+            self.remote_errors += 1
+            print(f"[AUTH] Supabase Auth unavailable: {str(e)}")
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service unavailable"
+            )
+
+        if not user or not user.user:
+            self._reject()
+        return user.user.id
+
+    @staticmethod
+    def _unverified_expiry(token: str) -> Optional[float]:
+        try:
+            return jwt.get_unverified_claims(token).get("exp")
+        except JWTError:
+            return None
+
+    def _reject(self, detail: str = "Invalid token"):
+        self.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=detail
+        )
+
+    def stats(self) -> Dict:
+        return {
+            **self.cache.stats(),
+            "local_verified": self.local_verified,
+            "remote_fallbacks": self.remote_fallbacks,
+            "remote_errors": self.remote_errors,
+            "rejected": self.rejected,
+            "cached_rejections": len(self.rejections),
+        }
+
+
+token_verifier = TokenVerifier(
+    secret=settings.SUPABASE_JWT_SECRET,
+    algorithm=settings.ALGORITHM,
+    audience=settings.JWT_AUDIENCE,
+    cache_size=settings.AUTH_CACHE_MAX_SIZE,
+    cache_ttl=settings.AUTH_CACHE_TTL_SECONDS,
+    reject_ttl=settings.AUTH_REJECT_CACHE_TTL_SECONDS
+)
+
+
+async def get_current_user_id(authorization: str = Header(None)) -> str:
+    """FastAPI dependency: extract and verify the user from the Authorization header"""
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid authorization header"
+        )
+
+    token = authorization[len("Bearer "):]
+    return await token_verifier.verify(token)
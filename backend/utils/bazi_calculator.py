@@ -5,24 +5,36 @@ TODO: Integrate real lunar-python library and true solar time calculations.
 """
 
 from datetime import datetime
-from typing import Dict, List, Tuple
-import random
+from typing import Dict, Iterator, List, Sequence, Tuple
+import numpy as np
 
 
 # Chinese Stems and Branches
 HEAVENLY_STEMS = ["甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬", "癸"]
 EARTHLY_BRANCHES = ["子", "丑", "寅", "卯", "辰", "巳", "午", "未", "申", "酉", "戌", "亥"]
 
-# Ten Gods (十神)
+# Ten Gods (十神), ordered by relation to the day master (same element,
+# generated by it, controlled by it, controlling it, generating it), each as
+# (same polarity, opposite polarity)
 TEN_GODS = [
     "比肩", "劫财", "食神", "伤官", 
     "偏财", "正财", "七杀", "正官", 
     "偏印", "正印"
 ]
 
-# Five Elements
+# Five Elements, in generating order
 FIVE_ELEMENTS = ["木", "火", "土", "金", "水"]
 
+# Personality summary by day master element
+PERSONALITY_SUMMARIES = {
+    "木": "性格积极上进，富有创造力，善于沟通。像树木一样充满生机，向往自由与成长。",
+    "火": "热情开朗，充满活力，具有领导魅力。像火焰一样照亮他人，富有感染力。",
+    "土": "稳重踏实，值得信赖，具有包容心。像大地一样厚德载物，沉稳可靠。",
+    "金": "果断刚毅，原则性强，追求完美。像金属一样坚硬，有主见且执行力强。",
+    "水": "聪慧灵活，适应力强，富有智慧。像水一样灵动，善于变通与思考。"
+}
+DEFAULT_PERSONALITY_SUMMARY = "性格独特，魅力非凡。"
+
 # Hidden Stems mapping (simplified)
 HIDDEN_STEMS_MAP = {
     "子": ["癸"],
@@ -40,6 +52,15 @@ HIDDEN_STEMS_MAP = {
 }
 
 
+def ten_god_index(day_stem_idx, stem_idx):
+    """
+    Index into TEN_GODS of a stem relative to the day master.
+    Works on ints and on numpy arrays alike.
+    """
+    relation = (stem_idx // 2 - day_stem_idx // 2) % 5
+    return relation * 2 + (stem_idx % 2 != day_stem_idx % 2)
+
+
 class BaZiCalculator:
     """Mock BaZi Calculator for MVP"""
     
@@ -79,13 +100,13 @@ class BaZiCalculator:
                 "stem": year_stem,
                 "branch": year_branch,
                 "hidden_stems": HIDDEN_STEMS_MAP[year_branch],
-                "ten_god": random.choice(TEN_GODS)
+                "ten_god": TEN_GODS[ten_god_index(day_stem_idx, year_stem_idx)]
             },
             "month_pillar": {
                 "stem": month_stem,
                 "branch": month_branch,
                 "hidden_stems": HIDDEN_STEMS_MAP[month_branch],
-                "ten_god": random.choice(TEN_GODS)
+                "ten_god": TEN_GODS[ten_god_index(day_stem_idx, month_stem_idx)]
             },
             "day_pillar": {
                 "stem": day_stem,
@@ -97,7 +118,7 @@ class BaZiCalculator:
                 "stem": hour_stem,
                 "branch": hour_branch,
                 "hidden_stems": HIDDEN_STEMS_MAP[hour_branch],
-                "ten_god": random.choice(TEN_GODS)
+                "ten_god": TEN_GODS[ten_god_index(day_stem_idx, hour_stem_idx)]
             },
             "day_master": day_stem,
             "bazi_string": f"{year_stem}{year_branch} {month_stem}{month_branch} {day_stem}{day_branch} {hour_stem}{hour_branch}"
@@ -120,16 +141,7 @@ class BaZiCalculator:
         """Generate personality summary based on BaZi (simplified)"""
         day_master = bazi_data["day_master"]
         element = BaZiCalculator.get_element_from_stem(day_master)
-        
-        summaries = {
-            "木": "性格积极上进，富有创造力，善于沟通。像树木一样充满生机，向往自由与成长。",
-            "火": "热情开朗，充满活力，具有领导魅力。像火焰一样照亮他人，富有感染力。",
-            "土": "稳重踏实，值得信赖，具有包容心。像大地一样厚德载物，沉稳可靠。",
-            "金": "果断刚毅，原则性强，追求完美。像金属一样坚硬，有主见且执行力强。",
-            "水": "聪慧灵活，适应力强，富有智慧。像水一样灵动，善于变通与思考。"
-        }
-        
-        return summaries.get(element, "性格独特，魅力非凡。")
+        return PERSONALITY_SUMMARIES.get(element, DEFAULT_PERSONALITY_SUMMARY)
 
 
 def calculate_bazi_profile(
@@ -162,3 +174,90 @@ def calculate_bazi_profile(
         "personality_summary": personality_summary
     }
 
+
+
+# Lookup arrays for the batch path, indexed by stem / branch / pillar code
+_STEM_NAMES = np.array(HEAVENLY_STEMS)
+_BRANCH_NAMES = np.array(EARTHLY_BRANCHES)
+_TEN_GOD_NAMES = np.array(TEN_GODS)
+_ELEMENT_NAMES = np.array(FIVE_ELEMENTS)
+_SUMMARY_BY_ELEMENT = np.array([PERSONALITY_SUMMARIES[element] for element in FIVE_ELEMENTS])
+_PILLAR_TEXT = np.array([stem + branch for stem in HEAVENLY_STEMS for branch in EARTHLY_BRANCHES])
+
+BATCH_PILLARS = ("year", "month", "day", "hour")
+
+
+def calculate_bazi_batch(
+    birth_years: Sequence[int],
+    birth_months: Sequence[int],
+    birth_days: Sequence[int],
+    birth_hours: Sequence[int],
+    birth_minutes: Sequence[int] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Vectorized calculate_bazi_profile for many birth times at once.
+    Returns columns of equal length: `<pillar>_stem`, `<pillar>_branch` and
+    `<pillar>_ten_god` for each of year/month/day/hour, plus `day_master`,
+    `bazi_string`, `primary_element` and `personality_summary`.
+    Use `iter_bazi_profiles` to turn the columns back into profile dicts.
+    """
+    
+    # birth_minutes is accepted for parity with calculate_bazi_profile;
+    # like the scalar path it doesn't affect the mock calculation yet
+    year = np.asarray(birth_years, dtype=np.int64)
+    month = np.asarray(birth_months, dtype=np.int64)
+    day = np.asarray(birth_days, dtype=np.int64)
+    hour = np.asarray(birth_hours, dtype=np.int64)
+    
+    year_stem = (year - 4) % 10
+    year_branch = (year - 4) % 12
+    month_stem = (year_stem * 2 + month) % 10
+    month_branch = (month + 1) % 12
+    day_stem = (year + month + day) % 10
+    day_branch = (year + month + day) % 12
+    hour_branch = (hour + 1) // 2 % 12
+    hour_stem = (day_stem * 2 + hour_branch) % 10
+    
+    stems = (year_stem, month_stem, day_stem, hour_stem)
+    branches = (year_branch, month_branch, day_branch, hour_branch)
+    
+    columns: Dict[str, np.ndarray] = {}
+    for name, stem, branch in zip(BATCH_PILLARS, stems, branches):
+        columns[f"{name}_stem"] = _STEM_NAMES[stem]
+        columns[f"{name}_branch"] = _BRANCH_NAMES[branch]
+        if name == "day":
+            columns["day_ten_god"] = np.full(day_stem.shape, "日主")
+        else:
+            columns[f"{name}_ten_god"] = _TEN_GOD_NAMES[ten_god_index(day_stem, stem)]
+    
+    pillar_text = [_PILLAR_TEXT[stem * 12 + branch] for stem, branch in zip(stems, branches)]
+    bazi_string = pillar_text[0]
+    for text in pillar_text[1:]:
+        bazi_string = np.char.add(np.char.add(bazi_string, " "), text)
+    
+    element = day_stem // 2
+    columns["day_master"] = columns["day_stem"]
+    columns["bazi_string"] = bazi_string
+    columns["primary_element"] = _ELEMENT_NAMES[element]
+    columns["personality_summary"] = _SUMMARY_BY_ELEMENT[element]
+    return columns
+
+
+def iter_bazi_profiles(columns: Dict[str, np.ndarray]) -> Iterator[Dict]:
+    """Yield calculate_bazi_profile-shaped dicts from calculate_bazi_batch columns"""
+    lists = {key: values.tolist() for key, values in columns.items()}
+    for i in range(len(lists["day_master"])):
+        profile = {}
+        for name in BATCH_PILLARS:
+            branch = lists[f"{name}_branch"][i]
+            profile[f"{name}_pillar"] = {
+                "stem": lists[f"{name}_stem"][i],
+                "branch": branch,
+                "hidden_stems": HIDDEN_STEMS_MAP[branch],
+                "ten_god": lists[f"{name}_ten_god"][i]
+            }
+        profile["day_master"] = lists["day_master"][i]
+        profile["bazi_string"] = lists["bazi_string"][i]
+        profile["primary_element"] = lists["primary_element"][i]
+        profile["personality_summary"] = lists["personality_summary"][i]
+        yield profile
@@ -0,0 +1,137 @@
+"""
+Incremental parsing of bulk character uploads.
+
+Uploads are read from the request body chunk by chunk and turned into one
+dict per record, so an import never holds the whole file in memory. Two
+formats are supported:
+
+- JSONL: one JSON object per line
+- CSV: a header row, then one record per row. List fields
+  (`personality_traits`, `tags`) are either JSON arrays or `;`-separated.
+  Empty cells are treated as missing.
+"""
+
+from starlette.responses import StreamingResponse
+from typing import AsyncIterator, Dict, Tuple
+import csv
+import json
+
+LIST_FIELDS = ("personality_traits", "tags")
+
+
+class ImportFormatError(ValueError):
+    """The upload can't be read any further"""
+
+
+class UploadStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for handlers that keep reading the request body while
+    responding. The stock one listens for disconnects on `receive`, which
+    would swallow the remaining body chunks; here a disconnect surfaces as
+    ClientDisconnect from `request.stream()` instead.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[str]:
+    """Split a byte stream into decoded lines without buffering more than one line"""
+    buffer = bytearray()
+    first = True
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end == -1:
+                break
+            line = bytes(buffer[start:end])
+            start = end + 1
+            yield _decode(line, first)
+            first = False
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            raise ImportFormatError(f"Line longer than {max_line_bytes} bytes")
+    if buffer:
+        yield _decode(bytes(buffer), first)
+
+
+def _decode(line: bytes, first: bool) -> str:
+    try:
+        text = line.decode("utf-8-sig" if first else "utf-8")
+    except UnicodeDecodeError:
+        raise ImportFormatError("Upload is not valid UTF-8")
+    return text.rstrip("\r")
+
+
+async def iter_jsonl_records(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[Dict, str]]:
+    """Yield (record, error) per non-blank line; one of the two is empty"""
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {}, f"Invalid JSON: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield {}, "Expected a JSON object"
+            continue
+        yield record, ""
+
+
+async def iter_csv_records(lines: AsyncIterator[str], max_record_bytes: int) -> AsyncIterator[Tuple[Dict, str]]:
+    """Yield (record, error) per CSV row, keyed by the header row"""
+    header = None
+    pending = ""
+    pending_bytes = 0
+    start_line = 0
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not pending:
+            start_line = line_number
+        # A quoted cell may span lines; keep reading until the quotes balance
+        pending = f"{pending}\n{line}" if pending else line
+        pending_bytes += len(line.encode("utf-8")) + 1
+        if pending_bytes > max_record_bytes:
+            raise ImportFormatError(
+                f"Record starting on line {start_line} is longer than {max_record_bytes} bytes (unbalanced quote?)"
+            )
+        if pending.count('"') % 2:
+            continue
+        text, pending, pending_bytes = pending, "", 0
+        if not text.strip():
+            continue
+
+        cells = next(csv.reader([text]))
+        if header is None:
+            header = [cell.strip() for cell in cells]
+            continue
+        if len(cells) != len(header):
+            yield {}, f"Expected {len(header)} columns, got {len(cells)}"
+            continue
+
+        record = {}
+        for key, value in zip(header, cells):
+            if value == "":
+                continue
+            if key in LIST_FIELDS:
+                value = _parse_list(value)
+            record[key] = value
+        yield record, ""
+
+    if pending:
+        yield {}, "Unterminated quoted field"
+
+
+def _parse_list(value: str):
+    if value.lstrip().startswith("["):
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError:
+            pass
+    return [item.strip() for item in value.split(";") if item.strip()]
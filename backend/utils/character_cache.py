@@ -0,0 +1,84 @@
+"""
+Read-through cache of `characters` rows, shared by the character and chat routers.
+
+Rows are cached by id for `CHARACTER_CACHE_TTL_SECONDS`; ids that don't exist
+are cached for `CHARACTER_CACHE_NEGATIVE_TTL_SECONDS`. Concurrent misses for
+the same id share one database query. Writers must call `invalidate()` after
+updating or deleting a character. Cached rows are shared between requests,
+so callers must treat them as read-only.
+"""
+
+from config import settings
+from typing import Dict, Optional
+from utils.ttl_cache import TTLCache
+import asyncio
+
+# Cached marker for ids that don't exist
+_NOT_FOUND = object()
+
+
+class CharacterCache:
+    """TTL + LRU read-through cache keyed by character id"""
+
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float):
+        self.negative_ttl = negative_ttl
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+        self._pending: Dict[str, asyncio.Future] = {}
+        self.negative_hits = 0
+
+    async def get(self, supabase, character_id: str) -> Optional[Dict]:
+        """Return the character row, or None if it doesn't exist"""
+        row = self._cache.get(character_id)
+        if row is _NOT_FOUND:
+            self.negative_hits += 1
+            return None
+        if row is not None:
+            return row
+
+        pending = self._pending.get(character_id)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The leading request was cancelled, not us: query ourselves
+                return await self.get(supabase, character_id)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[character_id] = future
+        try:
+            result = await supabase.table("characters").select("*").eq("id", character_id).execute()
+            row = result.data[0] if result.data else None
+            if row is None:
+                self._cache.set(character_id, _NOT_FOUND, ttl=self.negative_ttl)
+            else:
+                self._cache.set(character_id, row)
+            future.set_result(row)
+            return row
+        except Exception as e:
+            future.set_exception(e)
+            # Don't warn about an exception nobody else awaited
+            future.exception()
+            raise
+        finally:
+            del self._pending[character_id]
+            if not future.done():
+                # Cancelled: release the requests waiting on us
+                future.cancel()
+
+    def invalidate(self, character_id: str) -> None:
+        self._cache.delete(character_id)
+
+    def stats(self) -> Dict:
+        return {
+            **self._cache.stats(),
+            "negative_hits": self.negative_hits,
+        }
+
+
+character_cache = CharacterCache(
+    max_size=settings.CHARACTER_CACHE_MAX_SIZE,
+    ttl=settings.CHARACTER_CACHE_TTL_SECONDS,
+    negative_ttl=settings.CHARACTER_CACHE_NEGATIVE_TTL_SECONDS
+)
@@ -0,0 +1,264 @@
+"""
+Local BaZi compatibility (合盘) engine.
+
+Scores two charts from their stems, branches and hidden stems without an
+LLM call. All pair relations are precomputed into small lookup tables, so
+scoring a pair is a few dozen table lookups, and results are memoized per
+chart pair. The same tables back the vectorized gallery ranking.
+
+Sub-scores (0-100):
+- elements: five-element balance of both charts together, hidden stems included
+- day_master: relation between the two day masters (合 / 生 / 比和 / 克)
+- stems: 天干五合 and 相冲 plus generating/controlling relations across all stems
+- branches: 六合, 三合 pairs, 六冲 and 六害 across all branches, day branches weighted double
+"""
+
+from functools import lru_cache
+from typing import Dict, List, Tuple
+from utils.bazi_calculator import (
+    HEAVENLY_STEMS, EARTHLY_BRANCHES, FIVE_ELEMENTS, HIDDEN_STEMS_MAP
+)
+
+# A chart is (year_stem, month_stem, day_stem, hour_stem,
+#             year_branch, month_branch, day_branch, hour_branch) as indices
+Chart = Tuple[int, int, int, int, int, int, int, int]
+
+PILLARS = ("year", "month", "day", "hour")
+DAY = 2
+
+# Columns of a characters / bazi_profiles row that make up its chart
+CHART_COLUMNS = ",".join(
+    [f"{pillar}_stem" for pillar in PILLARS] + [f"{pillar}_branch" for pillar in PILLARS] + ["bazi_string"]
+)
+
+WEIGHTS = {"elements": 0.25, "day_master": 0.30, "stems": 0.15, "branches": 0.30}
+
+# Weights of a branch's hidden stems: main qi first
+HIDDEN_STEM_WEIGHTS = (0.6, 0.3, 0.1)
+
+_STEM_INDEX = {stem: i for i, stem in enumerate(HEAVENLY_STEMS)}
+_BRANCH_INDEX = {branch: i for i, branch in enumerate(EARTHLY_BRANCHES)}
+
+# Pair relations, as unordered index pairs
+STEM_COMBINATIONS = {frozenset(pair) for pair in [(0, 5), (1, 6), (2, 7), (3, 8), (4, 9)]}  # 甲己 乙庚 丙辛 丁壬 戊癸
+STEM_CLASHES = {frozenset(pair) for pair in [(0, 6), (1, 7), (2, 8), (3, 9)]}  # 甲庚 乙辛 丙壬 丁癸
+BRANCH_COMBINATIONS = {frozenset(pair) for pair in [(0, 1), (2, 11), (3, 10), (4, 9), (5, 8), (6, 7)]}  # 六合
+BRANCH_TRINES = [(8, 0, 4), (11, 3, 7), (2, 6, 10), (5, 9, 1)]  # 申子辰 亥卯未 寅午戌 巳酉丑
+BRANCH_CLASHES = {frozenset((i, i + 6)) for i in range(6)}  # 六冲
+BRANCH_HARMS = {frozenset(pair) for pair in [(0, 7), (1, 6), (2, 5), (3, 4), (8, 11), (9, 10)]}  # 六害
+
+_TRINE_PAIRS = {
+    frozenset((a, b))
+    for trine in BRANCH_TRINES
+    for a in trine
+    for b in trine
+    if a != b
+}
+
+
+def stem_element(stem: int) -> int:
+    return stem // 2
+
+
+def element_relation(a: int, b: int) -> str:
+    """How element `a` relates to element `b` (order-independent)"""
+    if a == b:
+        return "same"
+    if (a + 1) % 5 == b or (b + 1) % 5 == a:
+        return "generating"
+    return "controlling"
+
+
+def _stem_pair_score(a: int, b: int) -> int:
+    pair = frozenset((a, b))
+    if pair in STEM_COMBINATIONS:
+        return 10
+    if pair in STEM_CLASHES:
+        return -10
+    relation = element_relation(stem_element(a), stem_element(b))
+    return {"same": 1, "generating": 3, "controlling": -3}[relation]
+
+
+def _branch_pair_score(a: int, b: int) -> int:
+    pair = frozenset((a, b))
+    if pair in BRANCH_COMBINATIONS:
+        return 10
+    if pair in _TRINE_PAIRS:
+        return 6
+    if pair in BRANCH_CLASHES:
+        return -10
+    if pair in BRANCH_HARMS:
+        return -6
+    return 0
+
+
+def _day_master_score(a: int, b: int) -> int:
+    if frozenset((a, b)) in STEM_COMBINATIONS:
+        return 100
+    score = {"generating": 88, "same": 72, "controlling": 45}[
+        element_relation(stem_element(a), stem_element(b))
+    ]
+    # Yin meets yang
+    if a % 2 != b % 2:
+        score += 5
+    return score
+
+
+STEM_PAIR_SCORES: List[List[int]] = [[_stem_pair_score(a, b) for b in range(10)] for a in range(10)]
+BRANCH_PAIR_SCORES: List[List[int]] = [[_branch_pair_score(a, b) for b in range(12)] for a in range(12)]
+DAY_MASTER_SCORES: List[List[int]] = [[_day_master_score(a, b) for b in range(10)] for a in range(10)]
+
+# Element weights contributed by each branch through its hidden stems
+BRANCH_ELEMENT_WEIGHTS: List[List[float]] = []
+for _branch in EARTHLY_BRANCHES:
+    _weights = [0.0] * 5
+    for _stem, _weight in zip(HIDDEN_STEMS_MAP[_branch], HIDDEN_STEM_WEIGHTS):
+        _weights[stem_element(_STEM_INDEX[_stem])] += _weight
+    BRANCH_ELEMENT_WEIGHTS.append(_weights)
+
+# Raw stem / branch sums mapped to 0 and 100; sums outside clamp. Charts
+# can reach ±160 (16 stem pairs) and ±170 (16 + 1 branch pairs), but real
+# pairs rarely get near that, so the scale covers the range they do use.
+STEM_RANGE = (-60, 60)
+BRANCH_RANGE = (-70, 70)
+
+
+def chart_from_row(row: Dict) -> Chart:
+    """Chart of a characters / bazi_profiles row (or any dict with *_stem / *_branch keys)"""
+    return tuple(
+        [_STEM_INDEX[row[f"{pillar}_stem"]] for pillar in PILLARS]
+        + [_BRANCH_INDEX[row[f"{pillar}_branch"]] for pillar in PILLARS]
+    )
+
+
+def chart_from_bazi(bazi_data: Dict) -> Chart:
+    """Chart of a calculate_bazi_profile result"""
+    return tuple(
+        [_STEM_INDEX[bazi_data[f"{pillar}_pillar"]["stem"]] for pillar in PILLARS]
+        + [_BRANCH_INDEX[bazi_data[f"{pillar}_pillar"]["branch"]] for pillar in PILLARS]
+    )
+
+
+def chart_of(data: Dict) -> Chart:
+    """Chart of either a calculate_bazi_profile result or a table row"""
+    return chart_from_bazi(data) if "day_pillar" in data else chart_from_row(data)
+
+
+def canonical_pair(a: Chart, b: Chart) -> Tuple[Chart, Chart]:
+    return (a, b) if a <= b else (b, a)
+
+
+def element_profile(chart: Chart) -> List[float]:
+    """Weight of each element in a chart: stems count 1, branches via hidden stems"""
+    weights = [0.0] * 5
+    for stem in chart[:4]:
+        weights[stem_element(stem)] += 1.0
+    for branch in chart[4:]:
+        for element, weight in enumerate(BRANCH_ELEMENT_WEIGHTS[branch]):
+            weights[element] += weight
+    return weights
+
+
+def balance_score(weights: List[float]) -> float:
+    """100 for an even spread over the five elements, 0 for a single element"""
+    total = sum(weights)
+    deviation = sum(abs(weight / total - 0.2) for weight in weights)
+    return 100 * (1 - deviation / 1.6)
+
+
+def _scale(value: float, bounds: Tuple[int, int]) -> float:
+    low, high = bounds
+    return max(0.0, min(100.0, (value - low) * 100 / (high - low)))
+
+
+def _describe(a: Chart, b: Chart, combined: List[float], sub_scores: Dict[str, int]) -> Dict[str, object]:
+    """Template texts and notable relations for a scored pair"""
+    highlights = []
+    for i in range(4):
+        for j in range(4):
+            pair = frozenset((a[i], b[j]))
+            if pair in STEM_COMBINATIONS:
+                highlights.append(f"{HEAVENLY_STEMS[a[i]]}{HEAVENLY_STEMS[b[j]]}相合")
+            elif pair in STEM_CLASHES:
+                highlights.append(f"{HEAVENLY_STEMS[a[i]]}{HEAVENLY_STEMS[b[j]]}相冲")
+            pair = frozenset((a[4 + i], b[4 + j]))
+            if pair in BRANCH_COMBINATIONS:
+                highlights.append(f"{EARTHLY_BRANCHES[a[4 + i]]}{EARTHLY_BRANCHES[b[4 + j]]}六合")
+            elif pair in BRANCH_CLASHES:
+                highlights.append(f"{EARTHLY_BRANCHES[a[4 + i]]}{EARTHLY_BRANCHES[b[4 + j]]}相冲")
+    highlights = list(dict.fromkeys(highlights))
+
+    strongest = FIVE_ELEMENTS[max(range(5), key=lambda e: combined[e])]
+    weakest = FIVE_ELEMENTS[min(range(5), key=lambda e: combined[e])]
+    relation = element_relation(stem_element(a[DAY]), stem_element(b[DAY]))
+    day_masters = f"{HEAVENLY_STEMS[a[DAY]]}{FIVE_ELEMENTS[stem_element(a[DAY])]}与{HEAVENLY_STEMS[b[DAY]]}{FIVE_ELEMENTS[stem_element(b[DAY])]}"
+
+    elements_analysis = f"两盘合看{strongest}气最旺，{weakest}气最弱，五行平衡度{sub_scores['elements']}分。"
+    if frozenset((a[DAY], b[DAY])) in STEM_COMBINATIONS:
+        personality_match = f"日主{day_masters}天干相合，天然投契，容易彼此吸引。"
+    elif relation == "generating":
+        personality_match = f"日主{day_masters}相生，一方能滋养另一方，相处融洽。"
+    elif relation == "same":
+        personality_match = f"日主{day_masters}比和，志趣相近，像朋友一样默契。"
+    else:
+        personality_match = f"日主{day_masters}相克，个性差异明显，需要更多包容。"
+
+    if sub_scores["branches"] < 45:
+        advice = "地支多有冲害，交流时放慢节奏，先倾听再表达。"
+    elif sub_scores["elements"] < 50:
+        advice = f"两人都偏少{weakest}的能量，可以一起尝试能补足{weakest}气的话题与活动。"
+    else:
+        advice = "整体气场相合，保持真诚自然的交流即可。"
+
+    return {
+        "elements_analysis": elements_analysis,
+        "personality_match": personality_match,
+        "advice": advice,
+        "highlights": highlights,
+    }
+
+
+@lru_cache(maxsize=65536)
+def _score_pair(a: Chart, b: Chart) -> Tuple[int, Dict[str, int], List[float]]:
+    """(score, sub-scores, combined element weights); symmetric in a and b"""
+    stems = sum(STEM_PAIR_SCORES[x][y] for x in a[:4] for y in b[:4])
+    branches = sum(BRANCH_PAIR_SCORES[x][y] for x in a[4:] for y in b[4:])
+    # Day branches (spouse palace) count double
+    branches += BRANCH_PAIR_SCORES[a[4 + DAY]][b[4 + DAY]]
+
+    combined = [x + y for x, y in zip(element_profile(a), element_profile(b))]
+    sub_scores = {
+        "elements": round(balance_score(combined)),
+        "day_master": DAY_MASTER_SCORES[a[DAY]][b[DAY]],
+        "stems": round(_scale(stems, STEM_RANGE)),
+        "branches": round(_scale(branches, BRANCH_RANGE)),
+    }
+    score = round(sum(sub_scores[name] * weight for name, weight in WEIGHTS.items()))
+    return score, sub_scores, combined
+
+
+def score_compatibility(a: Chart, b: Chart) -> Dict:
+    """
+    Compatibility of chart `a` (the user) with chart `b` (the character).
+    Scores are symmetric, so they are memoized under the canonical pair; the
+    texts name `a` first and are built per call. `sub_scores` is shared;
+    treat it as read-only.
+    """
+    score, sub_scores, combined = _score_pair(*canonical_pair(a, b))
+    return {
+        "compatibility_score": score,
+        "sub_scores": sub_scores,
+        **_describe(a, b, combined, sub_scores),
+    }
+
+
+def cache_stats() -> Dict:
+    info = _score_pair.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "size": info.currsize,
+        "max_size": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_ratio": round(info.hits / lookups, 4) if lookups else 0.0,
+    }
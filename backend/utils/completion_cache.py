@@ -0,0 +1,210 @@
+"""
+Content-keyed cache of LLM completions.
+
+A completion is keyed by a hash of the model, the messages and the sampling
+parameters, so identical requests (e.g. greetings for characters with the
+same name, personality summary and BaZi) are paid for once. Lookups go
+through two tiers:
+
+- memory: a TTL + LRU cache per worker process
+- disk (when `COMPLETION_CACHE_PATH` is set): a SQLite table shared by all
+  workers on the host, surviving restarts; bounded by
+  `COMPLETION_CACHE_DISK_MAX_ROWS` (oldest entries go first) and the same TTL
+
+Concurrent misses for one key share a single upstream call. Calls above
+`COMPLETION_CACHE_MAX_TEMPERATURE`, or made with `cache=False`, bypass the
+cache. A failing disk tier is switched off rather than failing the call.
+"""
+
+from config import settings
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+from utils.ttl_cache import TTLCache
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+_PRUNE_EVERY = 256  # Disk writes between eviction passes
+
+
+def completion_key(model: str, messages: List[Dict], params: Dict) -> str:
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        sort_keys=True, ensure_ascii=False, separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _DiskTier:
+    """SQLite key/value table; all calls run in a worker thread"""
+
+    def __init__(self, path: Path, ttl: float, max_rows: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._writes = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(self.path, check_same_thread=False, timeout=5.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS completions "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS idx_completions_created ON completions(created_at)")
+            self._db = db
+        return self._db
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT value FROM completions WHERE key = ? AND created_at > ?",
+                (key, time.time() - self.ttl)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str) -> None:
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO completions (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time())
+            )
+            self._writes += 1
+            if self._writes % _PRUNE_EVERY == 0:
+                self._prune(db)
+            db.commit()
+
+    def _prune(self, db: sqlite3.Connection) -> None:
+        db.execute("DELETE FROM completions WHERE created_at <= ?", (time.time() - self.ttl,))
+        excess = db.execute("SELECT COUNT(*) FROM completions").fetchone()[0] - self.max_rows
+        if excess > 0:
+            db.execute(
+                "DELETE FROM completions WHERE key IN "
+                "(SELECT key FROM completions ORDER BY created_at LIMIT ?)",
+                (excess,)
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            db = self._connect()
+            db.execute("DELETE FROM completions")
+            db.commit()
+
+
+class CompletionCache:
+    """Two-tier (memory, SQLite) completion cache with single-flight misses"""
+
+    def __init__(
+        self,
+        enabled: bool,
+        max_size: int,
+        ttl: float,
+        disk_path: Optional[str],
+        disk_max_rows: int,
+        max_temperature: float
+    ):
+        self.enabled = enabled
+        self.max_temperature = max_temperature
+        self._memory = TTLCache(max_size=max_size, ttl=ttl)
+        self._disk: Optional[_DiskTier] = None
+        if enabled and disk_path:
+            path = Path(disk_path)
+            if not path.is_absolute():
+                path = Path(__file__).resolve().parent.parent / path
+            self._disk = _DiskTier(path, ttl, disk_max_rows)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bypassed = 0
+        self.disk_errors = 0
+
+    def cacheable(self, temperature: float) -> bool:
+        return self.enabled and temperature <= self.max_temperature
+
+    async def _disk_call(self, method: str, *args):
+        if self._disk is None:
+            return None
+        try:
+            return await asyncio.to_thread(getattr(self._disk, method), *args)
+        except Exception as e:
+            self.disk_errors += 1
+            self._disk = None
+            print(f"[COMPLETION CACHE] Disk tier disabled: {str(e)}")
+            return None
+
+    async def get_or_create(self, key: str, create: Callable[[], Awaitable[str]]) -> str:
+        """Cached completion for `key`, calling `create` (once per key at a time) on a miss"""
+        value = self._memory.get(key)
+        if value is not None:
+            self.memory_hits += 1
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            value = await asyncio.shield(inflight)
+            # None: the leading call failed, so make our own
+            return value if value is not None else await create()
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        value = None
+        try:
+            value = await self._disk_call("get", key)
+            if value is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+                value = await create()
+                if value:
+                    await self._disk_call("set", key, value)
+            if value:
+                self._memory.set(key, value)
+            return value
+        finally:
+            del self._inflight[key]
+            future.set_result(value or None)
+
+    def bypass(self) -> None:
+        self.bypassed += 1
+
+    async def clear(self) -> None:
+        self._memory.clear()
+        await self._disk_call("clear")
+
+    def stats(self) -> Dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses + self.coalesced
+        return {
+            "enabled": self.enabled,
+            "disk": self._disk is not None,
+            "memory_size": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "bypassed": self.bypassed,
+            "disk_errors": self.disk_errors,
+            "hit_ratio": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+        }
+
+
+completion_cache = CompletionCache(
+    enabled=settings.COMPLETION_CACHE_ENABLED,
+    max_size=settings.COMPLETION_CACHE_MAX_SIZE,
+    ttl=settings.COMPLETION_CACHE_TTL_SECONDS,
+    disk_path=settings.COMPLETION_CACHE_PATH,
+    disk_max_rows=settings.COMPLETION_CACHE_DISK_MAX_ROWS,
+    max_temperature=settings.COMPLETION_CACHE_MAX_TEMPERATURE
+)
@@ -0,0 +1,94 @@
+"""
+Concurrency limiting with a bounded wait queue
+"""
+
+from contextlib import asynccontextmanager
+from fastapi import HTTPException, status
+from typing import Dict
+import asyncio
+import time
+
+
+class CapacityExceeded(HTTPException):
+    """Raised when a limiter's wait queue is full or the wait timed out"""
+
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"{name} is busy, please retry shortly",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+class ConcurrencyLimiter:
+    """Caps concurrent calls to an upstream and bounds how many may wait.
+
+    Callers beyond `max_concurrency` wait for a slot; once `max_queue`
+    callers are already waiting, new ones are rejected immediately with
+    a 503 + Retry-After instead of piling up behind slow upstream calls.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float, retry_after: int):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _reject(self):
+        self.rejected += 1
+        raise CapacityExceeded(self.name, self.retry_after)
+
+    def ensure_capacity(self):
+        """Fail fast if a new caller would be rejected right now"""
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            self._reject()
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one concurrency slot for the duration of the block"""
+        self.ensure_capacity()
+
+        self.waiting += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            self._reject()
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - started
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+            self._semaphore.release()
+
+    def stats(self) -> Dict:
+        admitted = self.completed + self.in_flight
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait_ms": round(self.total_wait / admitted * 1000, 2) if admitted else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
@@ -0,0 +1,176 @@
+"""
+Token-budgeted conversation context.
+
+The prompt for a chat turn is the persona, a running summary of older turns,
+as many recent turns as fit in `CHAT_CONTEXT_TOKEN_BUDGET`, and the new user
+message. Turns that no longer fit are folded into the stored per-conversation
+summary a few at a time, oldest first, so long conversations keep a constant
+prompt size.
+"""
+
+from config import settings
+from typing import Dict, List, Optional
+from utils.ai_service import AIService
+import math
+import re
+
+# Messages carry a few tokens of framing (role, separators) on top of content
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_ASCII_RUN = re.compile(r"[\x00-\x7f]+")
+
+# Conversations with a summary update in progress (per worker)
+_folding: set = set()
+
+
+def count_tokens(text: Optional[str]) -> int:
+    """Approximate the token count of a text.
+
+    Close enough to the OpenAI tokenizer for budgeting: ASCII text averages
+    about 4 characters per token, while CJK and other non-ASCII characters
+    are roughly one token each.
+    """
+    if not text:
+        return 0
+    ascii_chars = 0
+    ascii_tokens = 0
+    for run in _ASCII_RUN.findall(text):
+        ascii_chars += len(run)
+        ascii_tokens += math.ceil(len(run) / 4)
+    return ascii_tokens + (len(text) - ascii_chars)
+
+
+def turn_tokens(turn: Dict) -> int:
+    """Tokens used by one user/assistant turn"""
+    return (
+        count_tokens(turn.get("user")) +
+        count_tokens(turn.get("assistant")) +
+        2 * MESSAGE_OVERHEAD_TOKENS
+    )
+
+
+class ConversationContext:
+    """Turns selected for the prompt, plus older turns awaiting summarization"""
+
+    def __init__(self, summary: Optional[str], recent: List[Dict], overflow: List[Dict], tokens: int, fold: List[Dict]):
+        self.summary = summary
+        self.recent = recent
+        self.overflow = overflow
+        self.tokens = tokens
+        self.fold = fold
+
+    @property
+    def needs_fold(self) -> bool:
+        return bool(self.fold)
+
+
+def build_context(
+    history: List[Dict],
+    summary: Optional[str],
+    user_message: str,
+    budget: Optional[int] = None,
+    max_turns: Optional[int] = None,
+    fold_turns: Optional[int] = None
+) -> ConversationContext:
+    """Pack the newest turns of `history` (oldest first) into the token budget.
+
+    The summary and the new message are always included and count against
+    the budget; turns are taken newest-first until the budget or `max_turns`
+    is reached. Everything older is `overflow`, which waits to be folded
+    into the summary in batches of `fold_turns`. Until then overflow turns
+    stay in the prompt while they fit, and once one doesn't fit the fold is
+    due straight away, so every turn is in either the prompt or the summary.
+    """
+    budget = settings.CHAT_CONTEXT_TOKEN_BUDGET if budget is None else budget
+    max_turns = settings.CHAT_HISTORY_MAX_TURNS if max_turns is None else max_turns
+    fold_turns = settings.CHAT_SUMMARY_FOLD_TURNS if fold_turns is None else fold_turns
+
+    used = count_tokens(user_message) + MESSAGE_OVERHEAD_TOKENS
+    if summary:
+        used += count_tokens(summary) + MESSAGE_OVERHEAD_TOKENS
+
+    cut = len(history)
+    while cut > 0 and len(history) - cut < max_turns:
+        cost = turn_tokens(history[cut - 1])
+        if used + cost > budget:
+            break
+        used += cost
+        cut -= 1
+    window = cut
+
+    # Unfolded overflow turns stay in the prompt while they fit
+    while cut > 0:
+        cost = turn_tokens(history[cut - 1])
+        if used + cost > budget:
+            break
+        used += cost
+        cut -= 1
+
+    fold = []
+    if window >= fold_turns:
+        fold = history[:window]
+    elif cut > 0:
+        # A turn is in neither the prompt nor the summary: fold now, taking
+        # a full batch so the next turns have room again
+        fold = history[:max(window, min(fold_turns, len(history) - 1))]
+
+    return ConversationContext(
+        summary=summary,
+        recent=history[cut:],
+        overflow=history[:window],
+        tokens=used,
+        fold=fold
+    )
+
+
+async def fold_into_summary(
+    supabase,
+    conversation_id: str,
+    summary: Optional[str],
+    summarized_until: Optional[str],
+    until: str
+) -> Optional[Dict]:
+    """Fold every unsummarized turn up to `until` into the running summary.
+
+    Turns are read from the database oldest first, starting right after
+    `summarized_until`, in batches of at most one history window, and the
+    summary state is stored after each batch. It never skips past a turn
+    that wasn't summarized, however far behind earlier folds fell.
+
+    Returns the new summary state, or None if another fold is already running
+    or no batch could be summarized (the turns are retried next time).
+    """
+    if conversation_id in _folding:
+        return None
+
+    batch_size = settings.CHAT_HISTORY_MAX_TURNS + settings.CHAT_SUMMARY_FOLD_TURNS
+    state = None
+    _folding.add(conversation_id)
+    try:
+        while True:
+            query = supabase.table("chat_messages").select("message, response, created_at").eq("conversation_id", conversation_id)
+            if summarized_until:
+                query = query.gt("created_at", summarized_until)
+            result = await query.lte("created_at", until).order("created_at").limit(batch_size).execute()
+            if not result.data:
+                break
+
+            turns = [
+                {"user": row["message"], "assistant": row["response"], "created_at": row["created_at"]}
+                for row in result.data
+            ]
+            new_summary = await AIService.summarize_conversation(summary, turns)
+            if not new_summary:
+                break
+
+            summary, summarized_until = new_summary, turns[-1]["created_at"]
+            state = {"summary": summary, "summarized_until": summarized_until}
+            await supabase.table("conversations").update(state).eq("id", conversation_id).execute()
+            if len(turns) < batch_size:
+                break
+        return state
+    except Exception as e:
+        print(f"[CHAT] Error updating conversation summary: {str(e)}")
+        return state
+    finally:
+        _folding.discard(conversation_id)
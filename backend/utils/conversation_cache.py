@@ -0,0 +1,92 @@
+"""
+In-process cache of the recent turns of each conversation.
+
+Keeps the conversation row and its newest unsummarized turns per
+(user_id, character_id), so a warm chat turn needs no history query. Entries
+are loaded from the database on first access, appended to after each saved
+turn, and evicted by LRU size and idle time.
+
+The cache is per worker process; a conversation served by several workers
+may see a stale tail on one of them until it goes idle and is reloaded.
+"""
+
+from collections import deque
+from config import settings
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from utils.ttl_cache import TTLCache
+
+
+def _timestamp(value: str) -> datetime:
+    """Parse created_at as stored (naive UTC) or as PostgREST returns it"""
+    parsed = datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class ConversationState:
+    """Cached conversation row and its recent turns, oldest first"""
+
+    __slots__ = ("conversation", "turns")
+
+    def __init__(self, conversation: Dict, turns: List[Dict]):
+        self.conversation = conversation
+        self.turns = deque(turns)
+
+
+class ConversationCache:
+    """Bounded LRU of conversation tails with idle expiry"""
+
+    def __init__(self, max_conversations: int, max_turns: int, idle_ttl: float):
+        self.max_turns = max_turns
+        self._cache = TTLCache(max_size=max_conversations, ttl=idle_ttl)
+
+    def get(self, user_id: str, character_id: str) -> Optional[ConversationState]:
+        key = (user_id, character_id)
+        state = self._cache.get(key)
+        if state is not None:
+            # Refresh the idle timer
+            self._cache.set(key, state)
+        return state
+
+    def put(self, user_id: str, character_id: str, conversation: Dict, turns: List[Dict]) -> ConversationState:
+        state = ConversationState(conversation, turns)
+        self._cache.set((user_id, character_id), state)
+        return state
+
+    def append_turn(self, user_id: str, character_id: str, turn: Dict) -> None:
+        """Record a saved turn; a no-op if the conversation was evicted.
+
+        Turns are only dropped once summarized. If folds fall behind and the
+        tail outgrows `max_turns`, the conversation is dropped instead and
+        reloaded from the database on its next turn.
+        """
+        key = (user_id, character_id)
+        state = self._cache.peek(key)
+        if state is None:
+            return
+        if len(state.turns) >= self.max_turns:
+            self._cache.delete(key)
+        else:
+            state.turns.append(turn)
+
+    def apply_summary(self, user_id: str, character_id: str, summary_state: Dict) -> None:
+        """Store a new summary and drop the turns it now covers"""
+        state = self._cache.peek((user_id, character_id))
+        if state is None:
+            return
+        state.conversation.update(summary_state)
+        until = _timestamp(summary_state["summarized_until"])
+        state.turns = deque(turn for turn in state.turns if _timestamp(turn["created_at"]) > until)
+
+    def invalidate(self, user_id: str, character_id: str) -> None:
+        self._cache.delete((user_id, character_id))
+
+    def stats(self) -> Dict:
+        return self._cache.stats()
+
+
+conversation_cache = ConversationCache(
+    max_conversations=settings.CHAT_CACHE_MAX_CONVERSATIONS,
+    max_turns=settings.CHAT_HISTORY_MAX_TURNS + settings.CHAT_SUMMARY_FOLD_TURNS,
+    idle_ttl=settings.CHAT_CACHE_IDLE_SECONDS
+)
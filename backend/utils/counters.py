@@ -0,0 +1,101 @@
+"""
+Write-behind counters.
+
+Increments are accumulated in memory per key and flushed periodically as one
+batched, server-side atomic increment (a Postgres function called through
+PostgREST). This takes counter writes off the response path and avoids lost
+updates from read-modify-write under concurrency.
+"""
+
+from config import settings
+from typing import Dict, Optional
+import asyncio
+import time
+
+
+class CounterBuffer:
+    """Accumulates per-key increments and flushes them in batches"""
+
+    def __init__(self, name: str, rpc_function: str, flush_interval: float):
+        self.name = name
+        self.rpc_function = rpc_function
+        self.flush_interval = flush_interval
+        self._pending: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = asyncio.Event()
+        self._supabase = None
+
+        self.flushed_total = 0
+        self.flush_count = 0
+        self.failures = 0
+        self.last_flush_ms = 0.0
+
+    def increment(self, key: str, delta: int = 1) -> None:
+        self._pending[key] = self._pending.get(key, 0) + delta
+
+    async def flush(self) -> None:
+        """Write all pending increments in one call"""
+        if not self._pending or self._supabase is None:
+            return
+
+        batch, self._pending = self._pending, {}
+        started = time.monotonic()
+        try:
+            await self._supabase.rpc(self.rpc_function, {
+                "ids": list(batch.keys()),
+                "deltas": list(batch.values())
+            }).execute()
+        except BaseException as e:
+            # Put the batch back so it's retried on the next flush
+            for key, delta in batch.items():
+                self.increment(key, delta)
+            if not isinstance(e, Exception):
+                # Cancelled mid-flush: the increments are safe, keep unwinding
+                raise
+            self.failures += 1
+            print(f"[COUNTERS] Error flushing {self.name}: {str(e)}")
+            return
+
+        self.flush_count += 1
+        self.flushed_total += sum(batch.values())
+        self.last_flush_ms = round((time.monotonic() - started) * 1000, 2)
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                await self.flush()
+
+    def start(self, supabase) -> None:
+        """Start the periodic flush loop"""
+        self._supabase = supabase
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write out whatever is left"""
+        if self._task is not None:
+            # Let a flush in progress finish rather than cancelling it
+            self._stopping.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict:
+        return {
+            "pending_keys": len(self._pending),
+            "pending_total": sum(self._pending.values()),
+            "flushed_total": self.flushed_total,
+            "flush_count": self.flush_count,
+            "failures": self.failures,
+            "last_flush_ms": self.last_flush_ms,
+        }
+
+
+interaction_counter = CounterBuffer(
+    name="characters.interaction_count",
+    rpc_function="increment_interaction_counts",
+    flush_interval=settings.COUNTER_FLUSH_INTERVAL_SECONDS
+)
@@ -0,0 +1,190 @@
+"""
+Base class for in-memory indexes over the public gallery.
+
+An index is loaded from the characters table in the background at startup,
+kept current by the routers calling `add` / `remove` on writes, and fully
+reloaded every `refresh_interval` seconds so that writes made by other
+worker processes show up. Writes made while a reload is running are
+replayed onto the new state before it replaces the old one.
+
+Indexes that tombstone removed entries can ask the refresh task to compact
+them between reloads. The compaction runs in a thread on the current state,
+which is left untouched meanwhile: writes are held back and replayed onto
+the compacted state (or the old one, if compaction fails).
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import time
+
+PUBLIC_VISIBILITY = ["public", "synced"]
+_LOAD_PAGE_SIZE = 1000
+
+
+class GalleryIndex:
+    """Background-loaded index of public characters; subclasses hold the state"""
+
+    name = "INDEX"  # Log tag
+    columns = "id"  # Columns a row needs for _index
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._state = self._new_state()
+        self._replay: Optional[List[Tuple[str, str, Optional[Dict]]]] = None
+        self._frozen = False
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.ready = False
+        self.loads = 0
+        self.last_load_ms = 0.0
+        self.compactions = 0
+        self.last_compaction_ms = 0.0
+        self.queries = 0
+        self.last_query_ms = 0.0
+
+    def _new_state(self) -> Any:
+        raise NotImplementedError
+
+    def _index(self, state: Any, character_id: str, row: Dict) -> None:
+        """Add or replace a character in `state`"""
+        raise NotImplementedError
+
+    def _unindex(self, state: Any, character_id: str) -> None:
+        raise NotImplementedError
+
+    def _needs_compaction(self, state: Any) -> bool:
+        return False
+
+    def _compacted(self, state: Any) -> Any:
+        """A compacted copy of `state`; runs in a thread and must not modify `state`"""
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return len(self._state)
+
+    def _index_rows(self, state: Any, rows: List[Dict]) -> None:
+        for row in rows:
+            self._index(state, row["id"], row)
+
+    def _apply(self, state: Any, replay: List[Tuple[str, str, Optional[Dict]]]) -> None:
+        for op, character_id, row in replay:
+            if op == "add":
+                self._index(state, character_id, row)
+            else:
+                self._unindex(state, character_id)
+
+    def _write(self, op: str, character_id: str, row: Optional[Dict]) -> None:
+        if self._replay is not None:
+            self._replay.append((op, character_id, row))
+        if self._frozen:
+            return
+        self._apply(self._state, [(op, character_id, row)])
+        if self._wake is not None and self._needs_compaction(self._state):
+            self._wake.set()
+
+    def add(self, character_id: str, row: Dict) -> None:
+        """Index (or re-index) a public character from its row"""
+        self._write("add", character_id, row)
+
+    def remove(self, character_id: str) -> None:
+        self._write("remove", character_id, None)
+
+    def _record_query(self, started: float) -> None:
+        self.queries += 1
+        self.last_query_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    async def load(self, supabase) -> None:
+        """Rebuild the index from the database, keeping changes made meanwhile"""
+        started = time.monotonic()
+        self._replay = []
+        try:
+            state = self._new_state()
+            last_id = None
+            while True:
+                query = supabase.table("characters").select(self.columns).in_("visibility_status", PUBLIC_VISIBILITY)
+                if last_id is not None:
+                    query = query.gt("id", last_id)
+                result = await query.order("id").limit(_LOAD_PAGE_SIZE).execute()
+                # The new state is private until swapped in, so index off the event loop
+                await asyncio.to_thread(self._index_rows, state, result.data)
+                if len(result.data) < _LOAD_PAGE_SIZE:
+                    break
+                last_id = result.data[-1]["id"]
+
+            self._apply(state, self._replay)
+            self._state = state
+        finally:
+            self._replay = None
+
+        self.ready = True
+        self.loads += 1
+        self.last_load_ms = round((time.monotonic() - started) * 1000, 2)
+
+    async def compact(self) -> None:
+        """Compact the state in a thread and swap it in, replaying writes made meanwhile"""
+        started = time.monotonic()
+        state = self._state
+        compacted = None
+        self._replay = []
+        self._frozen = True
+        try:
+            compacted = await asyncio.to_thread(self._compacted, state)
+        finally:
+            self._frozen = False
+            replay, self._replay = self._replay, None
+            # On failure the held-back writes still go to the old state
+            self._apply(compacted if compacted is not None else state, replay)
+        self._state = compacted
+
+        self.compactions += 1
+        self.last_compaction_ms = round((time.monotonic() - started) * 1000, 2)
+
+    async def _run(self, supabase) -> None:
+        while True:
+            try:
+                await self.load(supabase)
+            except Exception as e:
+                print(f"[{self.name}] Error loading index: {str(e)}")
+
+            # Compact on request until the next reload is due
+            deadline = time.monotonic() + self.refresh_interval
+            while True:
+                self._wake.clear()
+                if not self._needs_compaction(self._state):
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=max(0.0, deadline - time.monotonic()))
+                    except asyncio.TimeoutError:
+                        break
+                try:
+                    await self.compact()
+                except Exception as e:
+                    print(f"[{self.name}] Error compacting index: {str(e)}")
+                    break
+
+    def start(self, supabase) -> None:
+        """Load the index in the background and keep refreshing it"""
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run(supabase))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._wake = None
+
+    def stats(self) -> Dict:
+        return {
+            "ready": self.ready,
+            "size": len(self),
+            "loads": self.loads,
+            "last_load_ms": self.last_load_ms,
+            "compactions": self.compactions,
+            "last_compaction_ms": self.last_compaction_ms,
+            "queries": self.queries,
+            "last_query_ms": self.last_query_ms,
+        }
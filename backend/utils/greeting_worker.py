@@ -0,0 +1,214 @@
+"""
+Background generation of character greetings.
+
+A character created without a greeting is saved straight away with the
+placeholder from AIService.default_greeting and `greeting_status = 'pending'`,
+and queued here. A few workers generate the greetings, retrying with
+backoff, and write each one back only while its row is still pending, so a
+greeting the creator sets in the meantime wins. The row then becomes
+'ready', or 'failed' (keeping the placeholder) once retries run out.
+
+Rows left pending by a restart are re-queued by a periodic sweep of rows
+pending for longer than `GREETING_RECOVERY_AGE_SECONDS`. The sweep claims
+rows atomically (the `claim_pending_greetings` Postgres function), and each
+process refreshes the rows it still has queued, so with several worker
+processes a greeting is only generated once. The queue is bounded; rows
+submitted while it is full stay pending and are picked up by the sweep.
+Requests in this process can wait for a queued greeting instead of polling.
+"""
+
+from config import settings
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+from utils.ai_service import AIService
+from utils.character_cache import character_cache
+import asyncio
+import time
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+# Columns a queued item needs (also what claim_pending_greetings returns)
+GREETING_INPUT_COLUMNS = "id,character_name,personality_summary,bazi_string"
+
+# Rows claimed (and refreshed) per RPC call
+RECOVERY_BATCH_SIZE = 1000
+
+
+class GreetingWorker:
+    """Queue and worker pool that fills in pending greetings"""
+
+    def __init__(
+        self,
+        concurrency: int,
+        max_queue_size: int,
+        max_retries: int,
+        retry_backoff: float,
+        recovery_age: float,
+        recovery_interval: float
+    ):
+        self.concurrency = concurrency
+        self.max_queue_size = max_queue_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.recovery_age = recovery_age
+        self.recovery_interval = recovery_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._queued: Set[str] = set()
+        self._waiters: Dict[str, asyncio.Event] = {}
+        self._workers: List[asyncio.Task] = []
+        self._supabase = None
+
+        self.generated = 0
+        self.failed = 0
+        self.retries = 0
+        self.recovered = 0
+        self.deferred = 0
+        self.last_latency_ms = 0.0
+
+    def submit(self, item: Dict) -> None:
+        """Queue a pending character (a row with GREETING_INPUT_COLUMNS)"""
+        if self._queue is None or item["id"] in self._queued:
+            # Not started (or already queued): the recovery sweep picks it up
+            return
+        if self._queue.full():
+            # Stays pending; the recovery sweep picks it up once there's room
+            self.deferred += 1
+            return
+        self._queued.add(item["id"])
+        self._queue.put_nowait((time.monotonic(), item))
+
+    async def wait(self, character_id: str, timeout: float) -> bool:
+        """Wait for a greeting queued in this process; False if it isn't queued here or times out"""
+        if character_id not in self._queued:
+            return False
+        event = self._waiters.setdefault(character_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    async def _generate(self, item: Dict) -> Optional[str]:
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await AIService.generate_character_greeting(
+                    character_name=item["character_name"],
+                    personality_summary=item["personality_summary"],
+                    bazi_string=item["bazi_string"],
+                    fallback=False
+                )
+            except Exception as e:
+                if attempt == self.max_retries:
+                    print(f"[GREETING] Giving up on {item['id']} after {attempt + 1} attempts: {str(e)}")
+                    return None
+                self.retries += 1
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+
+    async def _process(self, item: Dict) -> None:
+        greeting = await self._generate(item)
+        updates = {
+            "greeting_status": READY if greeting else FAILED,
+            "updated_at": datetime.utcnow().isoformat()
+        }
+        if greeting:
+            updates["greeting_message"] = greeting
+
+        # Only while still pending: the creator may have set a greeting meanwhile
+        await self._supabase.table("characters").update(
+            updates, returning="minimal"
+        ).eq("id", item["id"]).eq("greeting_status", PENDING).execute()
+        character_cache.invalidate(item["id"])
+        if greeting:
+            self.generated += 1
+        else:
+            self.failed += 1
+
+    async def _worker(self) -> None:
+        while True:
+            enqueued_at, item = await self._queue.get()
+            try:
+                await self._process(item)
+                self.last_latency_ms = round((time.monotonic() - enqueued_at) * 1000, 2)
+            except Exception as e:
+                print(f"[GREETING] Error saving greeting for {item['id']}: {str(e)}")
+            finally:
+                self._queued.discard(item["id"])
+                event = self._waiters.pop(item["id"], None)
+                if event is not None:
+                    event.set()
+                self._queue.task_done()
+
+    async def _recover(self) -> None:
+        """Re-queue greetings that have been pending too long (e.g. lost in a restart)"""
+        while True:
+            try:
+                # Still ours: keep other processes' sweeps off these rows
+                queued = list(self._queued)
+                for start in range(0, len(queued), RECOVERY_BATCH_SIZE):
+                    await self._supabase.rpc("touch_pending_greetings", {
+                        "ids": queued[start:start + RECOVERY_BATCH_SIZE]
+                    }).execute()
+
+                # Claim only what fits in the queue; the rest waits for a later sweep
+                room = min(RECOVERY_BATCH_SIZE, self.max_queue_size - self._queue.qsize())
+                if room > 0:
+                    cutoff = (datetime.utcnow() - timedelta(seconds=self.recovery_age)).isoformat()
+                    result = await self._supabase.rpc("claim_pending_greetings", {
+                        "older_than": cutoff,
+                        "max_rows": room
+                    }).execute()
+                    for item in result.data or ():
+                        if item["id"] not in self._queued:
+                            self.recovered += 1
+                            self.submit(item)
+            except Exception as e:
+                print(f"[GREETING] Error sweeping pending greetings: {str(e)}")
+            await asyncio.sleep(self.recovery_interval)
+
+    def start(self, supabase) -> None:
+        """Start the workers and the recovery sweep"""
+        self._supabase = supabase
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._workers.append(asyncio.create_task(self._recover()))
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """Finish queued greetings (up to `timeout`), then stop; the rest stay pending for the sweep"""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            print(f"[GREETING] Shutdown with {self._queue.qsize()} greetings still queued")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        self._queued.clear()
+
+    def stats(self) -> Dict:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queued": len(self._queued),
+            "generated": self.generated,
+            "failed": self.failed,
+            "retries": self.retries,
+            "recovered": self.recovered,
+            "deferred": self.deferred,
+            "last_latency_ms": self.last_latency_ms,
+        }
+
+
+greeting_worker = GreetingWorker(
+    concurrency=settings.GREETING_WORKER_CONCURRENCY,
+    max_queue_size=settings.GREETING_QUEUE_MAX_SIZE,
+    max_retries=settings.GREETING_MAX_RETRIES,
+    retry_backoff=settings.GREETING_RETRY_BACKOFF_SECONDS,
+    recovery_age=settings.GREETING_RECOVERY_AGE_SECONDS,
+    recovery_interval=settings.GREETING_RECOVERY_INTERVAL_SECONDS
+)
@@ -0,0 +1,275 @@
+"""
+LLM backends behind one interface, selected by `LLM_PROVIDER`.
+
+- openai: the OpenAI chat completions API (production)
+- cassette: replays completions recorded in a JSONL file. In `record` mode,
+  misses go to OpenAI and are appended to the file.
+- stub: local and deterministic. The text is derived from the prompt,
+  first-token latency is drawn from a configurable distribution, and streams
+  are emitted token by token. Used for load tests and benchmarks without
+  tokens or network.
+
+AIService talks only to `llm_provider`, so every backend runs the same
+limiter, caching and fallback code.
+"""
+
+from config import settings
+from openai import AsyncOpenAI
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+from utils.completion_cache import completion_key
+import asyncio
+import hashlib
+import json
+import math
+import random
+
+
+class Completion:
+    """Text of a completion, with token usage when the backend reports it"""
+
+    def __init__(self, text: str, prompt_tokens: Optional[int] = None, completion_tokens: Optional[int] = None):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+
+class LLMProvider:
+    """Chat completion backend"""
+
+    name = "base"
+
+    async def complete(self, model: str, messages: List[Dict], max_tokens: int, temperature: float) -> Completion:
+        raise NotImplementedError
+
+    def stream(self, model: str, messages: List[Dict], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        """Async generator of text chunks; closing it stops generation upstream"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        return {"provider": self.name}
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, api_key: str, timeout: float):
+        self.client = AsyncOpenAI(api_key=api_key, timeout=timeout)
+
+    async def complete(self, model: str, messages: List[Dict], max_tokens: int, temperature: float) -> Completion:
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=temperature
+        )
+        usage = response.usage
+        return Completion(
+            response.choices[0].message.content.strip(),
+            prompt_tokens=usage.prompt_tokens if usage else None,
+            completion_tokens=usage.completion_tokens if usage else None
+        )
+
+    async def stream(self, model: str, messages: List[Dict], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        stream = None
+        try:
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=temperature,
+                stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            if stream is not None:
+                await stream.response.aclose()
+
+
+class CassetteMiss(LookupError):
+    """A replayed request that was never recorded"""
+
+
+class CassetteProvider(LLMProvider):
+    """Record/replay of completions keyed like the completion cache"""
+
+    name = "cassette"
+
+    def __init__(self, path: str, record: bool, upstream: Optional[LLMProvider]):
+        self.path = Path(path)
+        if not self.path.is_absolute():
+            self.path = Path(__file__).resolve().parent.parent / self.path
+        self.record = record
+        self.upstream = upstream
+        self._entries: Optional[Dict[str, Dict]] = None
+        self.replayed = 0
+        self.recorded = 0
+        self.missed = 0
+
+    def _load(self) -> Dict[str, Dict]:
+        if self._entries is None:
+            self._entries = {}
+            if self.path.exists():
+                with open(self.path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            self._entries[entry["key"]] = entry
+        return self._entries
+
+    def _save(self, key: str, model: str, completion: Completion) -> None:
+        entry = {
+            "key": key, "model": model, "text": completion.text,
+            "prompt_tokens": completion.prompt_tokens, "completion_tokens": completion.completion_tokens
+        }
+        self._entries[key] = entry
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self.recorded += 1
+
+    def _lookup(self, model: str, messages: List[Dict], max_tokens: int, temperature: float):
+        key = completion_key(model, messages, {"max_tokens": max_tokens, "temperature": temperature})
+        entry = self._load().get(key)
+        if entry is not None:
+            self.replayed += 1
+        elif not self.record:
+            self.missed += 1
+            raise CassetteMiss(f"No recorded completion for {key[:16]} in {self.path.name}")
+        return key, entry
+
+    async def complete(self, model: str, messages: List[Dict], max_tokens: int, temperature: float) -> Completion:
+        key, entry = self._lookup(model, messages, max_tokens, temperature)
+        if entry is None:
+            completion = await self.upstream.complete(model, messages, max_tokens, temperature)
+            self._save(key, model, completion)
+            return completion
+        return Completion(entry["text"], entry.get("prompt_tokens"), entry.get("completion_tokens"))
+
+    async def stream(self, model: str, messages: List[Dict], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        key, entry = self._lookup(model, messages, max_tokens, temperature)
+        if entry is not None:
+            for token in _split_tokens(entry["text"]):
+                yield token
+            return
+
+        chunks = []
+        async for chunk in self.upstream.stream(model, messages, max_tokens, temperature):
+            chunks.append(chunk)
+            yield chunk
+        # Only whole responses are recorded
+        self._save(key, model, Completion("".join(chunks).strip()))
+
+    def stats(self) -> Dict:
+        return {
+            "provider": self.name,
+            "mode": "record" if self.record else "replay",
+            "entries": len(self._entries or ()),
+            "replayed": self.replayed,
+            "recorded": self.recorded,
+            "missed": self.missed,
+        }
+
+
+_STUB_PHRASES = (
+    "嗯，", "我明白你的意思。", "说起来，", "今天的风有点凉，", "你知道吗？",
+    "我一直在想这件事。", "也许", "我们可以慢慢聊。", "哈哈，", "这让我想起从前，",
+    "真的很有意思。", "别担心，", "我会陪着你。", "你呢？", "其实",
+    "每个人都有自己的节奏。",
+)
+
+_STUB_DISTRIBUTIONS = ("constant", "uniform", "exponential", "lognormal")
+
+
+def _split_tokens(text: str) -> List[str]:
+    """Roughly token-sized chunks (two CJK characters) for replayed streams"""
+    return [text[i:i + 2] for i in range(0, len(text), 2)]
+
+
+class StubProvider(LLMProvider):
+    """Deterministic local completions with simulated latency"""
+
+    name = "stub"
+
+    def __init__(self, distribution: str, latency_ms: float, spread: float, token_delay_ms: float, seed: int):
+        if distribution not in _STUB_DISTRIBUTIONS:
+            raise ValueError(f"LLM_STUB_LATENCY_DISTRIBUTION must be one of {', '.join(_STUB_DISTRIBUTIONS)}")
+        self.distribution = distribution
+        self.latency = latency_ms / 1000
+        self.spread = spread
+        self.token_delay = token_delay_ms / 1000
+        self._rng = random.Random(seed)
+        self.calls = 0
+
+    def _first_token_delay(self) -> float:
+        if self.distribution == "uniform":
+            return max(0.0, self.latency * (1 + self._rng.uniform(-self.spread, self.spread)))
+        if self.distribution == "exponential":
+            return self._rng.expovariate(1 / self.latency) if self.latency > 0 else 0.0
+        if self.distribution == "lognormal":
+            # `latency` is the median, `spread` the sigma of the underlying normal
+            return self.latency * math.exp(self._rng.gauss(0, self.spread))
+        return self.latency
+
+    @staticmethod
+    def _tokens(messages: List[Dict], max_tokens: int) -> List[str]:
+        """The same prompt always yields the same tokens"""
+        digest = hashlib.sha256(
+            json.dumps(messages, sort_keys=True, ensure_ascii=False).encode()
+        ).digest()
+        rng = random.Random(digest)
+        tokens = []
+        for _ in range(min(max_tokens, 8 + digest[0] % 24)):
+            tokens.extend(_split_tokens(rng.choice(_STUB_PHRASES)))
+        return tokens[:max_tokens]
+
+    async def complete(self, model: str, messages: List[Dict], max_tokens: int, temperature: float) -> Completion:
+        self.calls += 1
+        tokens = self._tokens(messages, max_tokens)
+        await asyncio.sleep(self._first_token_delay() + self.token_delay * len(tokens))
+        return Completion("".join(tokens).strip(), completion_tokens=len(tokens))
+
+    async def stream(self, model: str, messages: List[Dict], max_tokens: int, temperature: float) -> AsyncIterator[str]:
+        self.calls += 1
+        await asyncio.sleep(self._first_token_delay())
+        for i, token in enumerate(self._tokens(messages, max_tokens)):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            yield token
+
+    def stats(self) -> Dict:
+        return {
+            "provider": self.name,
+            "distribution": self.distribution,
+            "calls": self.calls,
+        }
+
+
+def build_provider() -> LLMProvider:
+    """The backend named by `LLM_PROVIDER`"""
+    if settings.LLM_PROVIDER == "stub":
+        return StubProvider(
+            distribution=settings.LLM_STUB_LATENCY_DISTRIBUTION,
+            latency_ms=settings.LLM_STUB_LATENCY_MS,
+            spread=settings.LLM_STUB_LATENCY_SPREAD,
+            token_delay_ms=settings.LLM_STUB_TOKEN_DELAY_MS,
+            seed=settings.LLM_STUB_SEED
+        )
+
+    openai = OpenAIProvider(api_key=settings.OPENAI_API_KEY, timeout=settings.OPENAI_TIMEOUT_SECONDS)
+    if settings.LLM_PROVIDER == "cassette":
+        if settings.LLM_CASSETTE_MODE not in ("record", "replay"):
+            raise ValueError("LLM_CASSETTE_MODE must be 'record' or 'replay'")
+        return CassetteProvider(
+            path=settings.LLM_CASSETTE_PATH,
+            record=settings.LLM_CASSETTE_MODE == "record",
+            upstream=openai
+        )
+    if settings.LLM_PROVIDER != "openai":
+        raise ValueError("LLM_PROVIDER must be 'openai', 'cassette' or 'stub'")
+    return openai
+
+
+llm_provider = build_provider()
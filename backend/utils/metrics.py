@@ -0,0 +1,234 @@
+"""
+Prometheus metrics, rendered in the text exposition format on `/metrics`.
+
+- HTTP: request counts by route template and status, latency histograms,
+  and in-flight requests (recorded by MetricsMiddleware)
+- Supabase: a latency histogram and an error count per table and operation
+  (database.py)
+- Chat write-behind: queue depth and the age of the oldest queued turn
+  (utils/persistence_queue.py)
+- LLM: a latency histogram and an error count per provider and purpose, plus
+  prompt/completion token counters (utils/ai_service.py)
+
+Metrics are updated from the event loop only, so there are no locks. An
+update is a dict lookup and a few integer adds. In-flight requests are
+grouped by route when scraped rather than on every request, because the
+route template is only known once the request has been routed.
+"""
+
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+import time
+
+# Seconds; covers cached responses through LLM generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        _registry.append(self)
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def _samples(self) -> Iterable[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class GaugeFunction(_Metric):
+    """Gauge whose values are computed at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...], collect: Callable[[], Dict[Tuple, float]]):
+        super().__init__(name, help, labels)
+        self.collect = collect
+
+    def _samples(self) -> Iterable[str]:
+        for key, value in self.collect().items():
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def _samples(self) -> Iterable[str]:
+        for key, (counts, total) in self._series.items():
+            base = _format_labels(self.labels, key)[:-1] + "," if self.labels else "{"
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{base}le="{_format_value(bound)}"}} {cumulative}'
+            labels = _format_labels(self.labels, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+def render() -> str:
+    """All metrics in the Prometheus text format"""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# HTTP
+
+# id(scope) -> scope of requests being handled
+_in_flight: Dict[int, dict] = {}
+
+
+def _route_of(scope: dict) -> str:
+    """Full path template of the matched route, e.g. /api/character/{character_id}"""
+    template = getattr(scope.get("route"), "path", None)
+    if not template:
+        # Unmatched paths share one label so that 404s can't blow up cardinality
+        return "unmatched"
+    # Routes of included routers may only know their path below the prefix;
+    # the prefix is whatever comes before as many segments of the real path
+    return scope["path"].rsplit("/", template.count("/"))[0] + template
+
+
+def _collect_in_flight() -> Dict[Tuple, float]:
+    counts: Dict[Tuple, float] = {}
+    for scope in list(_in_flight.values()):
+        key = (scope["method"], _route_of(scope))
+        counts[key] = counts.get(key, 0) + 1
+    return counts
+
+
+http_requests = Counter(
+    "http_requests_total", "HTTP requests handled", ("method", "route", "status")
+)
+http_request_seconds = Histogram(
+    "http_request_duration_seconds", "Time to handle an HTTP request, including streamed bodies", ("method", "route")
+)
+http_in_flight = GaugeFunction(
+    "http_requests_in_flight", "HTTP requests being handled", ("method", "route"), _collect_in_flight
+)
+
+# Supabase (PostgREST)
+
+supabase_query_seconds = Histogram(
+    "supabase_query_duration_seconds", "PostgREST request latency", ("table", "operation")
+)
+supabase_query_errors = Counter(
+    "supabase_query_errors_total", "PostgREST requests that failed", ("table", "operation")
+)
+
+# Write-behind chat persistence (utils/persistence_queue.py)
+
+
+def _chat_write_queue_depth() -> Dict[Tuple, float]:
+    from utils.persistence_queue import chat_turn_writer
+    return {(): chat_turn_writer.queue_depth()}
+
+
+def _chat_write_lag() -> Dict[Tuple, float]:
+    from utils.persistence_queue import chat_turn_writer
+    return {(): chat_turn_writer.lag_seconds()}
+
+
+chat_write_queue_depth = GaugeFunction(
+    "chat_write_queue_depth", "Chat turns waiting to be written (CHAT_WRITE_BEHIND)", (), _chat_write_queue_depth
+)
+chat_write_lag_seconds = GaugeFunction(
+    "chat_write_lag_seconds", "Age of the oldest chat turn waiting to be written", (), _chat_write_lag
+)
+
+# LLM
+
+llm_request_seconds = Histogram(
+    "llm_request_duration_seconds", "LLM completion latency (whole stream for streamed calls)", ("provider", "purpose")
+)
+llm_request_errors = Counter(
+    "llm_request_errors_total", "LLM completions that failed", ("provider", "purpose")
+)
+llm_tokens = Counter(
+    "llm_tokens_total", "LLM tokens used (estimated when the provider doesn't report usage)",
+    ("provider", "purpose", "type")
+)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route HTTP metrics"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        key = id(scope)
+        _in_flight[key] = scope
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            del _in_flight[key]
+            route = _route_of(scope)
+            http_requests.inc(scope["method"], route, status)
+            http_request_seconds.observe(elapsed, scope["method"], route)
@@ -0,0 +1,54 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Lists are ordered by `(created_at DESC, id DESC)`. A cursor is an opaque,
+URL-safe token holding the sort key of the last row of a page; the next page
+is the rows strictly after it, so its cost doesn't depend on how deep the
+client has scrolled and concurrent inserts don't shift pages.
+
+List totals are cached per filter for `LIST_TOTAL_CACHE_TTL_SECONDS`, so a
+full count runs at most once per TTL instead of on every page.
+"""
+
+from config import settings
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from utils.ttl_cache import TTLCache
+import base64
+import json
+import uuid
+
+total_cache = TTLCache(
+    max_size=settings.LIST_TOTAL_CACHE_MAX_SIZE,
+    ttl=settings.LIST_TOTAL_CACHE_TTL_SECONDS
+)
+
+
+def encode_cursor(row: Dict) -> str:
+    """Cursor pointing just past `row`"""
+    payload = json.dumps([row["created_at"], row["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Return (created_at, id) from a cursor; raises ValueError if it's malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        # Both values end up in a filter expression, so only accept well-formed ones
+        datetime.fromisoformat(created_at)
+        uuid.UUID(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    return created_at, row_id
+
+
+def after_cursor(query, cursor: Optional[str]):
+    """Apply the keyset order (and the position filter, if `cursor` is set) to `query`"""
+    query = query.order("created_at", desc=True).order("id", desc=True)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.or_(
+            f"created_at.lt.{created_at},and(created_at.eq.{created_at},id.lt.{row_id})"
+        )
+    return query
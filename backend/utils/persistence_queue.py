@@ -0,0 +1,150 @@
+"""
+Write-behind persistence for chat turns.
+
+When `CHAT_WRITE_BEHIND` is on, a chat turn is returned as soon as the AI
+reply exists and its writes (the chat_messages row and the conversation's
+updated_at) go through a bounded queue instead. Turns are sharded by
+conversation id and each shard is written by a single worker, so turns of
+one conversation are persisted in order. Workers write in batches, retry
+with backoff, and are drained on shutdown.
+"""
+
+from collections import deque
+from config import settings
+from typing import Dict, List, Optional
+import asyncio
+import time
+import zlib
+
+
+class ChatTurnWriter:
+    """Sharded, bounded write-behind queue for chat turns"""
+
+    def __init__(self, shards: int, max_queue: int, batch_size: int, max_retries: int, retry_backoff: float):
+        self.shards = shards
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queues: List[asyncio.Queue] = []
+        self._enqueued_at: List[deque] = []
+        self._workers: List[asyncio.Task] = []
+        self._supabase = None
+
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.failed = 0
+        self.last_lag_ms = 0.0
+
+    def _shard(self, conversation_id: str) -> int:
+        return zlib.crc32(conversation_id.encode()) % self.shards
+
+    async def submit(self, message_record: Dict) -> None:
+        """Queue a chat_messages row; waits if the shard's queue is full"""
+        shard = self._shard(message_record["conversation_id"])
+        enqueued_at = time.monotonic()
+        await self._queues[shard].put(message_record)
+        # Only once queued (a request cancelled while waiting leaves nothing
+        # behind); nothing can run between put() returning and the append
+        self._enqueued_at[shard].append(enqueued_at)
+
+    async def _write_batch(self, batch: List[Dict]) -> None:
+        # Upsert on id so a retried batch can't create duplicates
+        await self._supabase.table("chat_messages").upsert(batch, on_conflict="id", returning="minimal").execute()
+
+        last_message_at: Dict[str, str] = {}
+        for record in batch:
+            last_message_at[record["conversation_id"]] = record["created_at"]
+        for conversation_id, updated_at in last_message_at.items():
+            await self._supabase.table("conversations").update(
+                {"updated_at": updated_at}, returning="minimal"
+            ).eq("id", conversation_id).execute()
+
+    async def _worker(self, shard: int) -> None:
+        queue = self._queues[shard]
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            enqueued_at = self._enqueued_at[shard]
+            oldest = enqueued_at[0] if enqueued_at else time.monotonic()
+            for _ in batch:
+                if enqueued_at:
+                    enqueued_at.popleft()
+
+            try:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        await self._write_batch(batch)
+                        self.written += len(batch)
+                        self.batches += 1
+                        break
+                    except Exception as e:
+                        if attempt == self.max_retries:
+                            self.failed += len(batch)
+                            print(f"[CHAT] Dropping {len(batch)} chat turns after {attempt + 1} attempts: {str(e)}")
+                        else:
+                            self.retries += 1
+                            await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+                self.last_lag_ms = round((time.monotonic() - oldest) * 1000, 2)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    def start(self, supabase) -> None:
+        """Start one worker per shard"""
+        self._supabase = supabase
+        if self._workers:
+            return
+        per_shard = max(1, self.max_queue // self.shards)
+        self._queues = [asyncio.Queue(maxsize=per_shard) for _ in range(self.shards)]
+        self._enqueued_at = [deque() for _ in range(self.shards)]
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.shards)]
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """Wait for queued turns to be written, then stop the workers"""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues)),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            print(f"[CHAT] Shutdown with {self.queue_depth()} chat turns still queued")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def queue_depth(self) -> int:
+        return sum(queue.qsize() for queue in self._queues)
+
+    def lag_seconds(self) -> float:
+        """Age of the oldest turn still waiting to be written"""
+        now = time.monotonic()
+        oldest = [now - times[0] for times in self._enqueued_at if times]
+        return max(oldest) if oldest else 0.0
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": bool(self._workers),
+            "queue_depth": self.queue_depth(),
+            "lag_ms": round(self.lag_seconds() * 1000, 2),
+            "last_batch_lag_ms": self.last_lag_ms,
+            "written": self.written,
+            "batches": self.batches,
+            "retries": self.retries,
+            "failed": self.failed,
+        }
+
+
+chat_turn_writer = ChatTurnWriter(
+    shards=settings.CHAT_WRITE_QUEUE_SHARDS,
+    max_queue=settings.CHAT_WRITE_QUEUE_MAX,
+    batch_size=settings.CHAT_WRITE_BATCH_SIZE,
+    max_retries=settings.CHAT_WRITE_MAX_RETRIES,
+    retry_backoff=settings.CHAT_WRITE_RETRY_BACKOFF_SECONDS
+)
@@ -0,0 +1,90 @@
+"""
+Precompiled character personas for chat.
+
+The persona system prompt (name, personality, pillars, day master, primary
+element) is built once per character and reused byte-for-byte on every turn,
+so each chat request starts with the same prefix and providers that cache
+prompt prefixes can reuse it. A compiled pack carries a content hash of its
+prompt.
+
+Packs are cached by character id and checked against the row they were built
+from, so a changed character gets a new pack on its next turn even in
+workers that missed the invalidation.
+"""
+
+from config import settings
+from typing import Dict, Tuple
+from utils.ttl_cache import TTLCache
+import hashlib
+
+
+class PersonaPack:
+    """A character's compiled system prompt; shared between requests, so read-only"""
+
+    def __init__(self, character_id: str, source: Tuple, system_prompt: str):
+        self.character_id = character_id
+        self.source = source
+        self.system_prompt = system_prompt
+        self.content_hash = hashlib.sha256(system_prompt.encode()).hexdigest()[:16]
+        self.message = {"role": "system", "content": system_prompt}
+
+
+def _persona_source(character: Dict) -> Tuple:
+    """The fields a persona is built from"""
+    bazi_data = character.get("bazi_data") or {}
+    return (
+        character["character_name"],
+        character.get("personality_summary") or "",
+        bazi_data.get("bazi_string", ""),
+        bazi_data.get("day_master", ""),
+        bazi_data.get("primary_element", ""),
+    )
+
+
+def compile_persona(character: Dict) -> PersonaPack:
+    """Build the persona pack for a character row"""
+    source = _persona_source(character)
+    name, personality, bazi_string, day_master, primary_element = source
+    system_prompt = f"""你是{name}。你的性格特征：{personality}
+
+你的命理特征：
+- 八字：{bazi_string}
+- 日主：{day_master}
+- 主要元素：{primary_element}
+
+请以这个角色的身份回复用户。保持性格一致，回复自然流畅（中文），不要过于生硬或说教。"""
+    return PersonaPack(character["id"], source, system_prompt)
+
+
+class PersonaCache:
+    """LRU of compiled personas keyed by character id"""
+
+    def __init__(self, max_size: int):
+        self._cache = TTLCache(max_size=max_size, ttl=float("inf"))
+        self.compiled = 0
+        self.stale = 0
+
+    def get(self, character: Dict) -> PersonaPack:
+        """The compiled persona for a character row, recompiling if the row changed"""
+        pack = self._cache.get(character["id"])
+        if pack is not None:
+            if pack.source == _persona_source(character):
+                return pack
+            self.stale += 1
+        pack = compile_persona(character)
+        self._cache.set(character["id"], pack)
+        self.compiled += 1
+        return pack
+
+    def invalidate(self, character_id: str) -> None:
+        self._cache.delete(character_id)
+
+    def stats(self) -> Dict:
+        return {
+            **self._cache.stats(),
+            "compiled": self.compiled,
+            "stale": self.stale,
+        }
+
+
+persona_cache = PersonaCache(max_size=settings.PERSONA_CACHE_MAX_SIZE)
@@ -0,0 +1,180 @@
+"""
+In-memory index of public characters for "characters that match you".
+
+Each public character is encoded once, when it's created or loaded, into a
+compact feature vector of three small ids (8 bytes). The vectors live in
+numpy arrays that grow by doubling, so adds and removes are O(1) (removal
+swaps the last row into the gap). A top-k query scores each distinct stem
+combination, branch combination and element profile once, then gathers the
+scores per row, exactly matching utils.compatibility.score_compatibility.
+
+Each worker process keeps its own index (see utils.gallery_index), reloaded
+every `RECOMMENDATION_REFRESH_SECONDS` to pick up other workers' changes.
+"""
+
+from config import settings
+from typing import Dict, List, Tuple
+from utils.compatibility import (
+    Chart, PILLARS, DAY, WEIGHTS, STEM_RANGE, BRANCH_RANGE,
+    STEM_PAIR_SCORES, BRANCH_PAIR_SCORES, DAY_MASTER_SCORES,
+    chart_from_row, element_profile
+)
+from utils.gallery_index import GalleryIndex
+import numpy as np
+import time
+
+_STEM_TABLE = np.array(STEM_PAIR_SCORES, dtype=np.int64)
+_BRANCH_TABLE = np.array(BRANCH_PAIR_SCORES, dtype=np.int64)
+_DAY_MASTER_TABLE = np.array(DAY_MASTER_SCORES, dtype=np.int64)
+
+# Every combination of four stems / four branches, indexed like the feature ids
+_STEM_COMBOS = np.indices((10,) * 4).reshape(4, -1).T
+_BRANCH_COMBOS = np.indices((12,) * 4).reshape(4, -1).T
+
+SUB_SCORES = tuple(WEIGHTS)
+_ROW_COLUMNS = ",".join(
+    ["id"] + [f"{pillar}_stem" for pillar in PILLARS] + [f"{pillar}_branch" for pillar in PILLARS]
+)
+
+
+def _scale(raw: np.ndarray, bounds: Tuple[int, int]) -> np.ndarray:
+    low, high = bounds
+    return np.round(np.clip((raw - low) * 100 / (high - low), 0.0, 100.0)).astype(np.int64)
+
+
+class _Vectors:
+    """
+    Feature vectors with an id <-> row mapping.
+    
+    A character's vector is three ids: its stem combination, its branch
+    combination and its element profile (an index into `profiles`, which
+    holds each distinct profile once). Every sub-score depends on only one
+    of them, so a query scores each distinct value once and gathers per row.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.stem_ids = np.zeros(capacity, dtype=np.uint16)
+        self.branch_ids = np.zeros(capacity, dtype=np.uint16)
+        self.profile_ids = np.zeros(capacity, dtype=np.uint32)
+        self.profiles = np.zeros((256, 5), dtype=np.float64)
+        self._profile_index: Dict[Tuple[float, ...], int] = {}
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _profile_id(self, chart: Chart) -> int:
+        profile = element_profile(chart)
+        key = tuple(profile)
+        profile_id = self._profile_index.get(key)
+        if profile_id is None:
+            profile_id = self._profile_index[key] = len(self._profile_index)
+            if profile_id == len(self.profiles):
+                self.profiles = np.concatenate([self.profiles, np.zeros_like(self.profiles)])
+            self.profiles[profile_id] = profile
+        return profile_id
+
+    def add(self, character_id: str, chart: Chart) -> None:
+        row = self.rows.get(character_id)
+        if row is None:
+            row = len(self.ids)
+            if row == len(self.stem_ids):
+                for name in ("stem_ids", "branch_ids", "profile_ids"):
+                    column = getattr(self, name)
+                    setattr(self, name, np.concatenate([column, np.zeros_like(column)]))
+            self.ids.append(character_id)
+            self.rows[character_id] = row
+        self.stem_ids[row] = ((chart[0] * 10 + chart[1]) * 10 + chart[2]) * 10 + chart[3]
+        self.branch_ids[row] = ((chart[4] * 12 + chart[5]) * 12 + chart[6]) * 12 + chart[7]
+        self.profile_ids[row] = self._profile_id(chart)
+
+    def remove(self, character_id: str) -> None:
+        row = self.rows.pop(character_id, None)
+        if row is None:
+            return
+        last = len(self.ids) - 1
+        if row != last:
+            moved = self.ids[last]
+            for column in (self.stem_ids, self.branch_ids, self.profile_ids):
+                column[row] = column[last]
+            self.ids[row] = moved
+            self.rows[moved] = row
+        self.ids.pop()
+
+    def score(self, chart: Chart) -> Dict[str, np.ndarray]:
+        """score_compatibility of `chart` against every row, as arrays"""
+        count = len(self.ids)
+        stems, branches = np.asarray(chart[:4]), np.asarray(chart[4:])
+
+        # Per stem / branch combination: sum over the chart's own stems first,
+        # then one gather per pillar
+        stem_raw = _STEM_TABLE[stems].sum(axis=0)[_STEM_COMBOS].sum(axis=1)
+        branch_raw = _BRANCH_TABLE[branches].sum(axis=0)[_BRANCH_COMBOS].sum(axis=1)
+        # Day branches (spouse palace) count double
+        branch_raw += _BRANCH_TABLE[chart[4 + DAY]][_BRANCH_COMBOS[:, DAY]]
+
+        # Per distinct profile, summed in the same order as balance_score
+        combined = self.profiles[:len(self._profile_index)] + np.asarray(element_profile(chart))
+        total = combined[:, 0] + combined[:, 1] + combined[:, 2] + combined[:, 3] + combined[:, 4]
+        deviation = np.abs(combined[:, 0] / total - 0.2)
+        for element in range(1, 5):
+            deviation = deviation + np.abs(combined[:, element] / total - 0.2)
+
+        stem_ids = self.stem_ids[:count]
+        sub_scores = {
+            "elements": np.round(100 * (1 - deviation / 1.6)).astype(np.int64)[self.profile_ids[:count]],
+            "day_master": _DAY_MASTER_TABLE[chart[DAY]][_STEM_COMBOS[:, DAY]][stem_ids],
+            "stems": _scale(stem_raw, STEM_RANGE)[stem_ids],
+            "branches": _scale(branch_raw, BRANCH_RANGE)[self.branch_ids[:count]],
+        }
+        score = 0
+        for name in SUB_SCORES:
+            score = score + sub_scores[name] * WEIGHTS[name]
+        return {"compatibility_score": np.round(score).astype(np.int64), **sub_scores}
+
+
+class RecommendationIndex(GalleryIndex):
+    """Feature vectors of public characters with vectorized top-k scoring"""
+
+    name = "RECOMMEND"
+    columns = _ROW_COLUMNS
+
+    def _new_state(self) -> _Vectors:
+        return _Vectors()
+
+    def _index(self, state: _Vectors, character_id: str, row: Dict) -> None:
+        state.add(character_id, chart_from_row(row))
+
+    def _unindex(self, state: _Vectors, character_id: str) -> None:
+        state.remove(character_id)
+
+    def top_k(self, chart: Chart, k: int) -> List[Dict]:
+        """The k best-matching characters for `chart`, best first"""
+        started = time.perf_counter()
+        vectors = self._state
+        count = len(vectors)
+        if count == 0:
+            return []
+
+        scores = vectors.score(chart)
+        overall = scores["compatibility_score"]
+        k = min(k, count)
+        best = np.argpartition(-overall, k - 1)[:k]
+        best = best[np.argsort(-overall[best], kind="stable")]
+
+        results = []
+        for row in best.tolist():
+            results.append({
+                "character_id": vectors.ids[row],
+                "compatibility_score": int(overall[row]),
+                "sub_scores": {name: int(scores[name][row]) for name in SUB_SCORES},
+            })
+
+        self._record_query(started)
+        return results
+
+
+recommendation_index = RecommendationIndex(
+    refresh_interval=settings.RECOMMENDATION_REFRESH_SECONDS
+)
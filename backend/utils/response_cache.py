@@ -0,0 +1,80 @@
+"""
+Cache of serialized responses for public, user-independent endpoints.
+
+Entries hold the response body and a strong ETag (a hash of the body), so a
+hit costs no query and no model building, and a conditional request whose
+`If-None-Match` matches is answered with 304 straight from the cache.
+Writers call `clear()` when the underlying data changes; the TTL bounds
+staleness across worker processes, which each keep their own cache.
+"""
+
+from config import settings
+from fastapi import Response
+from typing import Dict, Hashable, Optional
+from utils.ttl_cache import TTLCache
+import hashlib
+
+
+class CachedResponse:
+    """Serialized response body and its ETag"""
+
+    __slots__ = ("body", "etag")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 specifies for it)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResponseCache:
+    """TTL + LRU cache of JSON responses with ETag / 304 support"""
+
+    def __init__(self, max_size: int, ttl: float, max_age: int):
+        self.max_age = max_age
+        self._cache = TTLCache(max_size=max_size, ttl=ttl)
+        self.not_modified = 0
+
+    def get(self, key: Hashable) -> Optional[CachedResponse]:
+        return self._cache.get(key)
+
+    def store(self, key: Hashable, body: bytes) -> CachedResponse:
+        entry = CachedResponse(body)
+        self._cache.set(key, entry)
+        return entry
+
+    def respond(self, entry: CachedResponse, if_none_match: Optional[str]) -> Response:
+        """200 with the cached body, or 304 if the client already has it"""
+        headers = {
+            "ETag": entry.etag,
+            "Cache-Control": f"public, max-age={self.max_age}"
+        }
+        if etag_matches(if_none_match, entry.etag):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict:
+        return {
+            **self._cache.stats(),
+            "not_modified": self.not_modified,
+        }
+
+
+public_list_cache = ResponseCache(
+    max_size=settings.PUBLIC_LIST_CACHE_MAX_SIZE,
+    ttl=settings.PUBLIC_LIST_CACHE_TTL_SECONDS,
+    max_age=settings.PUBLIC_LIST_MAX_AGE_SECONDS
+)
@@ -0,0 +1,288 @@
+"""
+In-memory inverted index for gallery search.
+
+Indexes `character_name`, `tags`, `personality_traits` and `description` of
+public characters. Text is NFKC-normalized and lowercased. Runs of CJK
+characters become overlapping bigrams, with unigrams added for the short
+fields so one-character queries still match names and tags; other text
+splits into words. Each term's postings are two typed arrays (document
+numbers and field-weighted term frequencies), scored with BM25 in NumPy.
+Queries without text (tag / filter browsing) list matches by `created_at`,
+newest first, whatever order documents were indexed in.
+
+Removed or edited characters are tombstoned. Once tombstones reach a quarter
+of the index, the refresh task compacts the postings in a thread (see
+utils.gallery_index), so requests never wait on it. Like the recommendation index,
+each worker keeps its own copy and reloads it every
+`SEARCH_INDEX_REFRESH_SECONDS` (see utils.gallery_index).
+"""
+
+from array import array
+from collections import Counter
+from config import settings
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from utils.gallery_index import GalleryIndex
+import math
+import numpy as np
+import re
+import time
+import unicodedata
+
+FIELD_WEIGHTS = {"character_name": 3, "tags": 2, "personality_traits": 2, "description": 1}
+_SHORT_FIELDS = {"character_name", "tags", "personality_traits"}
+FILTERS = ("primary_element", "creation_mode", "gender")
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Kana, CJK ideographs (with extension A and compatibility), Hangul
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_CJK_RUN = re.compile(f"[{_CJK}]+")
+_TOKEN_RE = re.compile(f"[{_CJK}]+|[^\\W_{_CJK}]+")
+
+# Exact-tag postings; never produced by tokenize, so they only act as filters
+_TAG_PREFIX = "\x00tag:"
+_COMPACT_MIN_DEAD = 1000
+
+
+def normalize(text: str) -> str:
+    return unicodedata.normalize("NFKC", text).lower()
+
+
+def _created(value: Optional[str]) -> float:
+    """created_at as a POSIX timestamp; naive values are UTC"""
+    if not value:
+        return time.time()
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def tokenize(text: str, unigrams: bool = False) -> List[str]:
+    """Terms of a text: CJK bigrams (plus unigrams if asked) and words"""
+    tokens = []
+    for run in _TOKEN_RE.findall(normalize(text)):
+        if not _CJK_RUN.match(run):
+            tokens.append(run)
+            continue
+        if unigrams or len(run) == 1:
+            tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class _Postings:
+    __slots__ = ("docs", "freqs")
+
+    def __init__(self):
+        self.docs = array("I")
+        self.freqs = array("H")
+
+
+class _SearchState:
+    """Postings plus per-document lengths, creation times, liveness and filter codes"""
+
+    def __init__(self):
+        self.terms: Dict[str, _Postings] = {}
+        self.ids: List[Optional[str]] = []  # By document number; None once removed
+        self.docnos: Dict[str, int] = {}
+        self.alive = bytearray()
+        self.lengths = array("I")
+        self.created = array("d")
+        self.filters = {name: array("B") for name in FILTERS}
+        self.codes: Dict[str, Dict[Optional[str], int]] = {name: {} for name in FILTERS}
+        self.live_length = 0
+        self.dead = 0
+
+    def __len__(self) -> int:
+        return len(self.docnos)
+
+    def add(self, character_id: str, row: Dict) -> None:
+        self.remove(character_id)
+        docno = len(self.ids)
+
+        counts = Counter()
+        for field, weight in FIELD_WEIGHTS.items():
+            value = row.get(field) or []
+            for text in [value] if isinstance(value, str) else value:
+                for token in tokenize(text, unigrams=field in _SHORT_FIELDS):
+                    counts[token] += weight
+        length = sum(counts.values())
+        for tag in row.get("tags") or []:
+            counts[_TAG_PREFIX + normalize(tag)] += 1
+
+        for token, freq in counts.items():
+            postings = self.terms.get(token)
+            if postings is None:
+                postings = self.terms[token] = _Postings()
+            postings.docs.append(docno)
+            postings.freqs.append(min(freq, 65535))
+
+        for name in FILTERS:
+            codes = self.codes[name]
+            code = codes.setdefault(row.get(name), len(codes))
+            self.filters[name].append(code)
+        self.ids.append(character_id)
+        self.docnos[character_id] = docno
+        self.alive.append(1)
+        self.lengths.append(length)
+        self.created.append(_created(row.get("created_at")))
+        self.live_length += length
+
+    def remove(self, character_id: str) -> None:
+        docno = self.docnos.pop(character_id, None)
+        if docno is None:
+            return
+        self.ids[docno] = None
+        self.alive[docno] = 0
+        self.live_length -= self.lengths[docno]
+        self.dead += 1
+
+    def needs_compaction(self) -> bool:
+        return self.dead >= max(_COMPACT_MIN_DEAD, len(self.ids) // 4)
+
+    def compacted(self) -> "_SearchState":
+        """A copy without tombstoned documents, renumbered; leaves this state as it is"""
+        alive = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+        renumber = np.cumsum(alive, dtype=np.int64) - 1
+
+        state = _SearchState()
+        terms = state.terms
+        for token, postings in self.terms.items():
+            docs = np.frombuffer(postings.docs, dtype=np.uint32)
+            keep = alive[docs]
+            if not keep.any():
+                continue
+            compacted = _Postings()
+            compacted.docs = array("I", renumber[docs[keep]].astype(np.uint32).tobytes())
+            compacted.freqs = array("H", np.frombuffer(postings.freqs, dtype=np.uint16)[keep].tobytes())
+            terms[token] = compacted
+
+        state.lengths = array("I", np.frombuffer(self.lengths, dtype=np.uint32)[alive].tobytes())
+        state.created = array("d", np.frombuffer(self.created, dtype=np.float64)[alive].tobytes())
+        for name in FILTERS:
+            state.filters[name] = array("B", np.frombuffer(self.filters[name], dtype=np.uint8)[alive].tobytes())
+            state.codes[name] = dict(self.codes[name])
+        state.ids = [character_id for character_id in self.ids if character_id is not None]
+        state.docnos = {character_id: docno for docno, character_id in enumerate(state.ids)}
+        state.alive = bytearray(b"\x01" * len(state.ids))
+        state.live_length = self.live_length
+        return state
+
+    def search(
+        self,
+        query: str,
+        filters: Dict[str, str],
+        tag: Optional[str],
+        offset: int,
+        limit: int
+    ) -> Tuple[List[Tuple[str, float]], int]:
+        count = len(self.ids)
+        if count == 0:
+            return [], 0
+
+        mask = np.frombuffer(self.alive, dtype=np.uint8).astype(bool)
+        for name, value in filters.items():
+            code = self.codes[name].get(value)
+            if code is None:
+                return [], 0
+            mask &= np.frombuffer(self.filters[name], dtype=np.uint8) == code
+        if tag is not None:
+            postings = self.terms.get(_TAG_PREFIX + normalize(tag))
+            if postings is None:
+                return [], 0
+            tagged = np.zeros(count, dtype=bool)
+            tagged[np.frombuffer(postings.docs, dtype=np.uint32)] = True
+            mask &= tagged
+
+        terms = list(dict.fromkeys(tokenize(query)))
+        wanted = offset + limit
+        if not terms:
+            # Tag / filter browsing: newest created first. Edits re-index a
+            # character at the end, so document order isn't creation order.
+            matches = np.flatnonzero(mask)
+            created = np.frombuffer(self.created, dtype=np.float64)
+            selected = matches
+            if len(selected) > wanted:
+                selected = selected[np.argpartition(-created[selected], wanted - 1)[:wanted]]
+            ranked = selected[np.lexsort((-selected, -created[selected]))][offset:wanted]
+            return [(self.ids[docno], 0.0) for docno in ranked.tolist()], len(matches)
+
+        live = len(self.docnos)
+        lengths = np.frombuffer(self.lengths, dtype=np.uint32)
+        average = self.live_length / live if live else 1.0
+        scores = np.zeros(count, dtype=np.float64)
+        for term in terms:
+            postings = self.terms.get(term)
+            if postings is None:
+                continue
+            docs = np.frombuffer(postings.docs, dtype=np.uint32)
+            freqs = np.frombuffer(postings.freqs, dtype=np.uint16).astype(np.float64)
+            # Tombstones still count towards df until the next compaction
+            frequency = min(len(docs), live)
+            idf = math.log(1 + (live - frequency + 0.5) / (frequency + 0.5))
+            norm = K1 * (1 - B + B * lengths[docs] / average)
+            scores[docs] += idf * freqs * (K1 + 1) / (freqs + norm)
+
+        mask &= scores > 0
+        matches = np.flatnonzero(mask)
+        if len(matches) > wanted:
+            matches = matches[np.argpartition(-scores[matches], wanted - 1)[:wanted]]
+        ranked = matches[np.argsort(-scores[matches], kind="stable")][offset:wanted]
+        return [(self.ids[docno], round(float(scores[docno]), 4)) for docno in ranked.tolist()], int(mask.sum())
+
+
+class SearchIndex(GalleryIndex):
+    """BM25 full-text and tag search over public characters"""
+
+    name = "SEARCH"
+    columns = ",".join(["id", *FIELD_WEIGHTS, *FILTERS, "created_at"])
+
+    def _new_state(self) -> _SearchState:
+        return _SearchState()
+
+    def _index(self, state: _SearchState, character_id: str, row: Dict) -> None:
+        state.add(character_id, row)
+
+    def _unindex(self, state: _SearchState, character_id: str) -> None:
+        state.remove(character_id)
+
+    def _needs_compaction(self, state: _SearchState) -> bool:
+        return state.needs_compaction()
+
+    def _compacted(self, state: _SearchState) -> _SearchState:
+        return state.compacted()
+
+    def search(
+        self,
+        query: str,
+        filters: Optional[Dict[str, Optional[str]]] = None,
+        tag: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 20
+    ) -> Tuple[List[Tuple[str, float]], int]:
+        """
+        (character_id, score) pairs for one page, best first, and the total
+        number of matches. An empty query lists filter / tag matches instead.
+        """
+        started = time.perf_counter()
+        filters = {name: value for name, value in (filters or {}).items() if value is not None}
+        results = self._state.search(query, filters, tag, offset, limit)
+        self._record_query(started)
+        return results
+
+    def stats(self) -> Dict:
+        state = self._state
+        return {
+            **super().stats(),
+            "terms": len(state.terms),
+            "tombstones": state.dead,
+        }
+
+
+search_index = SearchIndex(
+    refresh_interval=settings.SEARCH_INDEX_REFRESH_SECONDS
+)